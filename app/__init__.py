@@ -1,8 +1,12 @@
 import os
-from flask import Flask, render_template
+import time
+from flask import Flask, render_template, Response
 from flask_login import LoginManager, current_user
+from werkzeug.middleware.proxy_fix import ProxyFix
+from sqlalchemy import text
 from .config import Config
-from .extensions import db, migrate, mail
+from .extensions import db, migrate, mail, metrics, profiler, audit
+from .utils.metrics import instrument_app
 
 # Import Blueprints
 from .routes.student_routes import student_bp
@@ -11,13 +15,14 @@ from .routes.admin_routes import admin_bp
 from .routes.lecturer_routes import lecturer_bp
 from .routes.chatbot.chatbot_routes import chatbot_bp
 from .routes.general_routes import general as general_bp  # general blueprint
+from .routes.results import results_bp
 
 # Import User model for login_manager
 from .models import User
 
 # Initialize LoginManager
 login_manager = LoginManager()
-login_manager.login_view = "student.login"  # redirect if user not logged in
+login_manager.login_view = "student.student_login"  # redirect if user not logged in
 login_manager.login_message_category = "info"
 
 # Flask-Login user loader
@@ -30,6 +35,8 @@ def create_app(config_class=Config):
     """Application factory pattern for Flask."""
     app = Flask(__name__)
     app.config.from_object(config_class)
+    if app.config.get("PROXY_FIX_X_FOR"):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
 
     # --- Ensure ALL required folders exist ---
     upload_folder = app.config.get("UPLOAD_FOLDER", "uploads")
@@ -38,11 +45,19 @@ def create_app(config_class=Config):
     os.makedirs(upload_folder, exist_ok=True)
     os.makedirs(registration_slip_folder, exist_ok=True)
 
+    if not app.config.get("DOCKET_SIGNING_KEY"):
+        app.logger.warning("DOCKET_SIGNING_KEY (or SECRET_KEY) is not set in the environment: "
+                           "docket QR codes and calendar feeds are disabled")
+
     # --- Initialize extensions ---
     db.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
     login_manager.init_app(app)
+    metrics.init_app(app)
+    instrument_app(app)
+    profiler.init_app(app)
+    audit.init_app(app)
 
     # --- Register Blueprints ---
     app.register_blueprint(student_bp, url_prefix="/student")
@@ -51,6 +66,7 @@ def create_app(config_class=Config):
     app.register_blueprint(lecturer_bp, url_prefix="/lecturer")
     app.register_blueprint(chatbot_bp, url_prefix="/chatbot")
     app.register_blueprint(general_bp)  # no prefix; endpoints like general.forgot_password
+    app.register_blueprint(results_bp, url_prefix="/results")
 
     # --- Default Route ---
     @app.route("/")
@@ -61,7 +77,27 @@ def create_app(config_class=Config):
     # --- Health Check Route ---
     @app.route("/ping")
     def ping():
-        """Simple health check endpoint."""
-        return {"status": "ok", "message": "App running fine!"}, 200
+        """Readiness check: verifies a database round trip and reports its latency."""
+        start = time.perf_counter()
+        try:
+            db.session.execute(text("SELECT 1"))
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Readiness check failed: {str(e)}")
+            # The error can name the host, user or file; it stays in the log, not the public response
+            return {"status": "unavailable", "database": "down", "message": "database unavailable"}, 503
+        latency_ms = (time.perf_counter() - start) * 1000.0
+        return {
+            "status": "ok",
+            "database": "up",
+            "db_latency_ms": round(latency_ms, 3),
+            "message": "App running fine!",
+        }, 200
+
+    # --- Metrics Route ---
+    @app.route("/metrics")
+    def metrics_endpoint():
+        """Expose in-process metrics in Prometheus text format."""
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4; charset=utf-8")
 
-    return app
\ No newline at end of file
+    return app
@@ -1,15 +1,103 @@
 import os
 
 class Config:
-    SECRET_KEY = "super-secret-key"  # TODO: Use env var in production
+    SECRET_KEY = os.environ.get("SECRET_KEY") or "super-secret-key"  # TODO: Use env var in production
 
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(os.path.abspath(os.path.dirname(__file__)), "cavendish_registration.db")
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL") or "sqlite:///" + os.path.join(os.path.abspath(os.path.dirname(__file__)), "cavendish_registration.db")
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
     # Folder to store uploaded payment slips
-    UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
+    UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER") or os.path.join(BASE_DIR, "uploads")
     
     # NEW: Folder to store registration slip PDFs
-    REGISTRATION_SLIP_FOLDER = os.path.join(BASE_DIR, "registration_slips")
\ No newline at end of file
+    REGISTRATION_SLIP_FOLDER = os.environ.get("REGISTRATION_SLIP_FOLDER") or os.path.join(BASE_DIR, "registration_slips")
+
+    # Reverse proxies in front of the app that append to X-Forwarded-For (0 = none). Only these are
+    # trusted for request.remote_addr, which the audit trail records.
+    PROXY_FIX_X_FOR = int(os.environ.get("PROXY_FIX_X_FOR", 0))
+
+    # Shared directory for per-worker metrics snapshots (set it when running several gunicorn workers)
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_FLUSH_INTERVAL = 1.0
+
+    # On-demand request profiler (defaults to <instance>/profiles when unset)
+    PROFILE_FOLDER = None
+    PROFILER_SAMPLE_INTERVAL = 0.005
+
+    # Payment slips whose perceptual hashes differ by at most this many bits (of 64) are flagged as reused
+    RECEIPT_HASH_MAX_DISTANCE = 10
+
+    # Admin audit trail: events are queued and written in batches by a background thread
+    AUDIT_ASYNC = True
+    AUDIT_QUEUE_SIZE = 10000
+    AUDIT_BATCH_SIZE = 200
+    AUDIT_FLUSH_INTERVAL = 1.0
+
+    # Rows older than this many days are moved to monthly archives by archive_logs.py
+    # (None keeps a table forever). Archives default to <instance>/archives.
+    RETENTION_DAYS = {"chatbot_message": 180, "system_log": 365}
+    RETENTION_CHUNK_SIZE = 1000
+    RETENTION_CHUNK_PAUSE = 0.05
+    ARCHIVE_FOLDER = os.environ.get("ARCHIVE_FOLDER")
+
+    # Outgoing mail (Flask-Mail settings, used by mail_worker.py)
+    MAIL_SERVER = os.environ.get("MAIL_SERVER", "localhost")
+    MAIL_PORT = int(os.environ.get("MAIL_PORT", 25))
+    MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS", "").lower() in ("1", "true", "yes")
+    MAIL_USE_SSL = os.environ.get("MAIL_USE_SSL", "").lower() in ("1", "true", "yes")
+    MAIL_USERNAME = os.environ.get("MAIL_USERNAME")
+    MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
+    MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER", "noreply@cavendish.co.zm")
+
+    # Email outbox delivery: batch size, retry backoff (seconds) and per-recipient rate limit
+    MAIL_BATCH_SIZE = 50
+    MAIL_MAX_ATTEMPTS = 6
+    MAIL_RETRY_BASE = 30
+    MAIL_RETRY_MAX = 3600
+    MAIL_RECIPIENT_LIMIT = 5
+    MAIL_RECIPIENT_WINDOW = 3600
+    MAIL_CLAIM_LEASE = 300
+    MAIL_SMTP_TIMEOUT = 30
+    MAIL_IDLE_DISCONNECT = 60
+
+    # Assessment components (marks out of 100) and their weight in the course total
+    ASSESSMENT_WEIGHTS = {"cat1": 0.15, "cat2": 0.15, "final": 0.70}
+    # Lowest total mark for each letter grade, best first; totals below every boundary get the last grade
+    GRADE_BOUNDARIES = [("A", 80), ("B+", 75), ("B", 70), ("C+", 65), ("C", 60), ("D", 50), ("E", 40), ("F", 0)]
+
+    # GPA: points per letter grade, weighted by Course.credits. Missing or unlisted grades carry no credits.
+    GRADE_POINTS = {"A": 4.0, "B+": 3.5, "B": 3.0, "C+": 2.5, "C": 2.0, "D": 1.0, "E": 0.5, "F": 0.0}
+    DEANS_LIST_GPA = 3.5            # latest semester GPA needed for the dean's list...
+    DEANS_LIST_MIN_CREDITS = 30     # ...over at least this many graded credits
+    PROBATION_GPA = 2.0             # cumulative GPA below this puts a student on probation
+    GPA_CACHE_SIZE = 50000          # students kept in the per-process GPA cache
+    GPA_CACHE_TTL = 900             # seconds before cached ranks are recomputed
+
+    # Timetables: generated PDF and calendar (ICS) files are cached per student until their
+    # enrollments or timetable change (defaults to <instance>/timetables). Calendar feeds repeat
+    # each class weekly from the semester's first teaching day: (years after the academic year
+    # starts, month, day).
+    TIMETABLE_CACHE_FOLDER = os.environ.get("TIMETABLE_CACHE_FOLDER")
+    TIMEZONE = "Africa/Lusaka"
+    SEMESTER_STARTS = {"Semester 1": (0, 8, 18), "Semester 2": (1, 1, 19)}
+    SEMESTER_WEEKS = 15
+    TIMETABLE_FEED_MAX_AGE = 3600   # seconds calendar apps may reuse a feed before polling again
+
+    # Exam dockets: share of tuition (percent) a student must have paid for each assessment's
+    # docket. Eligibility is stored per student and recomputed when their payments change;
+    # run generate_dockets.py --refresh (or Recompute on /admin/dockets) after editing these.
+    DOCKET_THRESHOLDS = {"CAT1": 50.0, "CAT2": 75.0, "FINAL": 100.0}
+    DEFAULT_TUITION = 1000.0
+    DOCKET_PROCESSES = None         # worker processes for bulk docket PDFs (None = one per CPU)
+    # A worker needs a few seconds to import the app, about what ~300 QR codes take to encode,
+    # so single PDFs with fewer distinct codes than this are rendered in the calling process
+    DOCKET_PARALLEL_MIN = 1000
+    # Docket QR codes and calendar feed URLs carry signed tokens that are checked without a login
+    # (dockets without the database, too). The key must come from the environment: the SECRET_KEY
+    # default above is public, so without DOCKET_SIGNING_KEY or SECRET_KEY set these tokens are
+    # neither issued nor accepted. Docket tokens can't be revoked, so keep them short-lived.
+    DOCKET_SIGNING_KEY = os.environ.get("DOCKET_SIGNING_KEY") or os.environ.get("SECRET_KEY")
+    DOCKET_TOKEN_DAYS = 120
+    DOCKET_VERIFY_MAX_TOKENS = 5000  # tokens accepted per batch verification request
@@ -2,6 +2,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_mail import Mail  # ✅ add Flask-Mail
+from .utils.metrics import metrics  # in-process Prometheus registry
+from .utils.profiler import profiler  # admin-armed request profiler
+from .utils.audit import audit  # buffered admin audit trail
 
 db = SQLAlchemy()
 migrate = Migrate()
@@ -78,6 +78,9 @@ class Student(db.Model):
     registrations = db.relationship("Registration", back_populates="student", lazy=True, cascade="all, delete-orphan")
     registration_slips = db.relationship("RegistrationSlip", back_populates="student", lazy=True, cascade="all, delete-orphan")
     course_enrollments = db.relationship("CourseEnrollment", back_populates="student", lazy=True, cascade="all, delete-orphan") 
+    docket_eligibility = db.relationship("DocketEligibility", back_populates="student", lazy=True, cascade="all, delete-orphan")
+    exam_seats = db.relationship("ExamSeat", back_populates="student", lazy=True, cascade="all, delete-orphan")
+    waitlist_entries = db.relationship("CourseWaitlist", back_populates="student", lazy=True, cascade="all, delete-orphan")
 
     @property
     def registration_slip(self):
@@ -100,6 +103,9 @@ class Lecturer(db.Model):
     department = db.Column(db.String(100), nullable=True)
     phone = db.Column(db.String(20), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Bumped by every UPDATE, so cached timetable files can tell the name changed
+    revision = db.Column(db.Integer, nullable=False, server_default="0",
+                         onupdate=db.literal_column("lecturer.revision") + 1)
 
     # Relationships
     user = db.relationship("User", back_populates="lecturer_profile", uselist=False, foreign_keys=[User.lecturer_id])
@@ -121,11 +127,16 @@ class Course(db.Model):
     department = db.Column(db.String(100), nullable=True)
     
     # Link to the primary lecturer for the course
-    primary_lecturer_id = db.Column(db.Integer, db.ForeignKey("lecturer.id"), nullable=True) 
+    primary_lecturer_id = db.Column(db.Integer, db.ForeignKey("lecturer.id"), nullable=True, index=True)
+    # Bumped by every UPDATE, so cached timetable files can tell the code or title changed
+    revision = db.Column(db.Integer, nullable=False, server_default="0",
+                         onupdate=db.literal_column("course.revision") + 1)
 
     # Relationships
     primary_lecturer = db.relationship("Lecturer", back_populates="courses_taught")
     enrollments = db.relationship("CourseEnrollment", back_populates="course", lazy=True, cascade="all, delete-orphan")
+    module_selections = db.relationship("RegistrationModule", back_populates="course", lazy=True, cascade="all, delete-orphan")
+    timetable_slots = db.relationship("TimetableSlot", back_populates="course", lazy=True, cascade="all, delete-orphan")
     
     def __repr__(self):
         return f"<Course {self.code} - {self.title}>"
@@ -144,23 +155,95 @@ class CourseEnrollment(db.Model):
     semester = db.Column(db.String(20), nullable=False)
     
     grade = db.Column(db.String(5), nullable=True) 
+    # Component marks out of 100 and their weighted total (see ASSESSMENT_WEIGHTS)
+    cat1_marks = db.Column(db.Float, nullable=True)
+    cat2_marks = db.Column(db.Float, nullable=True)
+    final_marks = db.Column(db.Float, nullable=True)
+    marks = db.Column(db.Float, nullable=True)
     enrollment_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Bumped by every UPDATE (including bulk ones), so cached GPAs can tell the row changed
+    revision = db.Column(db.Integer, nullable=False, server_default="0",
+                         onupdate=db.literal_column("course_enrollment.revision") + 1)
 
     # Relationships
     student = db.relationship("Student", back_populates="course_enrollments")
     course = db.relationship("Course", back_populates="enrollments")
 
-    # Composite unique constraint to prevent duplicate enrollments
-    __table_args__ = (db.UniqueConstraint('student_id', 'course_id', 'academic_year', name='_student_course_year_uc'),)
+    __table_args__ = (
+        # Composite unique constraint to prevent duplicate enrollments
+        db.UniqueConstraint('student_id', 'course_id', 'academic_year', name='_student_course_year_uc'),
+        # Created by a migration, so every database has it; the one above only exists where create_all() built the table
+        db.UniqueConstraint('student_id', 'course_id', 'academic_year', 'semester', name='_student_course_period_uc'),
+        # Module rosters and per-module counts for a period
+        db.Index("ix_course_enrollment_course_period", "course_id", "academic_year", "semester"),
+    )
 
     def __repr__(self):
         return f"<Enrollment {self.student_id} in {self.course_id}>"
 
+# --------------------
+# COURSE CAPACITY MODELS
+# --------------------
+class CourseSection(db.Model):
+    """
+    A course's seats in one academic period. seats_taken is the enrollment
+    counter app/utils/capacity.py claims seats from; a course without a
+    section for the period has no limit.
+    """
+    __tablename__ = "course_section"
+    __table_args__ = (
+        db.UniqueConstraint("course_id", "academic_year", "semester", name="_course_section_period_uc"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey("course.id", ondelete="CASCADE"), nullable=False)
+    academic_year = db.Column(db.String(20), nullable=False)
+    semester = db.Column(db.String(20), nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    seats_taken = db.Column(db.Integer, nullable=False, default=0)
+
+    course = db.relationship("Course")
+    waitlist = db.relationship("CourseWaitlist", back_populates="section", lazy=True, cascade="all, delete-orphan",
+                               order_by="CourseWaitlist.id")
+
+    @property
+    def seats_free(self):
+        return max(0, self.capacity - self.seats_taken)
+
+    def __repr__(self):
+        return f"<CourseSection {self.course_id} {self.academic_year} {self.semester} {self.seats_taken}/{self.capacity}>"
+
+
+class CourseWaitlist(db.Model):
+    """A student waiting for a seat on a full section; promoted first come, first served (by id)."""
+    __tablename__ = "course_waitlist"
+    __table_args__ = (
+        db.UniqueConstraint("section_id", "student_id", name="_waitlist_section_student_uc"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    section_id = db.Column(db.Integer, db.ForeignKey("course_section.id", ondelete="CASCADE"), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey("student.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    section = db.relationship("CourseSection", back_populates="waitlist")
+    student = db.relationship("Student", back_populates="waitlist_entries")
+
+    def __repr__(self):
+        return f"<CourseWaitlist {self.section_id} {self.student_id}>"
+
 # --------------------
 # PAYMENT MODEL
 # --------------------
 class Payment(db.Model):
     __tablename__ = "payment"
+    __table_args__ = (
+        db.UniqueConstraint("submission_key", name="uq_payment_submission_key"),
+        # A bank reference belongs to one payment that isn't rejected, so rejecting a blurry
+        # slip lets the student resubmit with the same reference
+        db.Index("uq_payment_reference_active", "reference", unique=True,
+                 sqlite_where=db.text("status != 'rejected'"), postgresql_where=db.text("status != 'rejected'")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     slip_filename = db.Column(db.String(150), nullable=False)
@@ -173,12 +256,20 @@ class Payment(db.Model):
     # Payment details (for registration slip)
     amount = db.Column(db.Float, nullable=True)
     method = db.Column(db.String(50), nullable=True)
-    reference = db.Column(db.String(100), nullable=True, unique=True)
+    reference = db.Column(db.String(100), nullable=True)
     receipt_image = db.Column(db.String(255), nullable=True)
+    slip_hash = db.Column(db.String(16), nullable=True, index=True)  # perceptual hash of the uploaded slip
+    # Idempotency key of the form that created it, so a resubmitted form can't add a second payment
+    submission_key = db.Column(db.String(32), nullable=True)
+    # Optimistic lock: the ORM bumps it on every UPDATE and adds "WHERE version = <the one it loaded>",
+    # so a concurrent change raises StaleDataError instead of being overwritten
+    version = db.Column(db.Integer, nullable=False, server_default="1")
 
     # Relationships
     student = db.relationship("Student", back_populates="payments")
 
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<Payment {self.id} - {self.status} - {self.reference}>"
 
@@ -201,10 +292,13 @@ class RegistrationSlip(db.Model):
     semester = db.Column(db.String(20), nullable=True)
     program_name = db.Column(db.String(100), nullable=True)
     faculty_name = db.Column(db.String(100), nullable=True)
+    version = db.Column(db.Integer, nullable=False, server_default="1")  # optimistic lock, see Payment
 
     # Relationships
     student = db.relationship("Student", back_populates="registration_slips")
 
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<RegistrationSlip {self.slip_number} - {self.student.name}>"
 
@@ -219,7 +313,7 @@ class ChatbotMessage(db.Model):
     answer = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), nullable=False, default='unknown')
     is_known_response = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
     
     def __repr__(self):
         return f'<ChatbotMessage {self.question}>'
@@ -229,25 +323,176 @@ class ChatbotMessage(db.Model):
 # --------------------
 class Registration(db.Model):
     __tablename__ = "registration"
+    __table_args__ = (
+        db.Index("ix_registration_period", "academic_year", "semester"),
+        db.UniqueConstraint("submission_key", name="uq_registration_submission_key"),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     semester = db.Column(db.String(50), default="Current Semester")
     academic_year = db.Column(db.String(20), nullable=True)
     registration_date = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     is_registered = db.Column(db.Boolean, default=False)
-    student_id = db.Column(db.Integer, db.ForeignKey("student.id"), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey("student.id"), nullable=False, index=True)
     # Additional fields to capture semester registration details
     program = db.Column(db.String(100), nullable=True)
     mode_of_study = db.Column(db.String(50), nullable=True)
+    # Free text from before module_selections existed; kept for old registrations only
     modules = db.Column(db.Text, nullable=True)
     is_returning = db.Column(db.Boolean, default=False)
+    submission_key = db.Column(db.String(32), nullable=True)  # see Payment.submission_key
+    version = db.Column(db.Integer, nullable=False, server_default="1")  # optimistic lock, see Payment
 
     # Relationships
     student = db.relationship("Student", back_populates="registrations")
+    module_selections = db.relationship("RegistrationModule", back_populates="registration", lazy=True, cascade="all, delete-orphan")
+
+    __mapper_args__ = {"version_id_col": version}
 
     def __repr__(self):
         return f"<Registration {self.student_id} - {self.semester}>"
 
+# --------------------
+# REGISTRATION MODULE MODEL
+# --------------------
+class RegistrationModule(db.Model):
+    """A module (course) picked on a semester registration; becomes a CourseEnrollment once approved."""
+    __tablename__ = "registration_module"
+    __table_args__ = (db.UniqueConstraint("registration_id", "course_id", name="_registration_course_uc"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    registration_id = db.Column(db.Integer, db.ForeignKey("registration.id", ondelete="CASCADE"), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey("course.id"), nullable=False, index=True)
+
+    registration = db.relationship("Registration", back_populates="module_selections")
+    course = db.relationship("Course", back_populates="module_selections")
+
+    def __repr__(self):
+        return f"<RegistrationModule {self.registration_id} - {self.course_id}>"
+
+# --------------------
+# TIMETABLE SLOT MODEL
+# --------------------
+class TimetableSlot(db.Model):
+    """A weekly class meeting of a course in one academic year and semester."""
+    __tablename__ = "timetable_slot"
+    __table_args__ = (
+        # Students' timetables join on (course, period); clash checks look up a day's slots
+        db.Index("ix_timetable_slot_course_period", "course_id", "academic_year", "semester"),
+        db.Index("ix_timetable_slot_period_day", "academic_year", "semester", "day_of_week"),
+    )
+
+    DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+    id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey("course.id"), nullable=False)
+    academic_year = db.Column(db.String(20), nullable=False)
+    semester = db.Column(db.String(20), nullable=False)
+    day_of_week = db.Column(db.Integer, nullable=False)  # 0 = Monday
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+    venue = db.Column(db.String(50), nullable=False)
+    lecturer_id = db.Column(db.Integer, db.ForeignKey("lecturer.id"), nullable=True, index=True)
+    session_type = db.Column(db.String(20), default="Lecture")  # Lecture, Tutorial, Lab
+    # Bumped by every UPDATE, so cached timetable files can tell the slot changed
+    revision = db.Column(db.Integer, nullable=False, server_default="0",
+                         onupdate=db.literal_column("timetable_slot.revision") + 1)
+
+    course = db.relationship("Course", back_populates="timetable_slots")
+    lecturer = db.relationship("Lecturer")
+
+    @property
+    def day_name(self):
+        return self.DAYS[self.day_of_week]
+
+    def __repr__(self):
+        return f"<TimetableSlot {self.course_id} {self.day_name} {self.start_time}-{self.end_time}>"
+
+# --------------------
+# DOCKET ELIGIBILITY MODEL
+# --------------------
+class DocketEligibility(db.Model):
+    """A student's payment standing against one assessment's docket threshold (see app/utils/dockets.py)."""
+    __tablename__ = "docket_eligibility"
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "assessment", name="_student_assessment_uc"),
+        # Bulk docket runs and the admin counts select the eligible students of an assessment
+        db.Index("ix_docket_eligibility_assessment", "assessment", "eligible"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("student.id", ondelete="CASCADE"), nullable=False)
+    assessment = db.Column(db.String(10), nullable=False)  # CAT1, CAT2, FINAL
+    paid_amount = db.Column(db.Float, nullable=False, default=0.0)
+    paid_percent = db.Column(db.Float, nullable=False, default=0.0)
+    eligible = db.Column(db.Boolean, nullable=False, default=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    student = db.relationship("Student", back_populates="docket_eligibility")
+
+    def __repr__(self):
+        return f"<DocketEligibility {self.student_id} {self.assessment} {self.eligible}>"
+
+# --------------------
+# EXAM SEATING MODELS
+# --------------------
+class ExamHall(db.Model):
+    """A venue exams are sat in; seats are numbered row by row from the front."""
+    __tablename__ = "exam_hall"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    seats_per_row = db.Column(db.Integer, nullable=False, default=10)
+
+    def __repr__(self):
+        return f"<ExamHall {self.name} ({self.capacity})>"
+
+
+class ExamSession(db.Model):
+    """One sitting time of an assessment in an academic period, e.g. the FINAL on Monday at 09:00."""
+    __tablename__ = "exam_session"
+    __table_args__ = (db.Index("ix_exam_session_period", "academic_year", "semester", "assessment"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    academic_year = db.Column(db.String(20), nullable=False)
+    semester = db.Column(db.String(20), nullable=False)
+    assessment = db.Column(db.String(10), nullable=False)  # CAT1, CAT2, FINAL
+    starts_at = db.Column(db.DateTime, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=180)
+
+    seats = db.relationship("ExamSeat", back_populates="session", lazy=True, cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<ExamSession {self.assessment} {self.starts_at}>"
+
+
+class ExamSeat(db.Model):
+    """A student's seat for one course's exam, as allocated by app/utils/seating.py."""
+    __tablename__ = "exam_seat"
+    __table_args__ = (
+        db.UniqueConstraint("session_id", "hall_id", "seat_number", name="_session_hall_seat_uc"),
+        # A student sits one exam at a time
+        db.UniqueConstraint("session_id", "student_id", name="_session_student_uc"),
+        # Dockets look up the seat of a student's course
+        db.Index("ix_exam_seat_student_course", "student_id", "course_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey("exam_session.id", ondelete="CASCADE"), nullable=False)
+    hall_id = db.Column(db.Integer, db.ForeignKey("exam_hall.id", ondelete="CASCADE"), nullable=False)
+    seat_number = db.Column(db.Integer, nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey("student.id", ondelete="CASCADE"), nullable=False)
+    course_id = db.Column(db.Integer, db.ForeignKey("course.id", ondelete="CASCADE"), nullable=False)
+
+    session = db.relationship("ExamSession", back_populates="seats")
+    hall = db.relationship("ExamHall")
+    student = db.relationship("Student", back_populates="exam_seats")
+    course = db.relationship("Course")
+
+    def __repr__(self):
+        return f"<ExamSeat {self.session_id} {self.hall_id}-{self.seat_number} {self.student_id}>"
+
 # --------------------
 # SYSTEM LOG MODEL
 # --------------------
@@ -255,15 +500,87 @@ class SystemLog(db.Model):
     __tablename__ = "system_log"
     
     id = db.Column(db.Integer, primary_key=True)
-    admin_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
-    action = db.Column(db.String(100), nullable=False)
+    admin_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True, index=True)
+    action = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
     ip_address = db.Column(db.String(45), nullable=True)
     user_agent = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
     # Relationship
     admin = db.relationship("User")
 
     def __repr__(self):
-        return f"<SystemLog {self.action} - {self.created_at}>"
\ No newline at end of file
+        return f"<SystemLog {self.action} - {self.created_at}>"
+
+# --------------------
+# BANK STATEMENT RECONCILIATION MODELS
+# --------------------
+class StatementImport(db.Model):
+    __tablename__ = "statement_import"
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    imported_by = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
+    started_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = db.Column(db.DateTime, nullable=True)
+    status = db.Column(db.String(20), default="running")  # running, completed, failed
+    total_lines = db.Column(db.Integer, default=0)
+    matched_lines = db.Column(db.Integer, default=0)
+    unmatched_lines = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text, nullable=True)
+
+    # Relationships
+    lines = db.relationship("UnmatchedStatementLine", back_populates="statement_import", lazy="dynamic",
+                            cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<StatementImport {self.filename} - {self.status}>"
+
+
+class UnmatchedStatementLine(db.Model):
+    """A statement line that could not be matched automatically, waiting for an admin."""
+    __tablename__ = "unmatched_statement_line"
+
+    id = db.Column(db.Integer, primary_key=True)
+    import_id = db.Column(db.Integer, db.ForeignKey("statement_import.id"), nullable=False, index=True)
+    line_number = db.Column(db.Integer, nullable=False)
+    reference = db.Column(db.String(100), nullable=True, index=True)
+    amount = db.Column(db.Float, nullable=True)
+    transaction_date = db.Column(db.Date, nullable=True)
+    student_number = db.Column(db.String(20), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    reason = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), default="open", index=True)  # open, matched, dismissed
+    payment_id = db.Column(db.Integer, db.ForeignKey("payment.id"), nullable=True)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+
+    # Relationships
+    statement_import = db.relationship("StatementImport", back_populates="lines")
+    payment = db.relationship("Payment")
+
+    def __repr__(self):
+        return f"<UnmatchedStatementLine {self.line_number} - {self.reason}>"
+
+
+class EmailOutbox(db.Model):
+    """An email waiting for (or done with) delivery by mail_worker.py."""
+    __tablename__ = "email_outbox"
+    __table_args__ = (db.Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(120), nullable=False, index=True)
+    subject = db.Column(db.String(255), nullable=False)
+    html = db.Column(db.Text, nullable=True)
+    body = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), default="pending", nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    # When the message may next be tried; while "sending" it is the claim's lease expiry
+    next_attempt_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    claim_token = db.Column(db.String(32), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.recipient} - {self.status}>"
@@ -1,16 +1,44 @@
 # app/routes/admin_routes.py
+import io
 import os
+import re
 from flask import (
     Blueprint, render_template, redirect, url_for, flash, 
-    send_from_directory, current_app, session, request
+    send_from_directory, current_app, session, request, jsonify, send_file
 )
 from functools import wraps
+from flask_login import login_user, logout_user
 from werkzeug.security import check_password_hash
-from datetime import datetime
-from app.models import db, User, Student, Payment, Registration, RegistrationSlip
+from werkzeug.utils import secure_filename
+from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from app.models import (
+    db, User, Student, Payment, RegistrationSlip, StatementImport, UnmatchedStatementLine, SystemLog,
+    Course, CourseEnrollment, CourseSection, Lecturer, TimetableSlot, ExamHall, ExamSeat, ExamSession
+)
+from app.extensions import profiler, audit
+from app.utils import moderation as marks_moderation
+from app.utils.dockets import (
+    course_docket_counts, docket_rows, eligibility_counts, refresh_eligibility, render_dockets, thresholds
+)
+from app.utils.capacity import drop_enrollment, leave_waitlist, section_counts, set_capacity, waitlist_query
+from app.utils.grades import COMPONENTS
+from app.utils.helpers import approve_payment
+from app.utils.image_hash import receipt_index
+from app.utils.mailer import notify_slip_issued
+from app.utils.modules import module_counts, module_periods, pending_roster_query, roster_query
+from app.utils.reconciliation import reconcile_statement, resolve_line, dismiss_line
+from app.utils.retention import list_archives, read_archive_page
+from app.utils.seating import plan_seating, seating_halls, seating_summary
+from app.utils.signing import signing_configured
+from app.utils.student_search import student_search_query, typeahead
+from app.utils.timetable import slot_conflicts, timetable_periods, validate_timetable
 
 admin_bp = Blueprint('admin', __name__, template_folder='../templates/admin')
 
+NO_SIGNING_KEY = "Dockets can't be printed: set DOCKET_SIGNING_KEY (or SECRET_KEY) in the portal's environment."
+
 # -----------------
 # Admin Authentication Decorator
 # -----------------
@@ -45,17 +73,23 @@ def admin_login():
         if user and user.check_password(password):
             session['user_id'] = user.id
             session['role'] = user.role
+            login_user(user)  # lets the results blueprint (Flask-Login) see the admin too
+            audit.record('admin.login', f"{user.username} logged in")
             flash("Admin login successful!", "success")
             return redirect(url_for('admin.dashboard'))
         else:
+            audit.record('admin.login_failed', f"Failed admin login for {username}")
             flash("Invalid credentials.", "danger")
 
     return render_template('admin/login.html')
 
 @admin_bp.route('/logout')
 def admin_logout():
+    if session.get('role') == 'admin':
+        audit.record('admin.logout')
     session.pop('user_id', None)
     session.pop('role', None)
+    logout_user()
     flash("You have been logged out.", "info")
     return redirect(url_for('admin.admin_login'))
 
@@ -65,19 +99,23 @@ def admin_logout():
 @admin_bp.route('/dashboard')
 @admin_required
 def dashboard():
-    pending_payments = Payment.query.filter_by(status='pending').all()
-    approved_payments = Payment.query.filter_by(status='approved').all()
-    rejected_payments = Payment.query.filter_by(status='rejected').all()
+    # One query for every payment; the template reads payment.student and its
+    # latest slip for each row, so load those up front instead of per row.
+    payments = Payment.query.options(
+        joinedload(Payment.student).selectinload(Student.registration_slips)
+    ).order_by(Payment.id).all()
+    pending_payments = [p for p in payments if p.status == 'pending']
+    approved_payments = [p for p in payments if p.status == 'approved']
+    rejected_payments = [p for p in payments if p.status == 'rejected']
     
-    # Get all students for registration slip management
-    students = Student.query.all()
+    student_count = Student.query.count()
     
     return render_template(
         'admin/dashboard.html',
         pending_payments=pending_payments,
         approved_payments=approved_payments,
         rejected_payments=rejected_payments,
-        students=students
+        student_count=student_count
     )
 
 # -----------------
@@ -89,62 +127,69 @@ def manage_payment(payment_id, action):
     """Approve or reject payments with auto-registration slip creation"""
     payment = Payment.query.get_or_404(payment_id)
 
+    # The buttons carry the version the admin was looking at; anything newer is someone else's change.
+    # A link without one (bookmarked or hand-typed) can't show the admin saw the current state, so it
+    # is treated the same way.
+    seen = request.args.get('version', type=int)
+    if action in ('approve', 'reject') and seen != payment.version:
+        flash(f'Payment {payment.id} for {payment.student.name} may have changed since you looked at it '
+              f'and is now {payment.status}. Check it and try again.', 'warning')
+        return redirect(url_for('admin.dashboard'))
+
     if action == 'approve':
-        payment.status = 'approved'
-        payment.approved_date = datetime.utcnow()
-        
-        # Create registration record
-        registration = Registration.query.filter_by(student_id=payment.student_id).first()
-        if not registration:
-            registration = Registration(student_id=payment.student_id, is_registered=True)
-            db.session.add(registration)
-        else:
-            registration.is_registered = True
-        
-        # AUTO-CREATE REGISTRATION SLIP
-        existing_slip = RegistrationSlip.query.filter_by(student_id=payment.student_id).first()
-        if not existing_slip:
-            slip_number = f"RS{payment.student_id:06d}-{datetime.now().strftime('%Y%m%d')}"
-            registration_slip = RegistrationSlip(
-                slip_number=slip_number,
-                student_id=payment.student_id,
-                program_name=payment.student.program or "To be assigned",
-                faculty_name=payment.student.faculty or "To be assigned",
-                academic_year="2024/2025",
-                semester="Semester 1",
-                issue_date=datetime.utcnow(),
-                created_by=session.get('user_id', 'admin')
-            )
-            db.session.add(registration_slip)
-            db.session.commit()
-            
-            # Generate PDF
-            from app.utils.helpers import generate_registration_slip_pdf
-            if generate_registration_slip_pdf(registration_slip):
-                db.session.commit()
-                flash(f'Payment approved and registration slip created for {payment.student.name}!', 'success')
-            else:
-                flash(f'Payment approved but PDF generation failed for {payment.student.name}.', 'warning')
+        outcome = approve_payment(payment, approved_by=session.get('user_id', 'admin'))
+        if outcome == 'conflict':
+            _payment_conflict(payment_id)
+            return redirect(url_for('admin.dashboard'))
+        audit.record('payment.approve', f"Payment {payment.id} for {payment.student.student_number} approved ({outcome})")
+        if outcome == 'slip_created':
+            flash(f'Payment approved and registration slip created for {payment.student.name}!', 'success')
+        elif outcome == 'pdf_failed':
+            flash(f'Payment approved but PDF generation failed for {payment.student.name}.', 'warning')
         else:
             # Slip already exists, just approve payment
-            db.session.commit()
             flash(f'Payment for {payment.student.name} approved.', 'success')
 
     elif action == 'reject':
         payment.status = 'rejected'
-        db.session.commit()
+        refresh_eligibility([payment.student_id])
+        try:
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            _payment_conflict(payment_id)
+            return redirect(url_for('admin.dashboard'))
+        audit.record('payment.reject', f"Payment {payment.id} for {payment.student.student_number} rejected")
         flash(f'Payment for {payment.student.name} rejected.', 'warning')
     else:
         flash("Invalid action.", "danger")
 
     return redirect(url_for('admin.dashboard'))
 
+def _payment_conflict(payment_id):
+    """Flash what a payment looks like now after losing a concurrent update to it; nothing was saved."""
+    payment = db.session.get(Payment, payment_id)
+    flash(f'Payment {payment.id} for {payment.student.name} was updated by someone else at the same time and '
+          f'is now {payment.status}; your change was not saved. Check it and try again.', 'warning')
+
 @admin_bp.route('/payment/<int:payment_id>/preview')
 @admin_required
 def preview_payment(payment_id):
     """Preview payment details before approval."""
     payment = Payment.query.get_or_404(payment_id)
-    return render_template('admin/payment_preview.html', payment=payment)
+
+    # Other payments whose slip looks like this one (same photo re-uploaded or lightly edited)
+    similar = []
+    matches = receipt_index.find_similar(payment.slip_hash, exclude_id=payment.id)
+    if matches:
+        found = {
+            p.id: p for p in Payment.query.options(joinedload(Payment.student)).filter(
+                Payment.id.in_([pid for _, pid in matches])
+            )
+        }
+        similar = [(distance, found[pid]) for distance, pid in matches if pid in found]
+
+    return render_template('admin/preview_payment.html', payment=payment, similar=similar)
 
 # -----------------
 # Registration Slip Management
@@ -183,7 +228,9 @@ def create_registration_slip_form():
             )
             
             db.session.add(registration_slip)
+            notify_slip_issued(registration_slip)
             db.session.commit()
+            audit.record('slip.create', f"Slip {slip_number} created for {student.student_number}")
             
             # Generate PDF
             from app.utils.helpers import generate_registration_slip_pdf
@@ -206,7 +253,9 @@ def create_registration_slip_form():
 @admin_required
 def view_registration_slips():
     """View all registration slips with statistics"""
-    registration_slips = RegistrationSlip.query.order_by(RegistrationSlip.issue_date.desc()).all()
+    registration_slips = RegistrationSlip.query.options(
+        joinedload(RegistrationSlip.student)
+    ).order_by(RegistrationSlip.issue_date.desc()).all()
     
     # Calculate statistics
     today = datetime.utcnow().date()
@@ -223,6 +272,11 @@ def edit_registration_slip(slip_id):
     slip = RegistrationSlip.query.get_or_404(slip_id)
     
     if request.method == 'POST':
+        seen = request.form.get('version', type=int)
+        if seen is not None and seen != slip.version:
+            flash('This slip was changed by someone else after you opened it. Review the current details and '
+                  'make your changes again.', 'warning')
+            return render_template('admin/edit_registration_slip.html', slip=slip)
         try:
             # Update slip information
             slip.program_name = request.form.get('program_name', slip.program_name)
@@ -234,12 +288,17 @@ def edit_registration_slip(slip_id):
             from app.utils.helpers import generate_registration_slip_pdf
             if generate_registration_slip_pdf(slip):
                 db.session.commit()
+                audit.record('slip.edit', f"Slip {slip.slip_number} updated")
                 flash('Registration slip updated successfully!', 'success')
             else:
                 flash('Slip updated but PDF regeneration failed.', 'warning')
                 
             return redirect(url_for('admin.view_registration_slips'))
             
+        except StaleDataError:
+            db.session.rollback()
+            flash('This slip was changed by someone else while you were saving. Review the current details and '
+                  'make your changes again.', 'warning')
         except Exception as e:
             db.session.rollback()
             flash(f'Error updating registration slip: {str(e)}', 'danger')
@@ -256,6 +315,7 @@ def regenerate_slip_pdf(slip_id):
         from app.utils.helpers import generate_registration_slip_pdf
         if generate_registration_slip_pdf(slip):
             db.session.commit()
+            audit.record('slip.regenerate', f"PDF regenerated for slip {slip.slip_number}")
             flash('PDF regenerated successfully!', 'success')
         else:
             flash('PDF regeneration failed.', 'warning')
@@ -278,8 +338,10 @@ def delete_registration_slip(slip_id):
             if os.path.exists(pdf_path):
                 os.remove(pdf_path)
         
+        slip_number = slip.slip_number
         db.session.delete(slip)
         db.session.commit()
+        audit.record('slip.delete', f"Slip {slip_number} for {student_name} deleted")
         flash(f'Registration slip for {student_name} deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -303,9 +365,23 @@ def serve_registration_slip(filename):
 @admin_bp.route('/students')
 @admin_required
 def view_students():
-    """View all students."""
-    students = Student.query.all()
-    return render_template('admin/students.html', students=students)
+    """View students one page at a time, optionally filtered by a search term."""
+    q = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    pagination = student_search_query(q).options(
+        selectinload(Student.registration_slips)
+    ).paginate(page=page, per_page=50, error_out=False)
+    students = pagination.items
+    return render_template('admin/students.html', students=students, pagination=pagination, q=q)
+
+@admin_bp.route('/students/typeahead')
+@admin_required
+def student_typeahead():
+    """JSON matches for the as-you-type student search box."""
+    matches = typeahead(request.args.get('q', ''))
+    for match in matches:
+        match['url'] = url_for('admin.view_student_details', student_id=match['id'])
+    return jsonify({'results': matches})
 
 @admin_bp.route('/student/<int:student_id>')
 @admin_required
@@ -362,6 +438,7 @@ def create_admin():
         
         db.session.add(admin_user)
         db.session.commit()
+        audit.record('admin.create', f"Admin account {username} created")
 
         flash(f"Admin account for {username} created successfully!", "success")
         return redirect(url_for('admin.manage_admins'))
@@ -396,6 +473,7 @@ def reset_admin_password(admin_id):
         # Update password
         admin_user.set_password(new_password)
         db.session.commit()
+        audit.record('admin.reset_password', f"Password reset for {admin_user.username}")
 
         flash(f"Password for {admin_user.username} has been reset successfully!", "success")
         return redirect(url_for('admin.manage_admins'))
@@ -415,6 +493,7 @@ def delete_admin(admin_id):
     
     db.session.delete(admin_user)
     db.session.commit()
+    audit.record('admin.delete', f"Admin account {username} deleted")
 
     flash(f"Admin account for {username} has been deleted.", "success")
     return redirect(url_for('admin.manage_admins'))
@@ -433,4 +512,738 @@ def serve_uploaded_file(filename):
         directory=current_app.config['UPLOAD_FOLDER'],
         path=filename,
         as_attachment=False
-    )
\ No newline at end of file
+    )
+
+# -----------------
+# Request Profiler
+# -----------------
+@admin_bp.route('/profiler')
+@admin_required
+def profiler_dashboard():
+    """Arm the on-demand profiler and list stored flame graphs."""
+    rule = profiler.current_rule()
+    claimed = profiler.claimed_count(rule) if rule else 0
+    endpoints = sorted(r.endpoint for r in current_app.url_map.iter_rules())
+    return render_template(
+        'admin/profiler.html',
+        rule=rule,
+        claimed=claimed,
+        profiles=profiler.list_profiles(),
+        endpoints=endpoints
+    )
+
+@admin_bp.route('/profiler/arm', methods=['POST'])
+@admin_required
+def arm_profiler():
+    """Profile the next N requests matching an endpoint or URL pattern."""
+    endpoint = request.form.get('endpoint', '').strip()
+    pattern = request.form.get('pattern', '').strip()
+    try:
+        limit = max(1, min(int(request.form.get('limit', 5)), 50))
+    except ValueError:
+        limit = 5
+
+    try:
+        profiler.arm(
+            endpoint=endpoint or None,
+            pattern=pattern or None,
+            limit=limit,
+            trace_memory=bool(request.form.get('tracemalloc')),
+            created_by=session.get('user_id')
+        )
+        audit.record('profiler.arm', f"Profiler armed for {limit} request(s) matching {endpoint or pattern}")
+        flash(f"Profiler armed for the next {limit} matching request(s).", "success")
+    except ValueError as e:
+        flash(f"Could not arm profiler: {str(e)}", "danger")
+    except re.error as e:
+        flash(f"Invalid URL pattern: {str(e)}", "danger")
+
+    return redirect(url_for('admin.profiler_dashboard'))
+
+@admin_bp.route('/profiler/disarm', methods=['POST'])
+@admin_required
+def disarm_profiler():
+    profiler.disarm()
+    audit.record('profiler.disarm')
+    flash("Profiler disarmed.", "info")
+    return redirect(url_for('admin.profiler_dashboard'))
+
+@admin_bp.route('/profiler/files/<path:filename>')
+@admin_required
+def serve_profile(filename):
+    """Serve a stored flame graph (HTML) or speedscope profile (JSON)."""
+    if not (filename.endswith('.html') or filename.endswith('.speedscope.json')):
+        flash('Unknown profile file.', 'danger')
+        return redirect(url_for('admin.profiler_dashboard'))
+    return send_from_directory(
+        profiler.folder,
+        filename,
+        as_attachment=filename.endswith('.json')
+    )
+
+@admin_bp.route('/profiler/delete/<name>', methods=['POST'])
+@admin_required
+def delete_profile(name):
+    profiler.delete_profile(os.path.basename(name))
+    flash("Profile deleted.", "success")
+    return redirect(url_for('admin.profiler_dashboard'))
+
+# -----------------
+# Statement Reconciliation
+# -----------------
+@admin_bp.route('/reconciliation')
+@admin_required
+def reconciliation():
+    """Statement imports and the queue of lines that need a human decision."""
+    import_id = request.args.get('import_id', type=int)
+    page = request.args.get('page', 1, type=int)
+
+    imports = StatementImport.query.order_by(StatementImport.started_at.desc()).limit(20).all()
+    queue = UnmatchedStatementLine.query.filter_by(status='open')
+    if import_id:
+        queue = queue.filter_by(import_id=import_id)
+    pagination = queue.order_by(
+        UnmatchedStatementLine.import_id.desc(), UnmatchedStatementLine.line_number
+    ).paginate(page=page, per_page=50, error_out=False)
+
+    return render_template(
+        'admin/reconciliation.html',
+        imports=imports,
+        lines=pagination.items,
+        pagination=pagination,
+        import_id=import_id
+    )
+
+@admin_bp.route('/reconciliation/import', methods=['POST'])
+@admin_required
+def import_statement():
+    """Stream an uploaded statement CSV through the reconciliation engine."""
+    statement = request.files.get('statement')
+    if not statement or not statement.filename:
+        flash('Choose a statement CSV to import.', 'warning')
+        return redirect(url_for('admin.reconciliation'))
+    if not statement.filename.lower().endswith('.csv'):
+        flash('Statements must be CSV files.', 'danger')
+        return redirect(url_for('admin.reconciliation'))
+
+    stream = io.TextIOWrapper(statement.stream, encoding='utf-8-sig', newline='')
+    try:
+        result = reconcile_statement(stream, statement.filename, imported_by=session.get('user_id'))
+    except (ValueError, UnicodeDecodeError) as e:
+        flash(f'Could not read statement: {str(e)}', 'danger')
+        return redirect(url_for('admin.reconciliation'))
+
+    audit.record(
+        'statement.import',
+        f"{statement.filename}: {result.total_lines} lines, {result.matched_lines} matched, {result.unmatched_lines} unmatched"
+    )
+    flash(
+        f'Imported {result.total_lines} lines: {result.matched_lines} payments approved, '
+        f'{result.unmatched_lines} sent to review.',
+        'success'
+    )
+    return redirect(url_for('admin.reconciliation', import_id=result.id))
+
+@admin_bp.route('/reconciliation/line/<int:line_id>/match', methods=['POST'])
+@admin_required
+def match_statement_line(line_id):
+    """Match a queued line to a pending payment by hand and approve it."""
+    line = UnmatchedStatementLine.query.get_or_404(line_id)
+    payment = Payment.query.get(request.form.get('payment_id', type=int) or 0)
+    if not payment or payment.status != 'pending':
+        flash('Enter the ID of a pending payment.', 'danger')
+        return redirect(request.referrer or url_for('admin.reconciliation'))
+
+    outcome = resolve_line(line, payment, approved_by=session.get('user_id', 'admin'))
+    if outcome == 'conflict':
+        _payment_conflict(payment.id)
+        return redirect(request.referrer or url_for('admin.reconciliation'))
+    audit.record('statement.match', f"Statement line {line.id} matched to payment {payment.id} ({outcome})")
+    if outcome == 'pdf_failed':
+        flash(f'Payment {payment.id} approved but PDF generation failed for {payment.student.name}.', 'warning')
+    else:
+        flash(f'Line {line.line_number} matched and payment for {payment.student.name} approved.', 'success')
+    return redirect(request.referrer or url_for('admin.reconciliation'))
+
+@admin_bp.route('/reconciliation/line/<int:line_id>/dismiss', methods=['POST'])
+@admin_required
+def dismiss_statement_line(line_id):
+    line = UnmatchedStatementLine.query.get_or_404(line_id)
+    dismiss_line(line)
+    audit.record('statement.dismiss', f"Statement line {line.id} dismissed")
+    flash(f'Line {line.line_number} dismissed.', 'info')
+    return redirect(request.referrer or url_for('admin.reconciliation'))
+
+# -----------------
+# Audit Log
+# -----------------
+@admin_bp.route('/audit')
+@admin_required
+def audit_log():
+    """Browse the admin audit trail, newest first, filtered by admin, action and date."""
+    admin_id = request.args.get('admin_id', type=int)
+    action = request.args.get('action', '').strip()
+    start = request.args.get('start', '').strip()
+    end = request.args.get('end', '').strip()
+    page = request.args.get('page', 1, type=int)
+
+    query = SystemLog.query.options(joinedload(SystemLog.admin))
+    if admin_id:
+        query = query.filter(SystemLog.admin_id == admin_id)
+    if action:
+        query = query.filter(SystemLog.action == action)
+    try:
+        if start:
+            query = query.filter(SystemLog.created_at >= datetime.strptime(start, '%Y-%m-%d'))
+        if end:
+            query = query.filter(SystemLog.created_at < datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1))
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'warning')
+    pagination = query.order_by(SystemLog.created_at.desc(), SystemLog.id.desc()).paginate(
+        page=page, per_page=50, error_out=False
+    )
+
+    admins = User.query.filter_by(role='admin').order_by(User.username).all()
+    actions = [a for (a,) in db.session.query(SystemLog.action).distinct().order_by(SystemLog.action)]
+    return render_template(
+        'admin/audit_log.html',
+        entries=pagination.items,
+        pagination=pagination,
+        admins=admins,
+        actions=actions,
+        filters={'admin_id': admin_id, 'action': action, 'start': start, 'end': end}
+    )
+
+# -----------------
+# Log Archives
+# -----------------
+@admin_bp.route('/archives')
+@admin_bp.route('/archives/<table>/<month>')
+@admin_required
+def archives(table=None, month=None):
+    """Read-only view of chatbot and audit rows moved out by archive_logs.py."""
+    q = request.args.get('q', '').strip()
+    page = request.args.get('page', 1, type=int)
+    per_page = 50
+
+    rows, total, admin_names = [], 0, {}
+    if table:
+        try:
+            rows, total = read_archive_page(table, month, term=q, page=page, per_page=per_page)
+        except ValueError:
+            flash('Archive not found.', 'danger')
+            return redirect(url_for('admin.archives'))
+        admin_ids = {row['admin_id'] for row in rows if row.get('admin_id')}
+        if admin_ids:
+            admin_names = dict(db.session.query(User.id, User.username).filter(User.id.in_(admin_ids)))
+
+    return render_template(
+        'admin/archives.html',
+        archive_files=list_archives(),
+        table=table,
+        month=month,
+        q=q,
+        rows=rows,
+        total=total,
+        page=page,
+        pages=max(1, -(-total // per_page)),
+        admin_names=admin_names
+    )
+
+# -----------------
+# Marks Moderation
+# -----------------
+def _moderation_request(source):
+    """Read a moderation request from request.args or request.form; raises ValueError when invalid."""
+    course_id = source.get('course_id', type=int)
+    period = source.get('period', '')
+    academic_year, _, semester = period.partition('|')
+    if not course_id or not academic_year or not semester:
+        raise ValueError('Choose a course and an academic period.')
+    method = source.get('method', 'linear')
+    if method not in marks_moderation.METHODS:
+        raise ValueError(f'Unknown moderation method {method!r}.')
+    try:
+        if method == 'linear':
+            params = {'scale': float(source.get('scale') or 1), 'offset': float(source.get('offset') or 0)}
+        else:
+            params = {'exponent': float(source.get('exponent') or 1)}
+    except ValueError:
+        raise ValueError('Moderation parameters must be numbers.')
+    return {
+        'course_id': course_id, 'academic_year': academic_year, 'semester': semester,
+        'component': source.get('component', 'final'), 'method': method, **params
+    }
+
+@admin_bp.route('/moderation')
+@admin_required
+def moderation():
+    """Exam-board tool: preview and apply a linear or curve adjustment to a course's marks."""
+    courses = Course.query.order_by(Course.code).all()
+    course = next((c for c in courses if c.id == request.args.get('course_id', type=int)), None)
+    periods = []
+    if course:
+        periods = db.session.query(CourseEnrollment.academic_year, CourseEnrollment.semester).filter(
+            CourseEnrollment.course_id == course.id
+        ).distinct().order_by(CourseEnrollment.academic_year.desc(), CourseEnrollment.semester.desc()).all()
+    return render_template(
+        'admin/moderation.html',
+        courses=courses,
+        course=course,
+        periods=periods,
+        selected_period=request.args.get('period', ''),
+        components=COMPONENTS,
+        methods=marks_moderation.METHODS
+    )
+
+@admin_bp.route('/moderation/preview')
+@admin_required
+def moderation_preview():
+    """JSON grade distribution before and after a moderation; nothing is saved."""
+    try:
+        return jsonify(marks_moderation.preview(**_moderation_request(request.args)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@admin_bp.route('/moderation/apply', methods=['POST'])
+@admin_required
+def moderation_apply():
+    try:
+        options = _moderation_request(request.form)
+        summary, written = marks_moderation.apply(**options)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('admin.moderation', course_id=request.form.get('course_id', type=int)))
+
+    course = Course.query.get(options['course_id'])
+    params = ', '.join(f"{key}={value:g}" for key, value in summary['params'].items())
+    audit.record(
+        'grades.moderate',
+        f"{course.code if course else options['course_id']} {options['academic_year']} {options['semester']}: "
+        f"{options['component']} {options['method']} ({params}), {written} enrollment(s) updated"
+    )
+    flash(f"Moderation applied to {written} enrollment(s); "
+          f"{summary['moved_up']} grade(s) moved up and {summary['moved_down']} down.", 'success')
+    return redirect(url_for(
+        'admin.moderation', course_id=options['course_id'],
+        period=f"{options['academic_year']}|{options['semester']}"
+    ))
+
+# -----------------
+# Module Registration
+# -----------------
+def _selected_period(periods):
+    """The period chosen with ?period=year|semester, else the newest one."""
+    academic_year, _, semester = request.args.get('period', '').partition('|')
+    if (academic_year, semester) in periods:
+        return academic_year, semester
+    return periods[0] if periods else (None, None)
+
+@admin_bp.route('/modules')
+@admin_required
+def modules():
+    """Enrolled and pending (awaiting payment approval) students per module for one period."""
+    periods = module_periods()
+    academic_year, semester = _selected_period(periods)
+    counts = module_counts(academic_year, semester) if academic_year else {}
+    courses = Course.query.filter(Course.id.in_(list(counts))).order_by(Course.code).all() if counts else []
+    return render_template(
+        'admin/modules.html',
+        periods=periods,
+        academic_year=academic_year,
+        semester=semester,
+        courses=courses,
+        counts=counts,
+        sections=section_counts(academic_year, semester) if counts else {}
+    )
+
+@admin_bp.route('/modules/<int:course_id>')
+@admin_required
+def module_roster(course_id):
+    course = Course.query.get_or_404(course_id)
+    periods = module_periods()
+    academic_year, semester = _selected_period(periods)
+    enrolled = roster_query(course.id, academic_year, semester).paginate(
+        page=request.args.get('page', 1, type=int), per_page=50, error_out=False
+    )
+    pending = pending_roster_query(course.id, academic_year, semester).paginate(
+        page=request.args.get('pending_page', 1, type=int), per_page=50, error_out=False
+    )
+    section = CourseSection.query.filter_by(course_id=course.id, academic_year=academic_year, semester=semester).first()
+    waitlist = waitlist_query(section.id).paginate(
+        page=request.args.get('waitlist_page', 1, type=int), per_page=50, error_out=False
+    ) if section else None
+    return render_template(
+        'admin/module_roster.html',
+        course=course,
+        periods=periods,
+        academic_year=academic_year,
+        semester=semester,
+        enrolled=enrolled,
+        pending=pending,
+        section=section,
+        waitlist=waitlist
+    )
+
+def _roster_redirect(course_id):
+    return redirect(url_for('admin.module_roster', course_id=course_id, period=request.form.get('period')))
+
+@admin_bp.route('/modules/<int:course_id>/capacity', methods=['POST'])
+@admin_required
+def set_module_capacity(course_id):
+    """Set (or, left blank, remove) a module's capacity for a period; waitlisted students fill any new seats."""
+    course = Course.query.get_or_404(course_id)
+    academic_year, _, semester = request.form.get('period', '').partition('|')
+    raw = request.form.get('capacity', '').strip()
+    capacity = request.form.get('capacity', type=int) if raw else None
+    if not academic_year or not semester or (raw and (capacity is None or capacity < 0)):
+        flash('Capacity must be a whole number of seats, or blank for no limit.', 'danger')
+        return _roster_redirect(course.id)
+
+    promoted = set_capacity(course.id, academic_year, semester, capacity)
+    db.session.commit()
+    limit = f"{capacity} seat(s)" if capacity is not None else "no limit"
+    audit.record('modules.capacity', f"{course.code} {academic_year} {semester}: {limit}, "
+                                     f"{len(promoted)} promoted from the waitlist")
+    flash(f"{course.code} now has {limit} for {academic_year} {semester}."
+          + (f" {len(promoted)} waitlisted student(s) enrolled." if promoted else ''), 'success')
+    return _roster_redirect(course.id)
+
+@admin_bp.route('/modules/<int:course_id>/drop/<int:student_id>', methods=['POST'])
+@admin_required
+def drop_module_enrollment(course_id, student_id):
+    """Take a student off a module; the first student on its waitlist gets the seat."""
+    course = Course.query.get_or_404(course_id)
+    student = Student.query.get_or_404(student_id)
+    academic_year, _, semester = request.form.get('period', '').partition('|')
+    enrollment = CourseEnrollment.query.filter_by(
+        student_id=student.id, course_id=course.id, academic_year=academic_year, semester=semester
+    ).first()
+    if enrollment is None:
+        flash(f'{student.student_number} is not enrolled on {course.code} for {academic_year} {semester}.', 'warning')
+        return _roster_redirect(course.id)
+    if enrollment.grade or enrollment.marks is not None:
+        flash(f'{student.student_number} already has marks on {course.code}; remove them before dropping the module.', 'danger')
+        return _roster_redirect(course.id)
+
+    _, promoted = drop_enrollment(student.id, course.id, academic_year, semester)
+    db.session.commit()
+    audit.record('modules.drop', f"{student.student_number} dropped from {course.code} {academic_year} {semester}"
+                                 + (f"; {len(promoted)} promoted from the waitlist" if promoted else ''))
+    flash(f'{student.student_number} dropped from {course.code}.'
+          + (f' {len(promoted)} waitlisted student(s) enrolled.' if promoted else ''), 'success')
+    return _roster_redirect(course.id)
+
+@admin_bp.route('/modules/<int:course_id>/waitlist/<int:student_id>/remove', methods=['POST'])
+@admin_required
+def remove_from_waitlist(course_id, student_id):
+    course = Course.query.get_or_404(course_id)
+    student = Student.query.get_or_404(student_id)
+    academic_year, _, semester = request.form.get('period', '').partition('|')
+    if leave_waitlist(student.id, course.id, academic_year, semester):
+        db.session.commit()
+        audit.record('modules.waitlist_remove', f"{student.student_number} off the {course.code} waitlist "
+                                                f"{academic_year} {semester}")
+        flash(f'{student.student_number} removed from the {course.code} waitlist.', 'success')
+    else:
+        flash(f'{student.student_number} is not on the {course.code} waitlist.', 'warning')
+    return _roster_redirect(course.id)
+
+# -----------------
+# Timetable
+# -----------------
+def _clock(value):
+    """HH:MM from a form field as a datetime.time; raises ValueError."""
+    return datetime.strptime(value.strip(), '%H:%M').time()
+
+@admin_bp.route('/timetable')
+@admin_required
+def timetable():
+    periods = timetable_periods()
+    academic_year, semester = _selected_period(periods)
+    slots = TimetableSlot.query.options(
+        joinedload(TimetableSlot.course), joinedload(TimetableSlot.lecturer)
+    ).filter_by(academic_year=academic_year, semester=semester).order_by(
+        TimetableSlot.day_of_week, TimetableSlot.start_time, TimetableSlot.venue
+    ).all()
+    return render_template(
+        'admin/timetable.html',
+        periods=periods,
+        academic_year=academic_year,
+        semester=semester,
+        slots=slots,
+        courses=Course.query.order_by(Course.code).all(),
+        lecturers=Lecturer.query.order_by(Lecturer.name).all(),
+        days=TimetableSlot.DAYS
+    )
+
+@admin_bp.route('/timetable/add', methods=['POST'])
+@admin_required
+def add_timetable_slot():
+    period = request.form.get('period', '')
+    academic_year, _, semester = period.partition('|')
+    course = Course.query.get(request.form.get('course_id', type=int) or 0)
+    day = request.form.get('day_of_week', type=int)
+    venue = request.form.get('venue', '').strip()
+    try:
+        start, end = _clock(request.form.get('start_time', '')), _clock(request.form.get('end_time', ''))
+    except ValueError:
+        start = end = None
+
+    if not course or not academic_year or not semester or day not in range(len(TimetableSlot.DAYS)) or not venue:
+        flash('Choose a period, course, day and venue.', 'danger')
+        return redirect(url_for('admin.timetable', period=period))
+    if not start or not end or end <= start:
+        flash('Times must be HH:MM with the end after the start.', 'danger')
+        return redirect(url_for('admin.timetable', period=period))
+
+    slot = TimetableSlot(
+        course_id=course.id, academic_year=academic_year, semester=semester, day_of_week=day,
+        start_time=start, end_time=end, venue=venue,
+        lecturer_id=request.form.get('lecturer_id', type=int) or course.primary_lecturer_id,
+        session_type=request.form.get('session_type') or 'Lecture'
+    )
+    venue_clashes, lecturer_clashes, students = slot_conflicts(slot)
+    if venue_clashes or lecturer_clashes:
+        taken = [f"{other.course.code} in {other.venue}" for other in venue_clashes + lecturer_clashes]
+        flash(f"Not saved: {venue if venue_clashes else 'the lecturer'} is already booked then "
+              f"({', '.join(dict.fromkeys(taken))}).", 'danger')
+        return redirect(url_for('admin.timetable', period=period))
+
+    db.session.add(slot)
+    db.session.commit()
+    audit.record('timetable.add', f"{course.code} {academic_year} {semester}: {slot.day_name} "
+                                  f"{start:%H:%M}-{end:%H:%M} in {venue}")
+    flash(f"{course.code} scheduled on {slot.day_name} {start:%H:%M}-{end:%H:%M}.", 'success')
+    if students:
+        flash(f"{students} student(s) taking {course.code} have another class at that time.", 'warning')
+    return redirect(url_for('admin.timetable', period=period))
+
+@admin_bp.route('/timetable/<int:slot_id>/delete', methods=['POST'])
+@admin_required
+def delete_timetable_slot(slot_id):
+    slot = TimetableSlot.query.get_or_404(slot_id)
+    period = f"{slot.academic_year}|{slot.semester}"
+    description = (f"{slot.course.code} {slot.academic_year} {slot.semester}: {slot.day_name} "
+                   f"{slot.start_time:%H:%M}-{slot.end_time:%H:%M} in {slot.venue}")
+    db.session.delete(slot)
+    db.session.commit()
+    audit.record('timetable.delete', description)
+    flash('Timetable slot removed.', 'success')
+    return redirect(url_for('admin.timetable', period=period))
+
+@admin_bp.route('/timetable/validate')
+@admin_required
+def validate_timetable_period():
+    """Every venue, lecturer and student clash of a period."""
+    periods = timetable_periods()
+    academic_year, semester = _selected_period(periods)
+    report = validate_timetable(academic_year, semester) if academic_year else None
+    return render_template(
+        'admin/timetable_validate.html',
+        periods=periods,
+        academic_year=academic_year,
+        semester=semester,
+        report=report
+    )
+
+# -----------------
+# Exam Dockets
+# -----------------
+def _selected_assessment():
+    """The assessment chosen with ?assessment=, else the first one."""
+    assessment = (request.values.get('assessment') or '').upper()
+    return assessment if assessment in thresholds() else next(iter(thresholds()))
+
+@admin_bp.route('/dockets')
+@admin_required
+def dockets():
+    """Students eligible for an assessment's docket per course, for printing each exam sitting."""
+    periods = module_periods()
+    academic_year, semester = _selected_period(periods)
+    assessment = _selected_assessment()
+    counts = course_docket_counts(academic_year, semester, assessment) if academic_year else {}
+    courses = Course.query.filter(Course.id.in_(list(counts))).order_by(Course.code).all() if counts else []
+    return render_template(
+        'admin/dockets.html',
+        periods=periods,
+        academic_year=academic_year,
+        semester=semester,
+        assessment=assessment,
+        thresholds=thresholds(),
+        eligible=eligibility_counts(),
+        courses=courses,
+        counts=counts
+    )
+
+@admin_bp.route('/dockets/<int:course_id>/print')
+@admin_required
+def print_dockets(course_id):
+    """Every eligible student's docket for one course's sitting, as one PDF."""
+    course = Course.query.get_or_404(course_id)
+    academic_year, semester = _selected_period(module_periods())
+    assessment = _selected_assessment()
+    if not signing_configured():
+        flash(NO_SIGNING_KEY, 'danger')
+        return redirect(url_for('admin.dockets', period=f"{academic_year}|{semester}", assessment=assessment))
+    dockets = docket_rows(academic_year, semester, assessment, course_id=course.id)
+    if not dockets:
+        flash(f'No student on {course.code} is eligible for the {assessment} docket.', 'warning')
+        return redirect(url_for('admin.dockets', period=f"{academic_year}|{semester}", assessment=assessment))
+
+    pdf = render_dockets(dockets)
+    audit.record('dockets.print', f"{len(dockets)} {assessment} docket(s) for {course.code} {academic_year} {semester}")
+    filename = secure_filename(f"Dockets_{assessment}_{course.code}_{academic_year}_{semester}.pdf")
+    return send_file(io.BytesIO(pdf), mimetype='application/pdf', download_name=filename, as_attachment=True)
+
+@admin_bp.route('/dockets/refresh', methods=['POST'])
+@admin_required
+def refresh_dockets():
+    """Recompute every student's docket eligibility, e.g. after the thresholds changed."""
+    students = refresh_eligibility()
+    db.session.commit()
+    audit.record('dockets.refresh', f"Docket eligibility recomputed for {students} student(s)")
+    flash(f'Docket eligibility recomputed for {students} student(s).', 'success')
+    return redirect(url_for('admin.dockets', period=request.form.get('period'), assessment=_selected_assessment()))
+
+# -----------------
+# Exam Seating
+# -----------------
+def _exam_redirect():
+    return redirect(url_for('admin.exams', period=request.form.get('period'), assessment=_selected_assessment()))
+
+@admin_bp.route('/exams')
+@admin_required
+def exams():
+    """Exam halls, the sessions of a period's assessment and the seats planned in them."""
+    periods = module_periods()
+    academic_year, semester = _selected_period(periods)
+    assessment = _selected_assessment()
+    return render_template(
+        'admin/exams.html',
+        periods=periods,
+        academic_year=academic_year,
+        semester=semester,
+        assessment=assessment,
+        thresholds=thresholds(),
+        halls=seating_halls(),
+        sessions=seating_summary(academic_year, semester, assessment) if academic_year else []
+    )
+
+@admin_bp.route('/exams/halls/add', methods=['POST'])
+@admin_required
+def add_exam_hall():
+    name = request.form.get('name', '').strip()
+    capacity = request.form.get('capacity', type=int)
+    seats_per_row = request.form.get('seats_per_row', type=int)
+    if not name or not capacity or capacity < 1 or not seats_per_row or seats_per_row < 1:
+        flash('Give the hall a name, a capacity and the number of seats per row.', 'danger')
+        return _exam_redirect()
+    if ExamHall.query.filter_by(name=name).first():
+        flash(f'There is already a hall called {name}.', 'danger')
+        return _exam_redirect()
+
+    db.session.add(ExamHall(name=name, capacity=capacity, seats_per_row=seats_per_row))
+    db.session.commit()
+    audit.record('exams.hall_add', f"{name}: {capacity} seats, {seats_per_row} per row")
+    flash(f'{name} added. Allocate seats again to use it.', 'success')
+    return _exam_redirect()
+
+@admin_bp.route('/exams/halls/<int:hall_id>/delete', methods=['POST'])
+@admin_required
+def delete_exam_hall(hall_id):
+    hall = ExamHall.query.get_or_404(hall_id)
+    seats = ExamSeat.query.filter_by(hall_id=hall.id).delete(synchronize_session=False)
+    db.session.delete(hall)
+    db.session.commit()
+    audit.record('exams.hall_delete', f"{hall.name} ({seats} seat(s) released)")
+    flash(f'{hall.name} removed.' + (f' {seats} allocated seat(s) were released: allocate again.' if seats else ''),
+          'warning' if seats else 'success')
+    return _exam_redirect()
+
+@admin_bp.route('/exams/sessions/add', methods=['POST'])
+@admin_required
+def add_exam_session():
+    academic_year, _, semester = request.form.get('period', '').partition('|')
+    assessment = _selected_assessment()
+    duration = request.form.get('duration_minutes', type=int)
+    try:
+        starts_at = datetime.strptime(
+            f"{request.form.get('date', '').strip()} {request.form.get('start_time', '').strip()}", '%Y-%m-%d %H:%M'
+        )
+    except ValueError:
+        starts_at = None
+
+    if not academic_year or not semester or not starts_at or not duration or duration < 1:
+        flash('Choose a period, a date, a start time and a duration.', 'danger')
+        return _exam_redirect()
+
+    db.session.add(ExamSession(
+        academic_year=academic_year, semester=semester, assessment=assessment,
+        starts_at=starts_at, duration_minutes=duration
+    ))
+    db.session.commit()
+    audit.record('exams.session_add', f"{assessment} {academic_year} {semester}: {starts_at:%d-%m-%Y %H:%M}, {duration} min")
+    flash(f'{assessment} session added for {starts_at:%a %d-%m-%Y %H:%M}.', 'success')
+    return _exam_redirect()
+
+@admin_bp.route('/exams/sessions/<int:exam_session_id>/delete', methods=['POST'])
+@admin_required
+def delete_exam_session(exam_session_id):
+    exam_session = ExamSession.query.get_or_404(exam_session_id)
+    seats = ExamSeat.query.filter_by(session_id=exam_session.id).delete(synchronize_session=False)
+    db.session.delete(exam_session)
+    db.session.commit()
+    audit.record('exams.session_delete', f"{exam_session.assessment} {exam_session.academic_year} "
+                                         f"{exam_session.semester}: {exam_session.starts_at:%d-%m-%Y %H:%M} "
+                                         f"({seats} seat(s) released)")
+    flash('Exam session removed.' + (f' {seats} allocated seat(s) were released: allocate again.' if seats else ''),
+          'warning' if seats else 'success')
+    return _exam_redirect()
+
+@admin_bp.route('/exams/allocate', methods=['POST'])
+@admin_required
+def allocate_exam_seats():
+    """Plan the sessions and seats of a period's assessment afresh, replacing the current plan."""
+    academic_year, _, semester = request.form.get('period', '').partition('|')
+    assessment = _selected_assessment()
+    if not academic_year or not semester:
+        flash('Choose a period to allocate.', 'danger')
+        return _exam_redirect()
+
+    report = plan_seating(academic_year, semester, assessment)
+    db.session.commit()
+    audit.record('exams.allocate', f"{assessment} {academic_year} {semester}: {report['seats']} seat(s) for "
+                                   f"{report['students']} student(s) in {report['sessions']} session(s)")
+    flash(f"Allocated {report['seats']} seat(s) for {report['students']} student(s) on {report['courses']} course(s) "
+          f"in {report['seconds']:.2f}s.", 'success')
+    if report['unscheduled']:
+        courses = ', '.join(f"{code} ({students})" for code, students in report['unscheduled'])
+        flash(f"No session had room for: {courses}. Add sessions or halls and allocate again.", 'danger')
+    if report['adjacent_conflicts']:
+        flash(f"{report['adjacent_conflicts']} pair(s) of neighbouring students sit the same course: "
+              f"the halls were too full to keep them apart.", 'warning')
+    return _exam_redirect()
+
+@admin_bp.route('/exams/<int:exam_session_id>/halls/<int:hall_id>/dockets')
+@admin_required
+def print_hall_dockets(exam_session_id, hall_id):
+    """The dockets of everyone seated in one hall for one session, in seat order, as one PDF."""
+    exam_session = ExamSession.query.get_or_404(exam_session_id)
+    hall = ExamHall.query.get_or_404(hall_id)
+    if not signing_configured():
+        flash(NO_SIGNING_KEY, 'danger')
+        return redirect(url_for('admin.exams', period=f"{exam_session.academic_year}|{exam_session.semester}",
+                                assessment=exam_session.assessment))
+    dockets = docket_rows(exam_session.academic_year, exam_session.semester, exam_session.assessment,
+                          exam_session_id=exam_session.id, hall_id=hall.id)
+    if not dockets:
+        flash(f'Nobody is seated in {hall.name} for that session.', 'warning')
+        return redirect(url_for('admin.exams', period=f"{exam_session.academic_year}|{exam_session.semester}",
+                                assessment=exam_session.assessment))
+
+    pdf = render_dockets(dockets)
+    audit.record('dockets.print', f"{len(dockets)} {exam_session.assessment} docket(s) for {hall.name} "
+                                  f"{exam_session.starts_at:%d-%m-%Y %H:%M}")
+    filename = secure_filename(f"Dockets_{exam_session.assessment}_{hall.name}_{exam_session.starts_at:%Y%m%d_%H%M}.pdf")
+    return send_file(io.BytesIO(pdf), mimetype='application/pdf', download_name=filename, as_attachment=True)
@@ -3,10 +3,12 @@ from flask import Blueprint, render_template, request, jsonify, current_app
 from openai import OpenAI, APIError, RateLimitError, APIStatusError
 from httpx import Timeout
 from app.models import ChatbotMessage, db
+from app.utils.metrics import CHATBOT_MATCH_SECONDS
 
 import os
 import logging
 import re
+import time
 from datetime import datetime
 from dotenv import load_dotenv
 from sqlalchemy.exc import SQLAlchemyError
@@ -174,7 +176,14 @@ class CavendishChatbot:
         return False
 
     def _extract_context(self, message):
-        """Extract context and keywords from message"""
+        """Extract context and keywords from message (timed for the matcher latency metric)"""
+        start = time.perf_counter()
+        context = self._match_context(message)
+        CHATBOT_MATCH_SECONDS.observe(time.perf_counter() - start, category=context)
+        return context
+
+    def _match_context(self, message):
+        """Return the category that best matches the message"""
         message_lower = message.lower()
         
         # Check for greetings
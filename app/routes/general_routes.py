@@ -1,8 +1,10 @@
 # app/routes/general_routes.py
-from flask import Blueprint, render_template, request, flash, redirect, url_for
+from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify, current_app
 from app.models import User
-from app.extensions import db, mail
-from flask_mail import Message
+from app.extensions import db
+from app.utils.docket_tokens import VERIFY_PATH, verify_token, verify_tokens
+from app.utils.mailer import enqueue_email
+from app.utils.signing import signing_configured
 from werkzeug.security import generate_password_hash
 import secrets
 from datetime import datetime, timedelta
@@ -30,13 +32,12 @@ def forgot_password():
         token = secrets.token_urlsafe(32)
         user.reset_token = token
         user.reset_token_expiry = datetime.utcnow() + timedelta(hours=1)
-        db.session.commit()
 
-        # Send email with reset link
+        # Queue the email with the reset link; mail_worker.py delivers it
         reset_link = url_for('general.reset_password', token=token, _external=True)
-        msg = Message(
-            subject="Password Reset Request",
-            recipients=[email],
+        enqueue_email(
+            email,
+            "Password Reset Request",
             html=f"""
                 <p>Hello {user.username},</p>
                 <p>You requested a password reset. Click the link below to reset your password:</p>
@@ -44,7 +45,7 @@ def forgot_password():
                 <p>If you didn't request this, ignore this email.</p>
             """
         )
-        mail.send(msg)
+        db.session.commit()
         flash("A password reset link has been sent to your email.", "success")
         return redirect(url_for('general.forgot_password'))
 
@@ -88,3 +89,44 @@ def reset_password(token):
             return redirect(url_for('auth.student_login'))
 
     return render_template('reset_password.html', token=token)
+
+
+# -------------------------------
+# DOCKET VERIFICATION
+# -------------------------------
+# Both routes only check signatures: no query runs, so they keep answering at
+# the exam door while the database is busy (query_budget.py holds them to 0).
+@general.route(VERIFY_PATH + '<path:token>')
+def verify_docket(token):
+    """What an invigilator sees after scanning a docket's QR code."""
+    response = current_app.make_response(render_template('docket_verify.html', check=verify_token(token)))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@general.route('/api/dockets/verify', methods=['POST'])
+def verify_dockets():
+    """
+    Verify a hall's scan list: {"tokens": [scanned tokens or links], "assessment": "FINAL"}.
+    Returns one result per scan, in order, with totals.
+    """
+    if session.get('role') not in ('admin', 'lecturer'):
+        return jsonify({'error': 'Log in as an administrator or lecturer to verify dockets.'}), 403
+    if not signing_configured():
+        return jsonify({'error': 'Docket verification is not configured: set DOCKET_SIGNING_KEY.'}), 503
+
+    data = request.get_json(silent=True) or {}
+    scans = data.get('tokens')
+    if not isinstance(scans, list) or not all(isinstance(scan, str) for scan in scans):
+        return jsonify({'error': 'Send {"tokens": [...]} with the scanned dockets.'}), 400
+    limit = current_app.config['DOCKET_VERIFY_MAX_TOKENS']
+    if len(scans) > limit:
+        return jsonify({'error': f'At most {limit} dockets can be verified per request.'}), 413
+
+    results = verify_tokens(scans, assessment=(data.get('assessment') or '').upper() or None)
+    return jsonify({
+        'results': results,
+        'valid': sum(result['valid'] for result in results),
+        'invalid': sum(not result['valid'] for result in results),
+        'duplicates': sum(result['duplicate'] for result in results),
+    })
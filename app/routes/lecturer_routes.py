@@ -1,29 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, g, abort
 from functools import wraps
+from flask_login import login_user, logout_user
+from sqlalchemy import func
+from sqlalchemy.orm import contains_eager
 from ..extensions import db
-from ..models import User, Lecturer, UserRole
+from ..models import User, Lecturer, UserRole, Course, CourseEnrollment, Student
 import re
 
-# --- Mock Authentication Setup (Simulates Flask-Login) ---
-# In a real Flask app, you would use Flask-Login or similar for proper authentication.
-# We are using a mock object to allow the templates to render without the full auth setup.
-
-class MockUser:
-    """A simple class to hold mock user data and state."""
-    def __init__(self, is_authenticated=False):
-        self.is_authenticated = is_authenticated
-        self.id = 'LCT-1001'
-        self.name = 'Dr. Elara Vance'
-        self.email = 'elara.vance@university.edu'
-        self.course_count = 2
-
-    def is_lecturer(self):
-        """Used in the navigation bar logic."""
-        return True
-
-# Global Mock User State
-current_user = MockUser(is_authenticated=False)
-
 # --- Validation Helper Functions ---
 def validate_password(password):
     """Validate password strength."""
@@ -42,37 +25,59 @@ def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
-def login_required(f):
-    """A decorator to restrict access to authenticated users."""
+def lecturer_required(f):
+    """Restrict a route to a logged-in lecturer and load their profile into g.lecturer."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated:
+        lecturer_id = session.get('lecturer_id')
+        if session.get('role') != 'lecturer' or not lecturer_id:
+            flash('Please log in to access this page.', 'warning')
+            return redirect(url_for('lecturer.lecturer_login'))
+        g.lecturer = db.session.get(Lecturer, lecturer_id)
+        if g.lecturer is None:
+            # Profile deleted since login
+            session.pop('user_id', None)
+            session.pop('role', None)
+            session.pop('lecturer_id', None)
             flash('Please log in to access this page.', 'warning')
-            # Redirect to the login route defined in this blueprint
-            return redirect(url_for('lecturer.lecturer_login')) 
+            return redirect(url_for('lecturer.lecturer_login'))
         return f(*args, **kwargs)
     return decorated_function
 
+def course_summaries(lecturer_id):
+    """The lecturer's courses with per-course student counts, in one grouped query."""
+    rows = db.session.query(
+        Course, func.count(func.distinct(CourseEnrollment.student_id))
+    ).outerjoin(
+        CourseEnrollment, CourseEnrollment.course_id == Course.id
+    ).filter(
+        Course.primary_lecturer_id == lecturer_id
+    ).group_by(Course.id).order_by(Course.code).all()
+    return [
+        {'id': course.id, 'course_code': course.code, 'course_title': course.title,
+         'credits': course.credits, 'students_count': count}
+        for course, count in rows
+    ]
+
+def roster_query(lecturer_id, course_id=None):
+    """Enrollments in the lecturer's courses (optionally one course), with student and course loaded."""
+    query = CourseEnrollment.query.join(
+        CourseEnrollment.course
+    ).join(
+        CourseEnrollment.student
+    ).options(
+        contains_eager(CourseEnrollment.course), contains_eager(CourseEnrollment.student)
+    ).filter(Course.primary_lecturer_id == lecturer_id)
+    if course_id is not None:
+        query = query.filter(CourseEnrollment.course_id == course_id)
+    return query.order_by(Student.name, Student.id, Course.code)
+
 # --- Blueprint Definition ---
 # This is the object that app/__init__.py needs to import!
 import os
 template_dir = os.path.join(os.path.dirname(__file__), '..', 'templates', 'lecturer')
 lecturer_bp = Blueprint('lecturer', __name__, url_prefix='/lecturer', template_folder=template_dir)
 
-# --- Mock Data for Templates ---
-MOCK_COURSES = [
-    {'id': 101, 'course_code': 'CS-101', 'course_title': 'Introduction to Programming', 'students_count': 45},
-    {'id': 205, 'course_code': 'MA-205', 'course_title': 'Discrete Mathematics', 'students_count': 62},
-]
-
-MOCK_STUDENTS = [
-    {'reg_number': 'CAV/001/22', 'name': 'Alice Johnson', 'email': 'alice@student.edu'},
-    {'reg_number': 'CAV/002/22', 'name': 'Bob Smith', 'email': 'bob@student.edu'},
-    {'reg_number': 'CAV/003/22', 'name': 'Charlie Brown', 'email': 'charlie@student.edu'},
-    {'reg_number': 'CAV/004/22', 'name': 'Diana Prince', 'email': 'diana@student.edu'},
-]
-ALL_STUDENTS_COUNT = len(MOCK_STUDENTS)
-
 # --- Routes ---
 
 @lecturer_bp.route('/login', methods=['GET', 'POST'])
@@ -97,9 +102,11 @@ def lecturer_login():
         
         # Check against User table with role='lecturer'
         user = User.query.filter_by(email=email, role='lecturer').first()
-        if user and user.check_password(password):
+        if user and user.lecturer_id and user.check_password(password):
             session['user_id'] = user.id
             session['role'] = 'lecturer'
+            session['lecturer_id'] = user.lecturer_id
+            login_user(user)  # the results blueprint authenticates through Flask-Login
             flash('Login successful! Welcome back.', 'success')
             return redirect(url_for('lecturer.dashboard'))
         else:
@@ -189,48 +196,92 @@ def lecturer_register():
     return render_template('lecturer_register.html')
 
 @lecturer_bp.route('/dashboard')
-@login_required
+@lecturer_required
 def dashboard():
     """Displays the lecturer's main dashboard (URL: /lecturer/dashboard)."""
-    return render_template('dashboard.html', current_user=current_user, courses=MOCK_COURSES)
+    courses = course_summaries(g.lecturer.id)
+    total_students = db.session.query(
+        func.count(func.distinct(CourseEnrollment.student_id))
+    ).join(Course).filter(Course.primary_lecturer_id == g.lecturer.id).scalar()
+    return render_template(
+        'lecturer/dashboard.html',
+        lecturer=g.lecturer,
+        courses=courses,
+        total_students=total_students
+    )
+
+def _selected_course(courses):
+    """Validate ?course_id= against the lecturer's own courses; None means all of them."""
+    selected = request.args.get('course_id', 'all')
+    if selected in ('', 'all'):
+        return None
+    try:
+        course_id = int(selected)
+    except ValueError:
+        abort(404)
+    course = next((c for c in courses if c['id'] == course_id), None)
+    if course is None:
+        abort(404)
+    return course
 
 @lecturer_bp.route('/students')
-@login_required
+@lecturer_required
 def students():
     """Displays a list of students, filterable by course (URL: /lecturer/students)."""
-    selected_course_id = request.args.get('course_id', 'all')
-    
-    # Mock filtering logic
-    filtered_students = MOCK_STUDENTS 
-    
+    courses = course_summaries(g.lecturer.id)
+    course = _selected_course(courses)
+    page = request.args.get('page', 1, type=int)
+    pagination = roster_query(g.lecturer.id, course['id'] if course else None).paginate(
+        page=page, per_page=50, error_out=False
+    )
+
     return render_template(
-        'students.html',
-        current_user=current_user,
-        students=filtered_students,
-        courses_taught=MOCK_COURSES,
-        selected_course_id=selected_course_id,
-        all_students_count=ALL_STUDENTS_COUNT
+        'lecturer/students.html',
+        lecturer=g.lecturer,
+        enrollments=pagination.items,
+        pagination=pagination,
+        courses_taught=courses,
+        selected_course_id=course['id'] if course else 'all',
+        selected_course=course
     )
 
 @lecturer_bp.route('/results')
-@login_required
+@lecturer_required
 def results():
-    """Page for entering and managing student results (URL: /lecturer/results)."""
-    # NOTE: The template for this is still missing.
-    return render_template('results.html', current_user=current_user)
+    """Current grades for one of the lecturer's courses (URL: /lecturer/results)."""
+    courses = course_summaries(g.lecturer.id)
+    course = _selected_course(courses)
+    pagination = None
+    if course:
+        pagination = roster_query(g.lecturer.id, course['id']).paginate(
+            page=request.args.get('page', 1, type=int), per_page=50, error_out=False
+        )
+    return render_template(
+        'lecturer/results.html',
+        lecturer=g.lecturer,
+        courses=courses,
+        selected_course=course,
+        pagination=pagination
+    )
 
 @lecturer_bp.route('/profile')
-@login_required
+@lecturer_required
 def profile():
     """Displays the lecturer's profile information (URL: /lecturer/profile)."""
-    # NOTE: The template for this is still missing.
-    return render_template('profile.html', current_user=current_user)
+    return render_template(
+        'lecturer/profile.html',
+        lecturer=g.lecturer,
+        user=User.query.filter_by(lecturer_id=g.lecturer.id).first(),
+        courses=course_summaries(g.lecturer.id)
+    )
 
 @lecturer_bp.route('/logout')
 def logout():
     """Handles lecturer logout (URL: /lecturer/logout)."""
-    global current_user
-    if current_user.is_authenticated:
-        current_user = MockUser(is_authenticated=False) # 'Log out' the mock user
+    if session.get('role') == 'lecturer':
+        session.pop('user_id', None)
+        session.pop('role', None)
+        session.pop('lecturer_id', None)
+        logout_user()
         flash('You have been successfully logged out.', 'success')
-    return redirect(url_for('lecturer.lecturer_login'))
\ No newline at end of file
+    return redirect(url_for('lecturer.lecturer_login'))
@@ -1,7 +1,12 @@
 #app/routes/results.py
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify
 from flask_login import login_required, current_user
+from sqlalchemy.orm import contains_eager
 from app.models import db, User, UserRole, Student, Course, CourseEnrollment, Lecturer
+from app.utils.student_search import typeahead
+from app.utils.grades import publish_grades, MAX_BATCH_GRADES
+from app.utils.gpa import student_gpa
+from app.extensions import audit
 
 results_bp = Blueprint('results', __name__)
 
@@ -64,6 +69,46 @@ def publish_grade():
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error publishing grade: {str(e)}'}), 500
 
+@results_bp.route('/publish/batch', methods=['POST'])
+@login_required
+def publish_grades_batch():
+    """
+    Publish many grades at once from a grade-entry grid.
+    Body: {"grades": [{student_number, course_code, grade, academic_year, semester}, ...],
+           "academic_year": ..., "semester": ...}  (top-level values fill in missing ones)
+    Returns a result per entry, in order.
+    """
+    if not current_user.is_lecturer() and current_user.role != UserRole.ADMIN:
+        return jsonify({'success': False, 'message': 'Access denied.'}), 403
+
+    if current_user.is_lecturer() and not current_user.lecturer_profile:
+        return jsonify({'success': False, 'message': 'Lecturer profile not linked.'}), 400
+
+    data = request.get_json(silent=True)
+    entries = data.get('grades') if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'message': 'Send a non-empty "grades" array.'}), 400
+    if len(entries) > MAX_BATCH_GRADES:
+        return jsonify({'success': False, 'message': f'At most {MAX_BATCH_GRADES} grades per request.'}), 413
+
+    defaults = {key: data.get(key) for key in ('academic_year', 'semester')} if isinstance(data, dict) else {}
+    lecturer_id = current_user.lecturer_profile.id if current_user.is_lecturer() else None
+    try:
+        results = publish_grades(entries, lecturer_id=lecturer_id, defaults=defaults)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': f'Error publishing grades: {str(e)}'}), 500
+
+    updated = sum(1 for result in results if result['status'] == 'updated')
+    if updated:
+        audit.record('grades.publish', f"{updated} grade(s) published by {current_user.username}")
+    return jsonify({
+        'success': updated == len(results),
+        'updated': updated,
+        'failed': len(results) - updated,
+        'results': results
+    })
+
 # FIXED: Added missing student_id parameter to route
 @results_bp.route('/view/<int:student_id>')
 @login_required
@@ -72,7 +117,7 @@ def view_student_results(student_id):
     # FIXED: Corrected admin check
     if not current_user.is_lecturer() and current_user.role != UserRole.ADMIN:
         flash('Access denied.', 'error')
-        return redirect(url_for('auth.login'))
+        return redirect(url_for('index'))
 
     student = Student.query.get(student_id)
     if not student:
@@ -99,10 +144,7 @@ def manage_results():
     """Management view for all course enrollments (grades)."""
     if not current_user.is_lecturer() and current_user.role != UserRole.ADMIN:
         flash('Access denied.', 'error')
-        return redirect(url_for('auth.login'))
-
-    # Get all students for search/dropdown
-    all_students = Student.query.all()
+        return redirect(url_for('index'))
 
     # Base query joining necessary tables
     enrollments_query = CourseEnrollment.query.join(Student).join(Course)
@@ -119,9 +161,17 @@ def manage_results():
     ).all()
 
     return render_template('admin/results_management.html', 
-                         students=all_students, 
                          enrollments=results)
 
+@results_bp.route('/students/search')
+@login_required
+def student_typeahead():
+    """JSON student matches for the results page search box (replaces the full dropdown)."""
+    if not current_user.is_lecturer() and current_user.role != UserRole.ADMIN:
+        return jsonify({'error': 'Access denied'}), 403
+
+    return jsonify({'results': typeahead(request.args.get('q', ''))})
+
 @results_bp.route('/bulk-upload', methods=['POST'])
 @login_required
 def bulk_upload():
@@ -153,25 +203,32 @@ def my_results():
     """Student view of their own results."""
     if not current_user.is_student() or not current_user.student_profile:
         flash('Access denied. Students only.', 'error')
-        return redirect(url_for('auth.login'))
+        return redirect(url_for('student.student_login'))
 
-    student_id = current_user.student_profile.id
-    student_enrollments = CourseEnrollment.query.filter_by(student_id=student_id).order_by(
+    student = current_user.student_profile
+    student_enrollments = CourseEnrollment.query.filter_by(student_id=student.id).join(Course).options(
+        contains_eager(CourseEnrollment.course)
+    ).order_by(
         CourseEnrollment.academic_year.desc(),
         CourseEnrollment.semester.desc()
     ).all()
 
-    # Calculate grade distribution (simplified stats)
-    total_courses = len(student_enrollments)
-    grade_count = {}
-    for enrollment in student_enrollments:
-        grade = enrollment.grade or 'N/A'
-        grade_count[grade] = grade_count.get(grade, 0) + 1
+    results_data = [{
+        'course_code': enrollment.course.code,
+        'course_name': enrollment.course.title,
+        'grade': enrollment.grade or '',
+        'marks': enrollment.marks if enrollment.marks is not None else '',
+        'semester': enrollment.semester,
+        'academic_year': enrollment.academic_year
+    } for enrollment in student_enrollments]
 
-    return render_template('student/results.html', 
-                         enrollments=student_enrollments, 
-                         total_courses=total_courses, 
-                         grade_count=grade_count)
+    marks = [enrollment.marks for enrollment in student_enrollments if enrollment.marks is not None]
+    return render_template('student/results.html',
+                         results=results_data,
+                         average_marks=sum(marks) / len(marks) if marks else 0.0,
+                         student=student,
+                         can_view=True,
+                         gpa=student_gpa(student, student_enrollments))
 
 # ------------------------------------------------------------
 # API ENDPOINTS
@@ -182,11 +239,17 @@ def my_results():
 @login_required
 def get_student_results_api(student_id):
     """API endpoint to get results (enrollments) for a student."""
-    if not current_user.is_lecturer() and current_user.role != UserRole.ADMIN:
+    if current_user.is_student():
+        # Students may only read their own results
+        if current_user.student_id != student_id:
+            return jsonify({'error': 'Access denied'}), 403
+    elif not current_user.is_lecturer() and current_user.role != UserRole.ADMIN:
         return jsonify({'error': 'Access denied'}), 403
 
     # Query CourseEnrollment and join with Course
-    enrollments = CourseEnrollment.query.filter_by(student_id=student_id).join(Course).all()
+    enrollments = CourseEnrollment.query.filter_by(student_id=student_id).join(Course).options(
+        contains_eager(CourseEnrollment.course)
+    ).all()
     
     results_data = [{
         'id': enrollment.id,
@@ -231,7 +294,7 @@ def results_analysis():
     """General analysis of enrollment/grade data."""
     if not current_user.is_lecturer() and current_user.role != UserRole.ADMIN:
         flash('Access denied.', 'error')
-        return redirect(url_for('auth.login'))
+        return redirect(url_for('index'))
 
     # Get results statistics
     total_enrollments = CourseEnrollment.query.count()
@@ -1,26 +1,32 @@
 # ---- app/routes/student_routes.py ----
 import os
 import io
+import math
 from flask import (
     Blueprint, render_template, request, redirect, url_for, flash, 
     current_app, send_from_directory, session, make_response, send_file
 )
+from flask_login import login_user, logout_user
 from functools import wraps
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
-from app.models import db, Student, Payment, User, RegistrationSlip, Registration
+from app.models import db, Student, Payment, User, RegistrationSlip, Registration, RegistrationModule
 from app.models import CourseEnrollment
+from app.utils.dockets import docket_qr, paid_percentage, refresh_eligibility, student_eligibility, thresholds
 from app.utils.helpers import allowed_file
-
-from reportlab.graphics import renderPDF
-from reportlab.graphics.shapes import Drawing
-from reportlab.graphics.barcode import qr
+from app.utils.gpa import student_gpa
+from app.utils.image_hash import hash_file
+from app.utils.metrics import UPLOAD_BYTES, UPLOAD_COUNT
+from app.utils.modules import resolve_modules
+from app.utils.seating import student_seats
+from app.utils.signing import signing_configured
+from app.utils.submissions import new_submission_key, submission_key
+from app.utils.timetable import student_timetable
+from app.utils.timetable_cache import build_timetable_ics, cached_timetable, feed_token, student_from_feed_token
+from app.utils.pdf_generator import build_timetable_pdf, build_docket_pdf
 
 # Blueprint definition
 student_bp = Blueprint('student', __name__)
@@ -55,6 +61,7 @@ def student_login():
         user = User.query.filter_by(username=student_number, role='student').first()
         if user and user.check_password(password):
             session['student_id'] = user.student_id
+            login_user(user)  # results.my_results authenticates through Flask-Login
             flash("Login successful!", "success")
             return redirect(url_for('student.student_dashboard'))
         else:
@@ -65,6 +72,7 @@ def student_login():
 @student_bp.route('/logout')
 def student_logout():
     session.pop('student_id', None)
+    logout_user()
     flash("You have been logged out.", "info")
     return redirect(url_for('student.student_login'))
 
@@ -91,9 +99,24 @@ def student_dashboard():
                          payments=payments, 
                          student=student,
                          approved_payment=approved_payment,
-                         registration_slip=registration_slip)
+                         registration_slip=registration_slip,
+                         timetable_feed=url_for('student.timetable_feed', token=feed_token(student_id), _external=True)
+                         if signing_configured() else None,
+                         submission_key=new_submission_key())
 
 # ---------------- Payment Upload ----------------
+PAYMENT_RECEIVED = 'Payment slip uploaded successfully! It is now pending approval.'
+REGISTRATION_RECEIVED = 'Registration submitted and proof uploaded. Awaiting admin confirmation.'
+DUPLICATE_REFERENCE = 'A payment with this reference has already been submitted. Check the reference on your slip.'
+
+def _replay_submission(row, student_id, message):
+    """Answer a resubmitted form (same submission_key) the way its first submission was answered."""
+    if row.student_id != student_id:
+        flash('This form has expired. Please reload the page and submit it again.', 'warning')
+        return redirect(url_for(request.endpoint))
+    flash(message, 'success')
+    return redirect(url_for('student.student_dashboard'))
+
 @student_bp.route('/upload_payment', methods=['GET', 'POST'])
 @student_required
 def upload_payment():
@@ -104,6 +127,11 @@ def upload_payment():
         if not student:
             flash('Student not found.', 'danger')
             return redirect(url_for('student.student_dashboard'))
+
+        key = submission_key(request.form)
+        earlier = Payment.query.filter_by(submission_key=key).first() if key else None
+        if earlier:
+            return _replay_submission(earlier, student_id, PAYMENT_RECEIVED)
             
         payment_slip = request.files.get('payment_slip')
 
@@ -111,6 +139,11 @@ def upload_payment():
             flash('Please upload a payment slip.', 'danger')
             return redirect(url_for('student.upload_payment'))
 
+        reference, amount, problem = _payment_details(request.form)
+        if problem:
+            flash(problem, 'danger')
+            return redirect(url_for('student.upload_payment'))
+
         if payment_slip and allowed_file(payment_slip.filename):
             filename = secure_filename(payment_slip.filename)
             # Add timestamp to make filename unique
@@ -123,23 +156,71 @@ def upload_payment():
                 os.makedirs(current_app.config['UPLOAD_FOLDER'])
 
             payment_slip.save(upload_path)
+            UPLOAD_COUNT.inc(kind="payment_slip")
+            UPLOAD_BYTES.inc(os.path.getsize(upload_path), kind="payment_slip")
 
             payment = Payment(
                 slip_filename=filename, 
                 student_id=student_id,
                 status='pending',
-                submitted_date=datetime.utcnow()
+                submitted_date=datetime.utcnow(),
+                slip_hash=hash_file(upload_path),
+                reference=reference,
+                amount=amount,
+                submission_key=key
             )
             db.session.add(payment)
-            db.session.commit()
-
-            flash('Payment slip uploaded successfully! It is now pending approval.', 'success')
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # The same form posted twice at once; the other copy got there first
+                db.session.rollback()
+                earlier = Payment.query.filter_by(submission_key=key).first() if key else None
+                if earlier:
+                    _discard_upload(filename, earlier)
+                    return _replay_submission(earlier, student_id, PAYMENT_RECEIVED)
+                if not _reference_taken(reference):
+                    raise
+                # Someone else submitted the same bank reference at the same moment
+                _discard_upload(filename, None)
+                flash(DUPLICATE_REFERENCE, 'danger')
+                return redirect(url_for('student.upload_payment'))
+
+            flash(PAYMENT_RECEIVED, 'success')
             return redirect(url_for('student.student_dashboard'))
         else:
             flash('Invalid file format. Please upload an image or PDF.', 'danger')
             return redirect(url_for('student.upload_payment'))
 
-    return render_template('student/upload_payment.html')
+    return render_template('student/upload_payment.html', submission_key=new_submission_key())
+
+def _payment_details(form):
+    """(reference, amount, None) from the upload form, or (None, None, what is wrong with it)."""
+    reference = (form.get('reference') or '').strip()
+    if not 4 <= len(reference) <= 100:
+        return None, None, 'Enter the bank or mobile money reference printed on your slip.'
+    try:
+        amount = float((form.get('amount') or '').replace(',', '').strip())
+    except ValueError:
+        amount = None
+    if amount is None or not math.isfinite(amount) or amount <= 0:
+        return None, None, 'Enter the amount paid, e.g. 4500.00.'
+    if _reference_taken(reference):
+        return None, None, DUPLICATE_REFERENCE
+    return reference, round(amount, 2), None
+
+def _reference_taken(reference):
+    """Whether a pending or approved payment has this reference; rejected ones give theirs up."""
+    return db.session.query(Payment.id).filter(
+        Payment.reference == reference, Payment.status != 'rejected'
+    ).first() is not None
+
+def _discard_upload(filename, earlier):
+    """Delete the file a duplicate submission saved, unless the first copy was saved under the same name."""
+    if earlier is None or filename != earlier.slip_filename:
+        path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        if os.path.exists(path):
+            os.remove(path)
 
 @student_bp.route('/delete_payment/<int:payment_id>', methods=['POST'])
 @student_required
@@ -155,6 +236,7 @@ def delete_payment(payment_id):
         os.remove(file_path)
 
     db.session.delete(payment)
+    refresh_eligibility([payment.student_id])
     db.session.commit()
     flash('Payment deleted successfully!', 'success')
     return redirect(url_for('student.student_dashboard'))
@@ -222,7 +304,7 @@ def download_registration_slip():
 @student_bp.route('/download_timetable')
 @student_required
 def download_timetable():
-    """Generate and download timetable PDF"""
+    """Download the timetable PDF, built only when the student's enrollments or timetable changed."""
     student_id = session.get('student_id')
     student = Student.query.get(student_id)
     
@@ -230,169 +312,54 @@ def download_timetable():
         flash("Student not found.", "danger")
         return redirect(url_for('student.student_dashboard'))
     
-    # Create PDF in memory
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
-    
-    # Create styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        spaceAfter=30,
-        alignment=1,
-        textColor=colors.HexColor('#1e3c72')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=12,
-        spaceAfter=12,
-        textColor=colors.HexColor('#2a5298')
-    )
-    
-    # Build story (content)
-    story = []
-    
-    # University Header
-    story.append(Paragraph("CAVENDISH UNIVERSITY", title_style))
-    story.append(Paragraph("Lusaka, Zambia", styles['Heading2']))
-    story.append(Spacer(1, 20))
-    
-    # Document Title
-    story.append(Paragraph("STUDENT TIMETABLE", title_style))
-    story.append(Spacer(1, 30))
-    
-    # Student Information
-    story.append(Paragraph("STUDENT INFORMATION", heading_style))
-    
-    student_data = [
-        ["Student Name:", student.name],
-        ["Student ID:", student.student_number],
-        ["Academic Year:", "2024/2025"],
-        ["Semester:", "FIRST SEMESTER"],
-        ["Date Generated:", datetime.now().strftime('%d-%m-%Y')]
-    ]
-    
-    # Create table for student info
-    normal_style = styles['Normal']
-    table_data = []
-    for label, value in student_data:
-        table_data.append([Paragraph(f"<b>{label}</b>", normal_style), Paragraph(value, normal_style)])
-    
-    student_table = Table(table_data, colWidths=[2*inch, 3*inch])
-    student_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 6),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-    ]))
-    
-    story.append(student_table)
-    story.append(Spacer(1, 30))
-    
-    # Timetable Data
-    story.append(Paragraph("CLASS SCHEDULE", heading_style))
-    
-    # Sample timetable data - replace with actual data from your database
-    timetable_data = [
-        ['Day', 'Time', 'Course Code', 'Course Name', 'Venue', 'Lecturer'],
-        ['Monday', '08:00-10:00', 'CS101', 'Introduction to Programming', 'LT1', 'Dr. Smith'],
-        ['Monday', '10:00-12:00', 'MATH101', 'Calculus I', 'Room 201', 'Prof. Johnson'],
-        ['Tuesday', '09:00-11:00', 'PHY101', 'Physics I', 'Lab 3', 'Dr. Brown'],
-        ['Wednesday', '14:00-16:00', 'CS102', 'Data Structures', 'LT2', 'Dr. Davis'],
-        ['Thursday', '11:00-13:00', 'STAT101', 'Statistics', 'Room 105', 'Prof. Wilson'],
-        ['Friday', '10:00-12:00', 'CS103', 'Algorithms', 'LT1', 'Dr. Taylor'],
-    ]
-    
-    # Create timetable table
-    timetable_table = Table(timetable_data, colWidths=[0.8*inch, 1.2*inch, 1*inch, 2*inch, 0.8*inch, 1.2*inch])
-    timetable_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3c72')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    
-    story.append(timetable_table)
-    story.append(Spacer(1, 30))
-    
-    # Important Notes
-    story.append(Paragraph("IMPORTANT NOTES", heading_style))
-    notes = [
-        "1. This timetable is subject to changes. Please check regularly for updates.",
-        "2. Students are expected to be punctual for all classes.",
-        "3. Any timetable conflicts should be reported to the academic office immediately.",
-        "4. Laboratory sessions will be scheduled separately.",
-    ]
-    
-    for note in notes:
-        story.append(Paragraph(note, normal_style))
-        story.append(Spacer(1, 5))
-    
-    # Build PDF
-    doc.build(story)
-    buffer.seek(0)
-    
-    # Create response
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = f'attachment; filename=timetable_{student.student_number}.pdf'
-    
-    return response
-
-
-# ---------------- Docket Routes ----------------
-def _get_tuition_total(student: Student) -> float:
-    """Return tuition total for a student. Default fallback used if not set."""
-    # For now, use a default tuition; in future this should come from program or admin settings
-    default_tuition = 1000.0
-    return getattr(student, 'tuition_total', default_tuition) or default_tuition
+    path, version = cached_timetable(student, 'pdf', lambda: build_timetable_pdf(student, student_timetable(student.id)))
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f'timetable_{student.student_number}.pdf', etag=version, conditional=True)
 
 
-def _paid_percentage(student_id: int) -> float:
-    """Compute percentage of tuition paid based on approved payments."""
-    student = Student.query.get(student_id)
+@student_bp.route('/timetable/<token>.ics')
+def timetable_feed(token):
+    """Calendar feed for calendar apps; the signed token in the URL stands in for a login."""
+    student = student_from_feed_token(token)
     if not student:
-        return 0.0
-    tuition = _get_tuition_total(student)
-    approved_payments = Payment.query.filter_by(student_id=student_id, status='approved').all()
-    total_paid = sum(p.amount or 0.0 for p in approved_payments)
-    try:
-        return min(100.0, (total_paid / tuition) * 100.0)
-    except Exception:
-        return 0.0
+        return 'Calendar feed not found.', 404
+
+    path, version = cached_timetable(student, 'ics', lambda: build_timetable_ics(student, student_timetable(student.id)))
+    response = send_file(path, mimetype='text/calendar', download_name=f'timetable_{student.student_number}.ics',
+                         etag=version, conditional=True, max_age=current_app.config['TIMETABLE_FEED_MAX_AGE'])
+    response.cache_control.public = False  # personal data: browsers and apps may cache it, shared proxies may not
+    response.cache_control.private = True
+    return response
 
 
+# ---------------- Docket Routes ----------------
 @student_bp.route('/docket')
 @student_required
 def docket():
     """Display docket availability based on payment thresholds."""
     student_id = session.get('student_id')
     student = Student.query.get_or_404(student_id)
-    percent = _paid_percentage(student_id)
+    eligibility = student_eligibility(student_id)
+
+    percent = max((row.paid_percent for row in eligibility.values()), default=0.0)
+    availability = {k: k in eligibility and eligibility[k].eligible for k in thresholds()}
 
-    # thresholds
-    thresholds = {
-        'CAT1': 50.0,
-        'CAT2': 75.0,
-        'FINAL': 100.0,
-    }
+    return render_template('student/docket.html', student=student, percent=percent, availability=availability,
+                           thresholds=thresholds())
 
-    availability = {k: (percent >= v) for k, v in thresholds.items()}
 
-    return render_template('student/docket.html', student=student, percent=percent, availability=availability)
+def _docket_allowed(student_id, assessment, verb):
+    """Whether the student may download or print the assessment's docket; flashes the reason when not."""
+    required = thresholds().get(assessment)
+    if required is None:
+        flash('Invalid assessment specified.', 'danger')
+        return False
+
+    row = student_eligibility(student_id).get(assessment)
+    if not (row and row.eligible):
+        flash(f'You must have paid at least {required}% of tuition to {verb} this docket.', 'warning')
+        return False
+    return True
 
 
 @student_bp.route('/docket/download/<assessment>')
@@ -401,16 +368,8 @@ def docket_download(assessment):
     """Download docket in Word-friendly HTML (served as .doc) if threshold met; else deny."""
     student_id = session.get('student_id')
     student = Student.query.get_or_404(student_id)
-    percent = _paid_percentage(student_id)
-
-    thresholds = {'CAT1':50.0, 'CAT2':75.0, 'FINAL':100.0}
-    required = thresholds.get(assessment.upper())
-    if required is None:
-        flash('Invalid assessment specified.', 'danger')
-        return redirect(url_for('student.docket'))
-
-    if percent < required:
-        flash(f'You must have paid at least {required}% of tuition to download this docket.', 'warning')
+    assessment = assessment.upper()
+    if not _docket_allowed(student_id, assessment, 'download'):
         return redirect(url_for('student.docket'))
 
     # Build a simple HTML that Word can open
@@ -439,45 +398,47 @@ def docket_print(assessment):
     """Generate a printable PDF containing a QR code representing the docket link."""
     student_id = session.get('student_id')
     student = Student.query.get_or_404(student_id)
-    percent = _paid_percentage(student_id)
-
-    thresholds = {'CAT1':50.0, 'CAT2':75.0, 'FINAL':100.0}
-    required = thresholds.get(assessment.upper())
-    if required is None:
-        flash('Invalid assessment specified.', 'danger')
+    assessment = assessment.upper()
+    if not _docket_allowed(student_id, assessment, 'print'):
         return redirect(url_for('student.docket'))
-
-    if percent < required:
-        flash(f'You must have paid at least {required}% of tuition to print this docket.', 'warning')
+    if not signing_configured():
+        flash("Dockets can't be printed at the moment. Please contact the registry.", "danger")
         return redirect(url_for('student.docket'))
 
-    # Create a PDF with QR code using reportlab
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4)
-    styles = getSampleStyleSheet()
-    story = []
-
-    story.append(Paragraph(f"Docket - {assessment}", styles['Title']))
-    story.append(Paragraph(f"Student: {student.name} ({student.student_number})", styles['Normal']))
-    story.append(Spacer(1, 12))
-
-    # Create QR drawing that encodes a URL to view the docket online
-    docket_url = url_for('student.docket', _external=True) + f"#assessment={assessment}"
-    qr_code = qr.QrCodeWidget(docket_url)
-    bounds = qr_code.getBounds()
-    width = bounds[2] - bounds[0]
-    height = bounds[3] - bounds[1]
-    d = Drawing(150, 150)
-    d.add(qr_code)
-    story.append(d)
-    story.append(Spacer(1, 12))
-    story.append(Paragraph('Scan this QR code to verify docket details online.', styles['Normal']))
-
-    doc.build(story)
-    buf.seek(0)
+    # The QR code links to the verification page for a signed token, so invigilators can check it offline
+    qr_text = docket_qr(student.student_number, assessment)
+    buf = io.BytesIO(build_docket_pdf(student, assessment, qr_text, seats=student_seats(student_id, assessment)))
     return send_file(buf, mimetype='application/pdf', download_name=f'Docket_{assessment}_{student.student_number}.pdf', as_attachment=True)
 
 
+def _build_results(enrollments):
+    """Build the results rows for the template and the average of numeric marks."""
+    results = []
+    marks_list = []
+    for e in enrollments:
+        course = getattr(e, 'course', None)
+        course_code = course.code if course else ''
+        course_name = course.title if course else ''
+        grade = e.grade or ''
+        marks = e.marks if e.marks is not None else ''
+        results.append({
+            'course_code': course_code,
+            'course_name': course_name,
+            'grade': grade,
+            'marks': marks,
+            'semester': e.semester,
+            'academic_year': e.academic_year,
+        })
+        try:
+            if isinstance(marks, (int, float)):
+                marks_list.append(float(marks))
+        except Exception:
+            pass
+
+    average_marks = sum(marks_list) / len(marks_list) if marks_list else 0.0
+    return results, average_marks
+
+
 # ---------------- Student Results (session-based) ----------------
 @student_bp.route('/results')
 @student_required
@@ -487,7 +448,7 @@ def student_results():
     student = Student.query.get_or_404(student_id)
 
     # Payment percent controls visibility
-    percent = _paid_percentage(student_id)
+    percent = paid_percentage(student_id)
 
     # Require at least 50% payment to view results (adjustable rule)
     can_view = percent >= 50.0
@@ -495,38 +456,18 @@ def student_results():
     enrollments = []
     results = []
     average_marks = 0.0
+    gpa = None
     if can_view:
-        enrollments = CourseEnrollment.query.filter_by(student_id=student_id).order_by(
-            CourseEnrollment.academic_year.desc(), CourseEnrollment.semester.desc()
-        ).all()
-
-        # Build results list for template and compute average marks if 'marks' attribute exists
-        marks_list = []
-        for e in enrollments:
-            course = getattr(e, 'course', None)
-            course_code = course.code if course else ''
-            course_name = course.title if course else ''
-            grade = getattr(e, 'grade', None) or ''
-            marks = getattr(e, 'marks', None) or ''
-            results.append({
-                'course_code': course_code,
-                'course_name': course_name,
-                'grade': grade,
-                'marks': marks,
-                'semester': e.semester,
-                'academic_year': e.academic_year,
-            })
-            try:
-                if isinstance(marks, (int, float)):
-                    marks_list.append(float(marks))
-            except Exception:
-                pass
+        enrollments = CourseEnrollment.query.options(joinedload(CourseEnrollment.course)).filter_by(
+            student_id=student_id
+        ).order_by(CourseEnrollment.academic_year.desc(), CourseEnrollment.semester.desc()).all()
 
-        if marks_list:
-            average_marks = sum(marks_list) / len(marks_list)
+        results, average_marks = _build_results(enrollments)
+        gpa = student_gpa(student, enrollments)
 
     # Pass variables expected by the student results template
-    return render_template('student/results.html', results=results, average_marks=average_marks, student=student, can_view=can_view)
+    return render_template('student/results.html', results=results, average_marks=average_marks, student=student,
+                           can_view=can_view, gpa=gpa)
 
 # ---------------- Student Registration ----------------
 @student_bp.route('/register', methods=['GET', 'POST'])
@@ -598,6 +539,11 @@ def semester_register():
     student = Student.query.get_or_404(student_id)
 
     if request.method == 'POST':
+        key = submission_key(request.form)
+        earlier = Registration.query.filter_by(submission_key=key).first() if key else None
+        if earlier:
+            return _replay_submission(earlier, student_id, REGISTRATION_RECEIVED)
+
         academic_year = request.form.get('academic_year')
         semester = request.form.get('semester')
         program = request.form.get('program')
@@ -615,6 +561,14 @@ def semester_register():
             flash('Invalid file type for proof. Use JPG/PNG/PDF.', 'danger')
             return redirect(url_for('student.semester_register'))
 
+        selected, unknown = resolve_modules(modules)
+        if unknown:
+            flash(f"Unknown module code(s): {', '.join(unknown)}. Use the course codes from your programme.", 'danger')
+            return redirect(url_for('student.semester_register'))
+        if not selected:
+            flash('Enter at least one module code.', 'danger')
+            return redirect(url_for('student.semester_register'))
+
         filename = secure_filename(proof.filename)
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"reg_{student.student_number}_{timestamp}_{filename}"
@@ -622,6 +576,8 @@ def semester_register():
         if not os.path.exists(current_app.config['UPLOAD_FOLDER']):
             os.makedirs(current_app.config['UPLOAD_FOLDER'])
         proof.save(upload_path)
+        UPLOAD_COUNT.inc(kind="registration_proof")
+        UPLOAD_BYTES.inc(os.path.getsize(upload_path), kind="registration_proof")
 
         # Create Registration record
         registration = Registration(
@@ -631,11 +587,11 @@ def semester_register():
             student_id=student_id,
             program=program,
             mode_of_study=mode_of_study,
-            modules=modules,
-            is_returning=is_returning
+            is_returning=is_returning,
+            module_selections=[RegistrationModule(course_id=course_id) for course_id in selected.values()],
+            submission_key=key
         )
         db.session.add(registration)
-        db.session.commit()
 
         # Save a payment record for this proof (pending)
         try:
@@ -649,16 +605,29 @@ def semester_register():
             status='pending',
             submitted_date=datetime.utcnow(),
             amount=amt,
-            description=f"Registration payment for {academic_year} {semester} - {program}"
+            description=f"Registration payment for {academic_year} {semester} - {program}",
+            slip_hash=hash_file(upload_path),
+            submission_key=key
         )
         db.session.add(payment)
-        db.session.commit()
-
-        flash('Registration submitted and proof uploaded. Awaiting admin confirmation.', 'success')
+        try:
+            # Registration and payment together, so a repeat finds both or neither
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            earlier = Registration.query.filter_by(submission_key=key).first() if key else None
+            if not earlier:
+                raise
+            earlier_payment = Payment.query.filter_by(submission_key=key).first()
+            if earlier_payment:
+                _discard_upload(filename, earlier_payment)
+            return _replay_submission(earlier, student_id, REGISTRATION_RECEIVED)
+
+        flash(REGISTRATION_RECEIVED, 'success')
         return redirect(url_for('student.student_dashboard'))
 
     # GET - render form
-    return render_template('student/semester_register.html', student=student)
+    return render_template('student/semester_register.html', student=student, submission_key=new_submission_key())
 
 # ---------------- Serve Uploaded Files ----------------
 @student_bp.route("/uploads/<filename>")
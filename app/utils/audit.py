@@ -0,0 +1,170 @@
+# app/utils/audit.py
+"""
+Buffered audit trail for admin actions.
+
+Routes call ``audit.record("payment.approve", "...")``. The event, with the
+acting admin, IP address and user agent taken from the current request, is
+put on a bounded in-process queue and the request carries on; a background
+thread drains the queue and writes system_log rows in batches. The queue is
+flushed when the process exits.
+
+When the queue is full the event is dropped and counted in the
+audit_events_total{outcome="dropped"} metric rather than slowing requests
+down. Set AUDIT_ASYNC = False to write each event synchronously instead
+(scripts, debugging).
+"""
+import atexit
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+from .metrics import AUDIT_EVENTS
+
+_STOP = object()
+
+
+class AuditLog:
+    """Flask extension owning the audit queue and its writer thread."""
+
+    def __init__(self, app=None):
+        self.app = None
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.async_writes = app.config.get("AUDIT_ASYNC", True)
+        self.batch_size = app.config.get("AUDIT_BATCH_SIZE", 200)
+        self.flush_interval = app.config.get("AUDIT_FLUSH_INTERVAL", 1.0)
+        self._queue = queue.Queue(maxsize=app.config.get("AUDIT_QUEUE_SIZE", 10000))
+        app.extensions["audit"] = self
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    # ---------------- Recording ----------------
+    def record(self, action, description=None, admin_id=None):
+        """Queue one audit event. Never raises and never touches the database on the request path."""
+        from flask import has_request_context, request, session
+
+        event = {
+            "action": action[:100],
+            "description": description,
+            "admin_id": admin_id,
+            "ip_address": None,
+            "user_agent": None,
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        }
+        if has_request_context():
+            if event["admin_id"] is None and session.get("role") == "admin":
+                event["admin_id"] = session.get("user_id")
+            # X-Forwarded-For is whatever the client sends; behind a proxy set PROXY_FIX_X_FOR instead
+            event["ip_address"] = (request.remote_addr or "")[:45]
+            event["user_agent"] = request.headers.get("User-Agent")
+
+        if not self.async_writes:
+            self._write([event])
+            return
+
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(event)
+            AUDIT_EVENTS.inc(outcome="queued")
+        except queue.Full:
+            AUDIT_EVENTS.inc(outcome="dropped")
+            self.app.logger.warning(f"Audit queue full; dropped event {action}")
+
+    # ---------------- Writer thread ----------------
+    def _ensure_thread(self):
+        # Started lazily so forked workers (gunicorn --preload) each get their own thread
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self._queue.maxsize)
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                items = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # Drain whatever else is already waiting, up to one batch
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = [item for item in items if item is not _STOP]
+            stopping = len(batch) != len(items)
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        from sqlalchemy import insert
+        from .. import models
+
+        table = models.SystemLog.__table__
+        with self.app.app_context():
+            session = models.db.session
+            try:
+                session.execute(insert(table), batch)
+                session.commit()
+                AUDIT_EVENTS.inc(len(batch), outcome="written")
+                return
+            except Exception as e:
+                session.rollback()
+                self.app.logger.error(f"Audit batch of {len(batch)} failed, retrying one by one: {str(e)}")
+
+            # One bad row (e.g. an admin deleted since the event was queued) must not lose the batch
+            for event in batch:
+                for attempt in (event, dict(event, admin_id=None)):
+                    try:
+                        session.execute(insert(table), [attempt])
+                        session.commit()
+                        AUDIT_EVENTS.inc(outcome="written")
+                        break
+                    except Exception as e:
+                        session.rollback()
+                        error = e
+                else:
+                    AUDIT_EVENTS.inc(outcome="failed")
+                    self.app.logger.error(f"Audit event {event['action']} lost: {str(error)}")
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far has been written (or timeout)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        waiter = threading.Event()
+        for _ in range(int(timeout / 0.05)):
+            if self._queue.unfinished_tasks == 0:
+                return
+            waiter.wait(0.05)
+
+    def shutdown(self, timeout=5.0):
+        """Flush the queue and stop the writer thread; registered with atexit."""
+        if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+
+audit = AuditLog()
@@ -0,0 +1,239 @@
+# app/utils/capacity.py
+"""
+Course capacities, seat counters and waitlists.
+
+A course with a CourseSection for a period takes at most section.capacity
+students then. Checking COUNT(*) on course_enrollment before inserting
+oversells as soon as two students register at once, so the section keeps
+the count itself and a seat is claimed with one conditional UPDATE:
+
+    UPDATE course_section SET seats_taken = seats_taken + 1
+    WHERE ... AND seats_taken < capacity
+
+The database applies it atomically: PostgreSQL locks the row and re-checks
+the condition for whoever waited on the lock, SQLite takes the write lock,
+so exactly `capacity` claims ever succeed and the winner only holds the row
+until it commits. A student who doesn't get a seat goes on the section's
+waitlist. Whenever a seat frees up (an enrollment is dropped or the
+capacity is raised), the same transaction promotes the longest-waiting
+students into the free seats, so a freed seat is never visible to anyone
+jumping the queue. Courses without a section are not limited.
+
+A student is enrolled once per course and period: the insert checks first,
+and the _student_course_period_uc constraint stops the duplicate when two
+transactions pass that check at the same time. The loser's insert fails in
+a savepoint and it gives back the seat it claimed.
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, delete, exists, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Course, CourseEnrollment, CourseSection, CourseWaitlist, Student
+from app.utils.mailer import notify_waitlist_promoted
+
+ENROLLED = "enrolled"
+WAITLISTED = "waitlisted"
+ALREADY_ENROLLED = "already enrolled"
+ALREADY_WAITLISTED = "already waitlisted"
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _claim(section_filter):
+    """Take a free seat of the matching section; its id if this transaction got one, else None."""
+    return db.session.execute(
+        update(CourseSection).where(section_filter, CourseSection.seats_taken < CourseSection.capacity)
+        .values(seats_taken=CourseSection.seats_taken + 1).returning(CourseSection.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+
+def _release(section_id):
+    db.session.execute(
+        update(CourseSection).where(CourseSection.id == section_id, CourseSection.seats_taken > 0)
+        .values(seats_taken=CourseSection.seats_taken - 1).execution_options(synchronize_session=False)
+    )
+
+
+def _period(course_id, academic_year, semester):
+    return and_(
+        CourseSection.course_id == course_id,
+        CourseSection.academic_year == academic_year,
+        CourseSection.semester == semester,
+    )
+
+
+def _enroll(student_id, course_id, academic_year, semester):
+    """
+    Insert the enrollment unless the student already has one for the year;
+    True if inserted. A concurrent enrollment that wins the race shows up as
+    an IntegrityError, rolled back to a savepoint so the caller's
+    transaction (and the seat it holds) stays usable.
+    """
+    enrolled = exists().where(
+        CourseEnrollment.student_id == student_id,
+        CourseEnrollment.course_id == course_id,
+        CourseEnrollment.academic_year == academic_year,
+    )
+    row = select(literal(student_id), literal(course_id), literal(academic_year), literal(semester), literal(_now()))
+    try:
+        with db.session.begin_nested():
+            result = db.session.execute(insert(CourseEnrollment).from_select(
+                ["student_id", "course_id", "academic_year", "semester", "enrollment_date"], row.where(~enrolled)
+            ))
+    except IntegrityError:
+        return False
+    return result.rowcount == 1
+
+
+def enroll_student(student_id, course_id, academic_year, semester):
+    """
+    Enroll a student on a course for a period, or put them on the
+    waitlist when its section is full. Returns ENROLLED, WAITLISTED,
+    ALREADY_ENROLLED or ALREADY_WAITLISTED; the caller commits (or rolls
+    back, which also gives the seat back).
+    """
+    section_id = _claim(_period(course_id, academic_year, semester))
+    if section_id is not None:
+        if not _enroll(student_id, course_id, academic_year, semester):
+            _release(section_id)
+            return ALREADY_ENROLLED
+        db.session.execute(delete(CourseWaitlist).where(
+            CourseWaitlist.section_id == section_id, CourseWaitlist.student_id == student_id
+        ))
+        return ENROLLED
+
+    section_id = db.session.execute(select(CourseSection.id).where(_period(course_id, academic_year, semester))).scalar()
+    if section_id is None:
+        # No capacity set for this course and period
+        return ENROLLED if _enroll(student_id, course_id, academic_year, semester) else ALREADY_ENROLLED
+
+    already = exists().where(CourseEnrollment.student_id == student_id, CourseEnrollment.course_id == course_id,
+                             CourseEnrollment.academic_year == academic_year)
+    waiting = exists().where(CourseWaitlist.section_id == section_id, CourseWaitlist.student_id == student_id)
+    row = select(literal(section_id), literal(student_id), literal(_now())).where(~already, ~waiting)
+    if db.session.execute(insert(CourseWaitlist).from_select(["section_id", "student_id", "created_at"], row)).rowcount:
+        # A seat freed by a transaction that committed after our claim failed would otherwise sit empty
+        promote_waitlist(section_id)
+        return WAITLISTED
+    return ALREADY_ENROLLED if db.session.query(already).scalar() else ALREADY_WAITLISTED
+
+
+def promote_waitlist(section_id):
+    """
+    Move the longest-waiting students into the section's free seats.
+    Returns the ids of the students enrolled; the caller commits.
+    """
+    section = db.session.execute(select(
+        CourseSection.course_id, CourseSection.academic_year, CourseSection.semester,
+        CourseSection.capacity - CourseSection.seats_taken
+    ).where(CourseSection.id == section_id)).first()
+    if section is None or section[3] <= 0:
+        return []
+    course_id, academic_year, semester, free = section
+    entries = db.session.execute(
+        select(CourseWaitlist.id, CourseWaitlist.student_id).where(CourseWaitlist.section_id == section_id)
+        .order_by(CourseWaitlist.id).limit(free)
+    ).all()
+
+    promoted = []
+    for entry_id, student_id in entries:
+        if _claim(CourseSection.id == section_id) is None:
+            break
+        # Another transaction may have promoted this entry since we read it; then try the next one
+        if db.session.execute(delete(CourseWaitlist).where(CourseWaitlist.id == entry_id)).rowcount != 1:
+            _release(section_id)
+            continue
+        if _enroll(student_id, course_id, academic_year, semester):
+            promoted.append(student_id)
+        else:
+            _release(section_id)
+    if promoted:
+        course = db.session.get(Course, course_id)
+        for student in Student.query.filter(Student.id.in_(promoted)):
+            notify_waitlist_promoted(student, course, academic_year, semester)
+    return promoted
+
+
+def drop_enrollment(student_id, course_id, academic_year, semester):
+    """
+    Remove a student's enrollment and give its seat to the waitlist.
+    Returns (dropped, [promoted student ids]); the caller commits.
+    """
+    dropped = db.session.execute(delete(CourseEnrollment).where(
+        CourseEnrollment.student_id == student_id,
+        CourseEnrollment.course_id == course_id,
+        CourseEnrollment.academic_year == academic_year,
+        CourseEnrollment.semester == semester,
+    )).rowcount
+    section_id = db.session.execute(select(CourseSection.id).where(_period(course_id, academic_year, semester))).scalar()
+    if not dropped or section_id is None:
+        return bool(dropped), []
+    _release(section_id)
+    return True, promote_waitlist(section_id)
+
+
+def leave_waitlist(student_id, course_id, academic_year, semester):
+    """Take a student off a section's waitlist; True if they were on it. The caller commits."""
+    section_id = select(CourseSection.id).where(_period(course_id, academic_year, semester)).scalar_subquery()
+    return db.session.execute(delete(CourseWaitlist).where(
+        CourseWaitlist.section_id == section_id, CourseWaitlist.student_id == student_id
+    )).rowcount == 1
+
+
+def set_capacity(course_id, academic_year, semester, capacity):
+    """
+    Create or resize a course's section for a period, recounting its taken
+    seats from the enrollments, and promote waitlisted students into any
+    seats that opened. Lowering it below the seats taken drops nobody; new
+    students wait until enough have left. A capacity of None removes the
+    limit (and the waitlist). Returns the students promoted; the caller
+    commits.
+    """
+    section = CourseSection.query.filter_by(course_id=course_id, academic_year=academic_year, semester=semester).first()
+    if capacity is None:
+        if section:
+            db.session.delete(section)
+        return []
+    if section is None:
+        section = CourseSection(course_id=course_id, academic_year=academic_year, semester=semester,
+                                capacity=capacity, seats_taken=0)
+        db.session.add(section)
+        db.session.flush()
+    taken = select(func.count(CourseEnrollment.id)).where(
+        CourseEnrollment.course_id == course_id,
+        CourseEnrollment.academic_year == academic_year,
+        CourseEnrollment.semester == semester,
+    ).scalar_subquery()
+    db.session.execute(
+        update(CourseSection).where(CourseSection.id == section.id).values(capacity=capacity, seats_taken=taken)
+        .execution_options(synchronize_session=False)
+    )
+    promoted = promote_waitlist(section.id)
+    db.session.expire(section)
+    return promoted
+
+
+def section_counts(academic_year, semester):
+    """{course_id: (capacity, seats taken, waitlisted)} of the sections of one period."""
+    waiting = select(CourseWaitlist.section_id, func.count(CourseWaitlist.id).label("waiting")).group_by(
+        CourseWaitlist.section_id
+    ).subquery()
+    rows = db.session.query(
+        CourseSection.course_id, CourseSection.capacity, CourseSection.seats_taken,
+        func.coalesce(waiting.c.waiting, 0)
+    ).outerjoin(waiting, waiting.c.section_id == CourseSection.id).filter(
+        CourseSection.academic_year == academic_year, CourseSection.semester == semester
+    )
+    return {course_id: (capacity, taken, waiting_count) for course_id, capacity, taken, waiting_count in rows}
+
+
+def waitlist_query(section_id):
+    """(position, Student, CourseWaitlist) rows of a section's waitlist, first in line first."""
+    position = func.row_number().over(order_by=CourseWaitlist.id)
+    return db.session.query(position, Student, CourseWaitlist).join(
+        Student, Student.id == CourseWaitlist.student_id
+    ).filter(CourseWaitlist.section_id == section_id).order_by(CourseWaitlist.id)
@@ -0,0 +1,120 @@
+# app/utils/docket_tokens.py
+"""
+Signed docket tokens, checked at the exam door without the database.
+
+A docket's QR code holds a link to /docket/verify/<token>, where the token is
+
+    <student number>.<assessment>.<expiry, unix seconds in hex>.<signature>
+
+and the signature is the first 12 bytes of an HMAC-SHA256 of the other three
+fields, base64url encoded. Anyone holding the signing key can tell a genuine,
+unexpired docket from a forged or altered one with one HMAC, so verification
+needs no query and keeps working while the database is busy or unreachable.
+The key must come from the environment (see app/utils/signing.py); without
+one no token is issued and every token is rejected.
+Tokens can't be revoked: a docket stays valid until it expires
+(DOCKET_TOKEN_DAYS after printing) even if the payment behind it is reversed.
+"""
+import base64
+import hashlib
+import hmac
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from urllib.parse import unquote
+
+from flask import current_app
+
+from app.utils.signing import SigningKeyMissing, signing_key
+
+SIGNATURE_BYTES = 12
+VERIFY_PATH = "/docket/verify/"  # where general.verify_docket is mounted
+
+DocketCheck = namedtuple("DocketCheck", "valid reason student_number assessment expires")
+
+
+def _key():
+    return signing_key("docket-token")
+
+
+def _signature(key, payload):
+    digest = hmac.new(key, payload.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+    return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+
+def issue_token(student_number, assessment, expires=None):
+    """
+    Token for a student's docket; expires (unix seconds) defaults to
+    DOCKET_TOKEN_DAYS from now. Raises SigningKeyMissing without a signing key.
+    """
+    if expires is None:
+        expires = time.time() + current_app.config["DOCKET_TOKEN_DAYS"] * 86400
+    payload = f"{student_number}.{assessment}.{int(expires):x}"
+    return f"{payload}.{_signature(_key(), payload)}"
+
+
+def verify_token(token, now=None, key=None):
+    """
+    DocketCheck for a token: valid is True only for an intact, unexpired
+    token; reason says why not ("malformed", "bad signature", "expired",
+    "no signing key").
+    """
+    if key is None:
+        try:
+            key = _key()
+        except SigningKeyMissing:
+            return DocketCheck(False, "no signing key", None, None, None)
+    # Student numbers may contain dots; the other three fields can't
+    parts = (token or "").strip().rsplit(".", 3)
+    if len(parts) != 4 or not all(parts):
+        return DocketCheck(False, "malformed", None, None, None)
+    student_number, assessment, expiry, signature = parts
+    try:
+        expires = int(expiry, 16)
+    except ValueError:
+        return DocketCheck(False, "malformed", None, None, None)
+
+    expected = _signature(key, f"{student_number}.{assessment}.{expiry}")
+    if not hmac.compare_digest(expected, signature):
+        return DocketCheck(False, "bad signature", None, None, None)
+    expires_at = datetime.fromtimestamp(expires, timezone.utc)
+    if expires < (time.time() if now is None else now):
+        return DocketCheck(False, "expired", student_number, assessment, expires_at)
+    return DocketCheck(True, None, student_number, assessment, expires_at)
+
+
+def token_from_scan(text):
+    """The token in a scanned QR code, which holds the whole verification link."""
+    return unquote((text or "").strip().rsplit(VERIFY_PATH, 1)[-1])
+
+
+def verify_tokens(scans, assessment=None):
+    """
+    Check a hall's scan list (tokens or verification links) in order.
+    Besides verify_token(), a docket for another assessment than the one
+    being sat is invalid, and a docket scanned again is marked as a
+    duplicate of its first scan.
+    """
+    try:
+        key = _key()
+    except SigningKeyMissing:
+        key = None  # verify_token() then rejects every scan
+    now, seen, results = time.time(), set(), []
+    for scan in scans:
+        token = token_from_scan(scan)
+        check = verify_token(token, now=now, key=key)
+        if check.valid and assessment and check.assessment != assessment:
+            check = check._replace(valid=False, reason="wrong assessment")
+        duplicate = check.valid and (check.student_number, check.assessment) in seen
+        if check.valid:
+            seen.add((check.student_number, check.assessment))
+        results.append({
+            "token": token,
+            "valid": check.valid,
+            "reason": check.reason,
+            "student_number": check.student_number,
+            "assessment": check.assessment,
+            "expires": check.expires.isoformat() if check.expires else None,
+            "duplicate": duplicate,
+        })
+    return results
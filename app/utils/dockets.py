@@ -0,0 +1,229 @@
+# app/utils/dockets.py
+"""
+Exam docket eligibility and bulk docket generation.
+
+A student may print an assessment's docket once their approved payments
+cover DOCKET_THRESHOLDS[assessment] percent of tuition. Instead of summing
+payments on every docket request, docket_eligibility keeps one row per
+student and assessment. refresh_eligibility() rewrites a student's rows when
+one of their payments is approved, rejected or deleted, and every student's
+after the thresholds change, so docket pages and bulk runs only read it.
+
+Bulk runs print the eligible students of one course (a single PDF for its
+exam sitting) or of a whole exam session (one PDF per course). Encoding the
+QR codes is most of the work, so large batches spread it over worker
+processes: for one PDF the workers encode the codes and the parent draws the
+pages, for a session each worker renders whole course PDFs. Workers are
+started with "spawn" so they don't inherit the app's database connections
+or background threads.
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import groupby
+
+from flask import current_app, url_for
+from sqlalchemy import and_, delete, func, insert, select
+from werkzeug.utils import secure_filename
+
+from app.models import db, Course, CourseEnrollment, DocketEligibility, ExamHall, ExamSeat, ExamSession, Payment, Student
+from app.utils.docket_tokens import issue_token
+from app.utils.metrics import PDF_RENDER_SECONDS
+from app.utils.pdf_generator import build_dockets_pdf, qr_path
+from app.utils.seating import seat_label
+
+
+def thresholds():
+    """{assessment: percent of tuition required}, in the order dockets are listed."""
+    return current_app.config["DOCKET_THRESHOLDS"]
+
+
+def tuition_total():
+    """Tuition payments are measured against (one figure until fees are set per programme)."""
+    return current_app.config["DEFAULT_TUITION"]
+
+
+def refresh_eligibility(student_ids=None):
+    """
+    Recompute the eligibility rows of the given students (every student by
+    default) from their approved payments: one grouped query, then the old
+    rows are replaced with one DELETE and one executemany INSERT. Returns the
+    number of students refreshed; the caller commits.
+    """
+    paid = select(Student.id, func.coalesce(func.sum(Payment.amount), 0.0)).outerjoin(
+        Payment, and_(Payment.student_id == Student.id, Payment.status == 'approved')
+    ).group_by(Student.id)
+    stale = delete(DocketEligibility)
+    if student_ids is not None:
+        student_ids = list(student_ids)
+        paid = paid.where(Student.id.in_(student_ids))
+        stale = stale.where(DocketEligibility.student_id.in_(student_ids))
+    totals = db.session.execute(paid).all()
+
+    required, tuition = thresholds(), tuition_total()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for student_id, amount in totals:
+        percent = round(min(100.0, amount / tuition * 100.0), 2) if tuition else 0.0
+        rows.extend({
+            "student_id": student_id, "assessment": assessment, "paid_amount": amount,
+            "paid_percent": percent, "eligible": percent >= threshold, "updated_at": now,
+        } for assessment, threshold in required.items())
+
+    db.session.execute(stale)
+    if rows:
+        db.session.execute(insert(DocketEligibility), rows)
+    return len(totals)
+
+
+def student_eligibility(student_id):
+    """{assessment: DocketEligibility} for one student; an assessment without a row isn't eligible."""
+    return {row.assessment: row for row in DocketEligibility.query.filter_by(student_id=student_id)}
+
+
+def paid_percentage(student_id):
+    """Share of tuition the student has paid, as recorded with their eligibility."""
+    percent = db.session.query(func.max(DocketEligibility.paid_percent)).filter(
+        DocketEligibility.student_id == student_id
+    ).scalar()
+    return percent or 0.0
+
+
+def eligibility_counts():
+    """{assessment: eligible students} over every student."""
+    counts = dict.fromkeys(thresholds(), 0)
+    rows = db.session.query(DocketEligibility.assessment, func.count(DocketEligibility.id)).filter(
+        DocketEligibility.eligible.is_(True)
+    ).group_by(DocketEligibility.assessment)
+    counts.update(rows)
+    return counts
+
+
+def course_docket_counts(academic_year, semester, assessment):
+    """{course_id: (enrolled, eligible)} for one period and assessment."""
+    eligible = and_(
+        DocketEligibility.student_id == CourseEnrollment.student_id,
+        DocketEligibility.assessment == assessment,
+        DocketEligibility.eligible.is_(True),
+    )
+    rows = db.session.query(
+        CourseEnrollment.course_id, func.count(CourseEnrollment.id), func.count(DocketEligibility.id)
+    ).outerjoin(DocketEligibility, eligible).filter(
+        CourseEnrollment.academic_year == academic_year, CourseEnrollment.semester == semester
+    ).group_by(CourseEnrollment.course_id)
+    return {course_id: (enrolled, count) for course_id, enrolled, count in rows}
+
+
+def docket_qr(student_number, assessment, expires=None):
+    """What a docket's QR code encodes: the verification page for its signed token."""
+    return url_for('general.verify_docket', token=issue_token(student_number, assessment, expires), _external=True)
+
+
+def docket_rows(academic_year, semester, assessment, course_id=None, exam_session_id=None, hall_id=None):
+    """
+    Dockets (as build_dockets_pdf() takes them) of every eligible student
+    enrolled in the period, or on one course of it, ordered by course code
+    and student number; each carries the student's exam seat once seating
+    has been planned. Given an exam session (and optionally a hall), only
+    the students seated there are returned, in seat order.
+    """
+    planned = select(ExamSession.id).where(
+        ExamSession.academic_year == academic_year,
+        ExamSession.semester == semester,
+        ExamSession.assessment == assessment,
+    )
+    query = db.session.query(
+        Course.code, Course.title, Student.student_number, Student.name, Student.program,
+        ExamSession.starts_at, ExamHall.name, ExamSeat.seat_number
+    ).select_from(CourseEnrollment).join(
+        Student, Student.id == CourseEnrollment.student_id
+    ).join(Course, Course.id == CourseEnrollment.course_id).join(
+        DocketEligibility, and_(
+            DocketEligibility.student_id == CourseEnrollment.student_id,
+            DocketEligibility.assessment == assessment,
+        )
+    ).outerjoin(ExamSeat, and_(
+        ExamSeat.student_id == CourseEnrollment.student_id,
+        ExamSeat.course_id == CourseEnrollment.course_id,
+        ExamSeat.session_id.in_(planned),
+    )).outerjoin(ExamSession, ExamSession.id == ExamSeat.session_id).outerjoin(
+        ExamHall, ExamHall.id == ExamSeat.hall_id
+    ).filter(
+        CourseEnrollment.academic_year == academic_year,
+        CourseEnrollment.semester == semester,
+        DocketEligibility.eligible.is_(True),
+    )
+    if course_id is not None:
+        query = query.filter(CourseEnrollment.course_id == course_id)
+    if exam_session_id is not None:
+        query = query.filter(ExamSeat.session_id == exam_session_id)
+        if hall_id is not None:
+            query = query.filter(ExamSeat.hall_id == hall_id)
+        query = query.order_by(ExamHall.name, ExamSeat.seat_number)
+    else:
+        query = query.order_by(Course.code, Student.student_number)
+
+    # One expiry for the whole batch, so every docket printed together is valid for as long
+    expires = time.time() + current_app.config["DOCKET_TOKEN_DAYS"] * 86400
+    valid_until, period = datetime.fromtimestamp(expires).strftime('%d-%m-%Y'), f"{academic_year} {semester}"
+    return [
+        {
+            "name": name, "student_number": number, "program": program, "assessment": assessment,
+            "course_code": code, "course_title": title, "period": period, "valid_until": valid_until,
+            "seats": [seat_label(starts_at, hall, seat_number)] if seat_number else [],
+            "qr": docket_qr(number, assessment, expires),
+        }
+        for code, title, number, name, program, starts_at, hall, seat_number in query
+    ]
+
+
+def _processes(processes=None):
+    return processes or current_app.config.get("DOCKET_PROCESSES") or os.cpu_count() or 1
+
+
+def _pool(processes):
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+
+
+def render_dockets(dockets, processes=None):
+    """One PDF of the given dockets; the QR codes of large batches are encoded across worker processes."""
+    processes = _processes(processes)
+    texts = list(dict.fromkeys(docket["qr"] for docket in dockets))
+    with PDF_RENDER_SECONDS.time(document="docket_batch"):
+        codes = None
+        if processes > 1 and len(texts) >= current_app.config["DOCKET_PARALLEL_MIN"]:
+            with _pool(processes) as pool:
+                chunksize = max(1, len(texts) // (processes * 4))
+                codes = dict(zip(texts, pool.map(qr_path, texts, chunksize=chunksize)))
+        return build_dockets_pdf(dockets, codes)
+
+
+def generate_session(academic_year, semester, assessment, folder, processes=None):
+    """
+    Write one docket PDF per course of an exam session into folder, rendering
+    the courses in parallel once the session is big enough to be worth
+    starting workers for. Returns [(course code, dockets, path)].
+    """
+    rows = docket_rows(academic_year, semester, assessment)
+    groups = [(code, list(dockets)) for code, dockets in groupby(rows, key=lambda docket: docket["course_code"])]
+    os.makedirs(folder, exist_ok=True)
+    prefix = secure_filename(f"{academic_year}_{semester}_{assessment}")
+    paths = [os.path.join(folder, f"{prefix}_{secure_filename(code)}.pdf") for code, _ in groups]
+
+    processes = min(_processes(processes), len(groups))
+    with PDF_RENDER_SECONDS.time(document="docket_session"):
+        if processes > 1 and len(rows) >= current_app.config["DOCKET_PARALLEL_MIN"]:
+            with _pool(processes) as pool:
+                _write_all(paths, pool.map(build_dockets_pdf, [dockets for _, dockets in groups]))
+        else:
+            _write_all(paths, (build_dockets_pdf(dockets) for _, dockets in groups))
+    return [(code, len(dockets), path) for (code, dockets), path in zip(groups, paths)]
+
+
+def _write_all(paths, pdfs):
+    """Write each PDF as it arrives, so a session never has to fit in memory at once."""
+    for path, pdf in zip(paths, pdfs):
+        with open(path, "wb") as f:
+            f.write(pdf)
@@ -0,0 +1,284 @@
+# app/utils/gpa.py
+"""
+Credit-weighted GPA and CGPA for whole cohorts.
+
+load_cohort() reads every enrollment of a cohort with one query (and the
+students' classes with another) into columnar NumPy arrays, and CohortGPA
+turns them into semester GPAs, cumulative GPAs, class ranks and
+dean's-list/probation flags without a Python loop over students or
+enrollments:
+
+- grades map to points through GRADE_POINTS; missing or unknown grades
+  carry no credits, so ungraded courses don't pull a GPA down;
+- each (student, semester) pair gets a cell number and np.bincount sums
+  credits and quality points into a students x semesters matrix, whose
+  running sums (cumsum) give the cumulative GPA after every semester;
+- ranks are competition ranks ("1224") by CGPA within each class, i.e.
+  students of the same program and intake year.
+
+student_gpa() serves a single student from a per-process cache keyed by a
+fingerprint of their enrollments (row count, highest id, sum of revisions),
+so a student's figures are recomputed as soon as one of their enrollments
+is added, regraded or removed. Ranks also depend on classmates, so every
+entry is refreshed after GPA_CACHE_TTL seconds regardless.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from app.models import db, Student, Course, CourseEnrollment
+
+_cache = OrderedDict()  # student_id -> (fingerprint, computed_at, CohortGPA)
+_cache_lock = threading.Lock()
+
+
+def _factorize(values):
+    """Return (sorted distinct values, integer code per value)."""
+    levels = sorted(set(values), key=lambda value: (value is None, value))
+    codes = {value: i for i, value in enumerate(levels)}
+    return levels, np.fromiter(map(codes.__getitem__, values), dtype=np.intp, count=len(values))
+
+
+def _combine(*columns):
+    """Factorize several columns together; returns (distinct tuples in sorted order, code per row)."""
+    factorized = [_factorize(column) for column in columns]
+    key = np.zeros(len(columns[0]), dtype=np.int64)
+    for levels, codes in factorized:
+        key = key * len(levels) + codes
+    unique, codes = np.unique(key, return_inverse=True)
+    tuples = []
+    for value in unique.tolist():
+        parts = []
+        for levels, _ in reversed(factorized):
+            value, code = divmod(value, len(levels))
+            parts.append(levels[code])
+        tuples.append(tuple(reversed(parts)))
+    return tuples, codes
+
+
+def load_cohort(program=None, intake_year=None, everyone=False):
+    """
+    Load enrollments as columnar arrays: one class (program + intake year),
+    or every student when everyone=True.
+    """
+    students = select(Student.id, Student.program, Student.intake_year)
+    if not everyone:
+        students = students.where(Student.program == program, Student.intake_year == intake_year)
+    enrollments = select(
+        CourseEnrollment.student_id, CourseEnrollment.id, CourseEnrollment.revision,
+        CourseEnrollment.academic_year, CourseEnrollment.semester, CourseEnrollment.grade, Course.credits
+    ).join(Course, Course.id == CourseEnrollment.course_id)
+    if not everyone:
+        enrollments = enrollments.where(CourseEnrollment.student_id.in_(students.with_only_columns(Student.id)))
+
+    # Executed on the connection, not the session, to skip ORM result
+    # processing: this runs over hundreds of thousands of rows
+    connection = db.session.connection()
+    rows = connection.execute(enrollments).all()
+    student_ids, ids, revisions, years, semesters, grades, credits = zip(*rows) if rows else [()] * 7
+    rows = connection.execute(students).all()
+    members, programs, intakes = zip(*rows) if rows else [()] * 3
+    return {
+        "student_id": np.array(student_ids, dtype=np.int64),
+        "id": np.array(ids, dtype=np.int64),
+        "revision": np.array(revisions, dtype=np.int64),
+        "academic_year": years,
+        "semester": semesters,
+        "grade": grades,
+        "credits": np.array(credits, dtype=np.float64),
+        # One entry per student: the class they are ranked in
+        "member_id": np.array(members, dtype=np.int64),
+        "program": programs,
+        "intake_year": intakes,
+    }
+
+
+class CohortGPA:
+    """GPA figures for every student of a loaded cohort, as parallel arrays."""
+
+    def __init__(self, data, grade_points=None, deans_list_gpa=None, deans_list_min_credits=None, probation_gpa=None):
+        config = current_app.config
+        grade_points = grade_points if grade_points is not None else config.get("GRADE_POINTS", {})
+        deans_list_gpa = deans_list_gpa if deans_list_gpa is not None else config.get("DEANS_LIST_GPA", 3.5)
+        if deans_list_min_credits is None:
+            deans_list_min_credits = config.get("DEANS_LIST_MIN_CREDITS", 30)
+        probation_gpa = probation_gpa if probation_gpa is not None else config.get("PROBATION_GPA", 2.0)
+
+        self.student_ids, student = np.unique(data["student_id"], return_inverse=True)
+        self.periods, period = _combine(data["academic_year"], data["semester"])
+        grade_levels, grade = _factorize(data["grade"])
+        n_students, n_periods = len(self.student_ids), max(len(self.periods), 1)
+
+        # Grade -> points, NaN for grades the scale doesn't know (or blank)
+        table = np.array(
+            [grade_points.get((level or "").strip().upper(), np.nan) for level in grade_levels] or [np.nan],
+            dtype=np.float64,
+        )
+        points = table[grade] if len(grade) else np.empty(0)
+        graded = ~np.isnan(points)
+        credits = np.where(graded, data["credits"], 0.0)
+        quality = np.where(graded, points * data["credits"], 0.0)
+
+        # Students x semesters matrices of credits and quality points
+        cell = student * n_periods + period
+        size = n_students * n_periods
+        self.semester_credits = np.bincount(cell, weights=credits, minlength=size).reshape(n_students, n_periods)
+        semester_quality = np.bincount(cell, weights=quality, minlength=size).reshape(n_students, n_periods)
+        self.semester_gpa = _ratio(semester_quality, self.semester_credits)
+
+        cumulative_credits = np.cumsum(self.semester_credits, axis=1)
+        self.cumulative_gpa = _ratio(np.cumsum(semester_quality, axis=1), cumulative_credits)
+        self.credits = cumulative_credits[:, -1] if n_students else np.empty(0)
+        self.cgpa = self.cumulative_gpa[:, -1] if n_students else np.empty(0)
+        ranked = self.credits > 0
+
+        # Latest semester with graded credits decides the dean's list
+        has_credits = self.semester_credits > 0
+        latest = n_periods - 1 - np.argmax(has_credits[:, ::-1], axis=1)
+        rows = np.arange(n_students)
+        latest_gpa = self.semester_gpa[rows, latest]
+        latest_credits = self.semester_credits[rows, latest]
+        self.deans_list = ranked & (latest_gpa >= deans_list_gpa) & (latest_credits >= deans_list_min_credits)
+        self.probation = ranked & (self.cgpa < probation_gpa)
+
+        # Class (program, intake year) of each student with enrollments
+        self.classes, class_codes = _combine(data["program"], data["intake_year"])
+        member_order = np.argsort(data["member_id"])
+        position = member_order[np.searchsorted(data["member_id"], self.student_ids, sorter=member_order)]
+        self.student_class = class_codes[position] if n_students else np.empty(0, dtype=np.intp)
+        self.rank, self.class_size = _competition_rank(self.student_class, self.cgpa, ranked)
+
+        # Enrollment fingerprint per student, see _fingerprint()
+        self.fingerprint_count = np.bincount(student, minlength=n_students)
+        self.fingerprint_max_id = np.zeros(n_students, dtype=np.int64)
+        np.maximum.at(self.fingerprint_max_id, student, data["id"])
+        self.fingerprint_revisions = np.bincount(student, weights=data["revision"], minlength=n_students).astype(np.int64)
+
+        self._index = {student_id: i for i, student_id in enumerate(self.student_ids.tolist())}
+
+    def __len__(self):
+        return len(self.student_ids)
+
+    def fingerprint(self, i):
+        return (int(self.fingerprint_count[i]), int(self.fingerprint_max_id[i]), int(self.fingerprint_revisions[i]))
+
+    def summary(self, student_id):
+        """Plain-dict figures for one student, or None when they have no enrollments here."""
+        i = self._index.get(student_id)
+        if i is None:
+            return None
+        semesters = [
+            {
+                "academic_year": year,
+                "semester": semester,
+                "gpa": _rounded(self.semester_gpa[i, p]),
+                "credits": float(self.semester_credits[i, p]),
+                "cgpa": _rounded(self.cumulative_gpa[i, p]),
+            }
+            for p, (year, semester) in enumerate(self.periods)
+            if self.semester_credits[i, p] > 0
+        ]
+        return {
+            "cgpa": _rounded(self.cgpa[i]),
+            "credits": float(self.credits[i]),
+            "rank": int(self.rank[i]) or None,
+            "class_size": int(self.class_size[i]),
+            "deans_list": bool(self.deans_list[i]),
+            "probation": bool(self.probation[i]),
+            "semesters": semesters,
+        }
+
+    def cache(self):
+        """Point every student of the cohort at it in the per-process cache."""
+        now = time.monotonic()
+        entries = [(student_id, (self.fingerprint(i), now, self)) for student_id, i in self._index.items()]
+        limit = current_app.config.get("GPA_CACHE_SIZE", 50000)
+        with _cache_lock:
+            for student_id, entry in entries:
+                _cache[student_id] = entry
+                _cache.move_to_end(student_id)
+            while len(_cache) > limit:
+                _cache.popitem(last=False)
+
+
+def _ratio(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.full(numerator.shape, np.nan), where=denominator > 0)
+
+
+def _rounded(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _competition_rank(groups, values, ranked):
+    """
+    Rank values (highest first) within each group, ties sharing the best
+    rank ("1224"). Unranked entries get rank 0. Returns (rank, group size).
+    """
+    n = len(values)
+    if not n:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    key = np.where(ranked, np.round(values, 4), -np.inf)
+    order = np.lexsort((-key, groups))
+    sorted_groups, sorted_key = groups[order], key[order]
+    position = np.arange(n)
+    new_group = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    new_value = new_group | np.r_[True, sorted_key[1:] != sorted_key[:-1]]
+    group_start = np.maximum.accumulate(np.where(new_group, position, 0))
+    tie_start = np.maximum.accumulate(np.where(new_value, position, 0))
+
+    rank = np.empty(n, dtype=np.int64)
+    rank[order] = tie_start - group_start + 1
+    rank[~ranked] = 0
+    size = np.bincount(groups, weights=ranked, minlength=groups.max() + 1).astype(np.int64)
+    return rank, size[groups]
+
+
+def compute_cohort(program=None, intake_year=None, everyone=False):
+    """Load and compute one class (or everyone), refreshing the cache for its students."""
+    cohort = CohortGPA(load_cohort(program, intake_year, everyone))
+    cohort.cache()
+    return cohort
+
+
+def _fingerprint(enrollments):
+    """Changes whenever an enrollment is added, removed or updated."""
+    return (len(enrollments), max((e.id for e in enrollments), default=0), sum(e.revision or 0 for e in enrollments))
+
+
+def student_gpa(student, enrollments=None):
+    """
+    GPA summary for one student (see CohortGPA.summary), from the cache when
+    their enrollments haven't changed. Pass the student's enrollments when
+    they are already loaded to save the fingerprint query.
+    """
+    if enrollments is None:
+        count, max_id, revisions = db.session.query(
+            db.func.count(CourseEnrollment.id), db.func.max(CourseEnrollment.id), db.func.sum(CourseEnrollment.revision)
+        ).filter(CourseEnrollment.student_id == student.id).one()
+        fingerprint = (count, max_id or 0, revisions or 0)
+    else:
+        fingerprint = _fingerprint(enrollments)
+
+    ttl = current_app.config.get("GPA_CACHE_TTL", 900)
+    with _cache_lock:
+        cached = _cache.get(student.id)
+        if cached and cached[0] == fingerprint and time.monotonic() - cached[1] < ttl:
+            _cache.move_to_end(student.id)
+            return cached[2].summary(student.id)
+
+    cohort = compute_cohort(student.program, student.intake_year)
+    return cohort.summary(student.id) or empty_summary()
+
+
+def empty_summary():
+    return {"cgpa": None, "credits": 0.0, "rank": None, "class_size": 0,
+            "deans_list": False, "probation": False, "semesters": []}
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,223 @@
+# app/utils/grades.py
+"""
+Batch grade publishing and grade derivation from marks.
+
+publish_grades() takes a list of grade entries (student_number,
+course_code, academic_year, semester and either a letter grade or
+component marks) and applies all of them with a fixed number of queries,
+however long the list is: students and courses are resolved with one IN
+query each, lecturer ownership is checked once per course, matching
+enrollments are loaded in one query and everything is written with one
+executemany UPDATE per kind of entry and a single commit.
+
+Every entry gets its own result, so one bad row never rejects the batch.
+
+Marks are out of 100 per component (COMPONENTS). weighted_totals() and
+letter_grades() work on whole NumPy arrays, so a course (or a batch) is
+graded in one pass against the configured ASSESSMENT_WEIGHTS and
+GRADE_BOUNDARIES.
+"""
+import numpy as np
+from flask import current_app
+from sqlalchemy import update
+
+from app.models import db, Student, Course, CourseEnrollment
+
+MAX_BATCH_GRADES = 2000
+_IN_CHUNK = 500  # keep IN lists well under SQLite's bound-parameter limit
+_FIELDS = ("student_number", "course_code", "academic_year", "semester")
+
+# Assessment component -> CourseEnrollment column
+COMPONENTS = {"cat1": "cat1_marks", "cat2": "cat2_marks", "final": "final_marks"}
+
+
+def weighted_totals(components, weights=None):
+    """
+    Course totals from {"cat1": array, "cat2": array, "final": array} of
+    marks (NaN where missing). A missing CAT counts as zero; without a final
+    mark the total is NaN, i.e. not yet gradable.
+    """
+    weights = weights or current_app.config["ASSESSMENT_WEIGHTS"]
+    final = np.asarray(components["final"], dtype=np.float64)
+    total = np.zeros(len(final))
+    for name, weight in weights.items():
+        total += weight * np.nan_to_num(np.asarray(components[name], dtype=np.float64), nan=0.0)
+    total[np.isnan(final)] = np.nan
+    return np.round(total, 2)
+
+
+def grade_scale(boundaries=None):
+    """(letters, lower bounds) ordered from the lowest grade up."""
+    boundaries = sorted(boundaries or current_app.config["GRADE_BOUNDARIES"], key=lambda boundary: boundary[1])
+    return [letter for letter, _ in boundaries], np.array([low for _, low in boundaries], dtype=np.float64)
+
+
+def grade_indices(totals, boundaries=None):
+    """Position of each total's grade in grade_scale() (0 = lowest), -1 where the total is NaN."""
+    _, lows = grade_scale(boundaries)
+    totals = np.asarray(totals, dtype=np.float64)
+    index = np.clip(np.searchsorted(lows, totals, side="right") - 1, 0, None)
+    index[np.isnan(totals)] = -1
+    return index
+
+
+def letter_grades(totals, boundaries=None):
+    """Letter grade per total (None where the total is NaN)."""
+    letters, _ = grade_scale(boundaries)
+    index = grade_indices(totals, boundaries)
+    grades = np.array(letters + [None], dtype=object)[index]  # -1 picks the trailing None
+    return grades
+
+
+def _chunks(values, size=_IN_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _clean(entry, defaults):
+    """Normalise one entry; returns (values, error message)."""
+    if not isinstance(entry, dict):
+        return None, "Entry must be an object."
+    values = {}
+    for field in _FIELDS:
+        value = entry.get(field, defaults.get(field))
+        values[field] = str(value).strip() if value is not None else ""
+    missing = [field for field in _FIELDS if not values[field]]
+    if missing:
+        return None, f"Missing {', '.join(missing)}."
+    values["student_number"] = values["student_number"].upper()
+    values["course_code"] = values["course_code"].upper()
+
+    values["marks"] = {}
+    for name in COMPONENTS:
+        mark = entry.get(name)
+        if mark is None or str(mark).strip() == "":
+            continue
+        try:
+            mark = float(mark)
+        except (TypeError, ValueError):
+            return None, f"{name} must be a number."
+        if not 0 <= mark <= 100:
+            return None, f"{name} must be between 0 and 100."
+        values["marks"][name] = mark
+
+    grade = entry.get("grade")
+    values["grade"] = str(grade).strip().upper() if grade is not None else ""
+    if not values["marks"] and not values["grade"]:
+        return None, "Missing grade or marks."
+    if len(values["grade"]) > 5:
+        return None, "Grade must be at most 5 characters."
+    return values, None
+
+
+def publish_grades(entries, lecturer_id=None, defaults=None):
+    """
+    Apply a batch of grades in one transaction.
+
+    An entry with any of the cat1/cat2/final marks updates those marks and
+    gets its total and grade derived from them (an explicit grade is then
+    ignored); otherwise its letter grade is stored as given.
+
+    lecturer_id restricts the batch to courses that lecturer teaches (None
+    for admins). defaults fills academic_year/semester for entries that
+    omit them. Returns a list of per-entry results in input order:
+    {"index", "student_number", "course_code", "status", "message"} where
+    status is "updated" or "error"; updated marks entries also carry the
+    derived "marks" and "grade".
+    """
+    defaults = defaults or {}
+    results = []
+    cleaned = []
+    for index, entry in enumerate(entries):
+        values, error = _clean(entry, defaults)
+        shown = values or (entry if isinstance(entry, dict) else {})
+        results.append({
+            "index": index,
+            "student_number": shown.get("student_number"),
+            "course_code": shown.get("course_code"),
+            "status": "error" if error else None,
+            "message": error,
+        })
+        if values:
+            cleaned.append((index, values))
+
+    # Resolve students and courses in bulk
+    students = {}
+    for chunk in _chunks({values["student_number"] for _, values in cleaned}):
+        students.update(db.session.query(Student.student_number, Student.id).filter(Student.student_number.in_(chunk)))
+    courses = {}
+    for chunk in _chunks({values["course_code"] for _, values in cleaned}):
+        courses.update(
+            (code, (course_id, owner)) for code, course_id, owner in
+            db.session.query(Course.code, Course.id, Course.primary_lecturer_id).filter(Course.code.in_(chunk))
+        )
+
+    # Ownership is a property of the course, so check it once per course
+    allowed = {code for code, (_, owner) in courses.items() if lecturer_id is None or owner == lecturer_id}
+
+    wanted = []
+    for index, values in cleaned:
+        result = results[index]
+        student_id = students.get(values["student_number"])
+        course = courses.get(values["course_code"])
+        if student_id is None or course is None:
+            result.update(status="error", message="Invalid Student or Course details provided.")
+        elif values["course_code"] not in allowed:
+            result.update(status="error", message="Authorization required for this course.")
+        else:
+            wanted.append((index, (student_id, course[0], values["academic_year"], values["semester"]), values))
+
+    # Load every candidate enrollment at once and match on the full key
+    enrollments = {}
+    student_ids = {key[0] for _, key, _ in wanted}
+    course_ids = {key[1] for _, key, _ in wanted}
+    for chunk in _chunks(student_ids):
+        rows = db.session.query(
+            CourseEnrollment.id, CourseEnrollment.student_id, CourseEnrollment.course_id,
+            CourseEnrollment.academic_year, CourseEnrollment.semester,
+            *(getattr(CourseEnrollment, column) for column in COMPONENTS.values())
+        ).filter(CourseEnrollment.student_id.in_(chunk), CourseEnrollment.course_id.in_(course_ids))
+        for enrollment_id, *key_and_marks in rows:
+            key, marks = tuple(key_and_marks[:4]), key_and_marks[4:]
+            enrollments[key] = {"id": enrollment_id, **dict(zip(COMPONENTS.values(), marks))}
+
+    # Final values per enrollment; a later entry for the same enrollment wins
+    changes = {}
+    marked = []
+    for index, key, values in wanted:
+        current = enrollments.get(key)
+        if current is None:
+            results[index].update(status="error", message="Enrollment record not found for this period.")
+            continue
+        if values["marks"]:
+            for name, mark in values["marks"].items():
+                current[COMPONENTS[name]] = mark
+            changes[current["id"]] = current
+            marked.append((index, current))
+        elif changes.get(current["id"]) is not current:
+            changes[current["id"]] = {"id": current["id"], "grade": values["grade"]}
+            results[index].update(status="updated", message=f"Grade {values['grade']} published.")
+        else:
+            results[index].update(status="error", message="Grade ignored; it is derived from the marks in this batch.")
+
+    # Grade every marks entry of the batch in one vectorised pass
+    if marked:
+        totals = weighted_totals({
+            name: [row[column] for _, row in marked] for name, column in COMPONENTS.items()
+        })
+        for (index, row), total, grade in zip(marked, totals.tolist(), letter_grades(totals).tolist()):
+            row["marks"] = None if np.isnan(total) else total
+            row["grade"] = grade
+            message = f"Marks saved, total {total:.1f}, grade {grade}." if grade else "Marks saved; grade awaits the final exam mark."
+            results[index].update(status="updated", message=message, marks=row["marks"], grade=grade)
+
+    if changes:
+        # executemany needs the same columns in every row, so write each shape of change separately
+        by_shape = {}
+        for row in changes.values():
+            by_shape.setdefault(tuple(sorted(row)), []).append(row)
+        for rows in by_shape.values():
+            db.session.execute(update(CourseEnrollment), rows)
+        db.session.commit()
+    return results
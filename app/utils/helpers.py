@@ -2,11 +2,14 @@ import os
 import io
 from datetime import datetime
 from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
+from app.utils.metrics import PDF_RENDER_SECONDS
 
 def generate_registration_slip_pdf(registration_slip):
     """Generate PDF for registration slip"""
@@ -77,7 +80,8 @@ def generate_registration_slip_pdf(registration_slip):
         story.append(Paragraph(f"Generated on: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
         
         # Build PDF
-        doc.build(story)
+        with PDF_RENDER_SECONDS.time(document="registration_slip"):
+            doc.build(story)
         
         # Save to file
         with open(file_path, 'wb') as f:
@@ -95,4 +99,74 @@ def allowed_file(filename):
     """Check if file extension is allowed"""
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
     return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
\ No newline at end of file
+           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def approve_payment(payment, approved_by):
+    """
+    Approve a payment: mark it approved, register the student and issue a
+    registration slip (with PDF) if they don't have one yet. Shared by the
+    admin approve button and automatic statement reconciliation.
+    Returns 'slip_created', 'pdf_failed', 'approved' or 'conflict'.
+
+    'conflict' means another admin or a reconciliation run changed the
+    payment, the student's registration or their slip while this approval
+    was in flight (see the version columns on those models), or issued the
+    same slip first. Nothing was saved and the payment can be looked at
+    again and re-approved.
+    """
+    from app.models import db, Registration, RegistrationSlip
+    from app.utils.dockets import refresh_eligibility
+    from app.utils.mailer import notify_payment_approved, notify_slip_issued
+    from app.utils.modules import enroll_registrations
+
+    try:
+        payment.status = 'approved'
+        payment.approved_date = datetime.utcnow()
+        notify_payment_approved(payment)
+        refresh_eligibility([payment.student_id])
+
+        # Register the student on their latest registration and enroll them on its modules
+        registration = Registration.query.filter_by(student_id=payment.student_id).order_by(Registration.id.desc()).first()
+        if not registration:
+            registration = Registration(student_id=payment.student_id, is_registered=True)
+            db.session.add(registration)
+        else:
+            registration.is_registered = True
+            db.session.flush()
+            enroll_registrations([registration.id])
+
+        # AUTO-CREATE REGISTRATION SLIP
+        existing_slip = RegistrationSlip.query.filter_by(student_id=payment.student_id).first()
+        if existing_slip:
+            db.session.commit()
+            return 'approved'
+
+        slip_number = f"RS{payment.student_id:06d}-{datetime.now().strftime('%Y%m%d')}"
+        registration_slip = RegistrationSlip(
+            slip_number=slip_number,
+            student_id=payment.student_id,
+            program_name=payment.student.program or "To be assigned",
+            faculty_name=payment.student.faculty or "To be assigned",
+            academic_year="2024/2025",
+            semester="Semester 1",
+            issue_date=datetime.utcnow(),
+            created_by=approved_by
+        )
+        db.session.add(registration_slip)
+        notify_slip_issued(registration_slip)
+        db.session.commit()
+    except (StaleDataError, IntegrityError):
+        # Lost a compare-and-swap on a version column, or the slip number to a concurrent approval
+        db.session.rollback()
+        return 'conflict'
+
+    # Generate PDF
+    if generate_registration_slip_pdf(registration_slip):
+        try:
+            db.session.commit()
+        except StaleDataError:
+            # The slip was edited meanwhile; the approval stands, only the PDF link is lost
+            db.session.rollback()
+            return 'pdf_failed'
+        return 'slip_created'
+    return 'pdf_failed'
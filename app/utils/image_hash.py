@@ -0,0 +1,187 @@
+# app/utils/image_hash.py
+"""
+Perceptual hashes for uploaded payment receipts.
+
+Every upload gets a 64-bit difference hash (dHash): the image is shrunk to
+9x8 greyscale and each bit records whether a pixel is brighter than its
+right-hand neighbour. Re-saved, resized, re-compressed or lightly edited
+copies of the same photo land within a few bits of each other.
+
+Hashes are stored on Payment.slip_hash and indexed in a BK-tree per
+process, so near-duplicates across the whole upload history are found
+without comparing against every stored hash.
+"""
+import base64
+import io
+import os
+import re
+import threading
+
+from flask import current_app
+from PIL import Image, UnidentifiedImageError
+
+HASH_SIZE = 8  # 8x8 comparisons -> 64-bit hash
+
+_DCT_STREAM = re.compile(rb"/DCTDecode.*?stream\r?\n", re.S)
+
+
+def dhash(image):
+    """64-bit difference hash of a PIL image, as a 16-character hex string."""
+    # JPEG draft mode decodes at reduced size, which is much faster for phone photos
+    image.draft("L", (HASH_SIZE * 4, HASH_SIZE * 4))
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white so it doesn't hash as black
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image.convert("RGBA"), mask=image.convert("RGBA").split()[-1])
+        image = background
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    width = HASH_SIZE + 1
+    for row in range(HASH_SIZE):
+        offset = row * width
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{value:016x}"
+
+
+def _first_pdf_page(path):
+    """
+    First page of a PDF as a PIL image. Uses PyMuPDF when it is installed;
+    otherwise falls back to the largest embedded JPEG, which is what scanned
+    and phone-generated receipt PDFs contain. Returns None if neither works.
+    """
+    try:
+        import fitz  # PyMuPDF, optional
+    except ImportError:
+        fitz = None
+
+    if fitz is not None:
+        with fitz.open(path) as document:
+            if document.page_count == 0:
+                return None
+            pixmap = document[0].get_pixmap(dpi=72)
+            return Image.open(io.BytesIO(pixmap.tobytes("png")))
+
+    with open(path, "rb") as f:
+        data = f.read()
+    best = None
+    for match in _DCT_STREAM.finditer(data):
+        start = match.end()
+        end = data.find(b"endstream", start)
+        if end != -1 and (best is None or end - start > best[2] - best[1]):
+            # Some writers (reportlab among them) wrap the JPEG in ASCII85
+            dictionary = data[data.rfind(b"<<", 0, match.start()):match.start()]
+            best = (b"/ASCII85Decode" in dictionary, start, end)
+    if best is None:
+        return None
+    ascii85, start, end = best
+    payload = data[start:end]
+    if ascii85:
+        payload = base64.a85decode(payload.strip().removesuffix(b"~>"))
+    return Image.open(io.BytesIO(payload))
+
+
+def hash_file(path):
+    """Perceptual hash of an uploaded image or PDF, or None if it can't be decoded."""
+    try:
+        if path.lower().endswith(".pdf"):
+            image = _first_pdf_page(path)
+            if image is None:
+                return None
+        else:
+            image = Image.open(path)
+        with image:
+            return dhash(image)
+    except (OSError, UnidentifiedImageError, ValueError) as e:
+        current_app.logger.warning(f"Could not hash upload {os.path.basename(path)}: {str(e)}")
+        return None
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit integers under Hamming distance."""
+
+    def __init__(self):
+        self.root = None  # [value, ids, {distance: child}]
+        self.size = 0
+
+    def add(self, value, item_id):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item_id], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item_id], {}]
+                return
+            node = child
+
+    def search(self, value, max_distance):
+        """Return [(distance, item_id)] for every stored value within max_distance."""
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item_id) for item_id in node[1])
+            # Triangle inequality: only children whose edge is within range can hold matches
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return found
+
+
+class ReceiptHashIndex:
+    """
+    Per-process BK-tree of Payment.slip_hash values. It catches up with rows
+    written by other workers by loading payments newer than the last id it
+    has seen before each lookup, so it never needs a full rebuild.
+    """
+
+    def __init__(self):
+        self._tree = BKTree()
+        self._last_id = 0
+        self._database = None
+        self._lock = threading.Lock()
+
+    def _catch_up(self):
+        from app.models import db, Payment
+
+        if self._database != str(db.engine.url):
+            # Scripts and tools may run several apps against different databases
+            self._tree = BKTree()
+            self._last_id = 0
+            self._database = str(db.engine.url)
+        rows = db.session.query(Payment.id, Payment.slip_hash).filter(
+            Payment.id > self._last_id, Payment.slip_hash.isnot(None)
+        ).order_by(Payment.id).all()
+        for payment_id, slip_hash in rows:
+            self._tree.add(int(slip_hash, 16), payment_id)
+            self._last_id = payment_id
+
+    def find_similar(self, slip_hash, max_distance=None, exclude_id=None):
+        """Return [(distance, payment_id)] of stored receipts close to slip_hash, nearest first."""
+        if not slip_hash:
+            return []
+        if max_distance is None:
+            max_distance = current_app.config.get("RECEIPT_HASH_MAX_DISTANCE", 10)
+        with self._lock:
+            self._catch_up()
+            matches = self._tree.search(int(slip_hash, 16), max_distance)
+        return sorted((d, pid) for d, pid in matches if pid != exclude_id)
+
+
+receipt_index = ReceiptHashIndex()
@@ -0,0 +1,278 @@
+# app/utils/mailer.py
+"""
+Outbox-based email delivery.
+
+Routes never talk to SMTP. They call enqueue_email(), which adds an
+email_outbox row to the caller's transaction, so a message is only sent if
+the change that triggered it commits. mail_worker.py then delivers the
+outbox in batches over one persistent SMTP connection:
+
+- rows are claimed with a lease (status "sending", next_attempt_at = lease
+  expiry), so several workers can run and a crashed worker's claims are
+  picked up again once the lease runs out;
+- temporary failures are retried with exponential backoff and jitter,
+  permanent ones (5xx, refused recipient) fail at once;
+- each recipient gets at most MAIL_RECIPIENT_LIMIT messages per
+  MAIL_RECIPIENT_WINDOW seconds; extra messages wait, they are not dropped.
+
+Delivery is at-least-once: a worker that dies after sending but before
+committing the batch leaves those rows to be sent again.
+"""
+import random
+import secrets
+import smtplib
+import time
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from flask_mail import Connection, Message
+from markupsafe import escape
+
+from app.models import db, EmailOutbox, Student
+from app.utils.metrics import EMAILS
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue_email(recipient, subject, html=None, body=None):
+    """Add a message to the outbox. It is sent once the caller commits."""
+    message = EmailOutbox(recipient=recipient, subject=subject, html=html, body=body, next_attempt_at=_utcnow())
+    db.session.add(message)
+    EMAILS.inc(outcome="queued")
+    return message
+
+
+# ---------------- Notifications ----------------
+def notify_payment_approved(payment):
+    student = payment.student
+    if not student.email:
+        return None
+    return enqueue_email(
+        student.email,
+        "Payment Approved",
+        html=f"""
+            <p>Hello {escape(student.name)},</p>
+            <p>Your payment{f" (reference {escape(payment.reference)})" if payment.reference else ""}
+            of {payment.amount or 0:,.2f} has been approved and you are now registered.</p>
+            <p>Cavendish University Zambia</p>
+        """,
+    )
+
+
+def notify_slip_issued(slip):
+    # Called before the new slip is flushed, when slip.student is not loaded yet
+    student = slip.student or db.session.get(Student, slip.student_id)
+    if not student.email:
+        return None
+    return enqueue_email(
+        student.email,
+        "Registration Slip Issued",
+        html=f"""
+            <p>Hello {escape(student.name)},</p>
+            <p>Your registration slip <strong>{escape(slip.slip_number)}</strong> for
+            {escape(slip.academic_year or "")} {escape(slip.semester or "")} has been issued.
+            You can download it from your student dashboard.</p>
+            <p>Cavendish University Zambia</p>
+        """,
+    )
+
+
+def notify_waitlist_promoted(student, course, academic_year, semester):
+    if not student.email:
+        return None
+    return enqueue_email(
+        student.email,
+        f"Enrolled on {course.code}",
+        html=f"""
+            <p>Hello {escape(student.name)},</p>
+            <p>A seat has opened on <strong>{escape(course.code)} - {escape(course.title)}</strong> and you
+            have been enrolled on it for {escape(academic_year)} {escape(semester)}, in the order students joined
+            its waitlist.</p>
+            <p>Cavendish University Zambia</p>
+        """,
+    )
+
+
+# ---------------- Delivery ----------------
+class _SMTPConnection(Connection):
+    """Flask-Mail connection with a socket timeout, so a stalled server can't hang the worker."""
+
+    def __init__(self, mail, timeout):
+        super().__init__(mail)
+        self.timeout = timeout
+
+    def configure_host(self):
+        if self.mail.use_ssl:
+            host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=self.timeout)
+        else:
+            host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=self.timeout)
+        host.set_debuglevel(int(self.mail.debug))
+        if self.mail.use_tls:
+            host.starttls()
+        if self.mail.username and self.mail.password:
+            host.login(self.mail.username, self.mail.password)
+        return host
+
+
+def _is_permanent(error):
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class OutboxWorker:
+    """Delivers the email outbox. Use inside an app context."""
+
+    def __init__(self, app, batch_size=None):
+        config = app.config
+        self.batch_size = batch_size or config.get("MAIL_BATCH_SIZE", 50)
+        self.max_attempts = config.get("MAIL_MAX_ATTEMPTS", 6)
+        self.retry_base = config.get("MAIL_RETRY_BASE", 30)
+        self.retry_max = config.get("MAIL_RETRY_MAX", 3600)
+        self.recipient_limit = config.get("MAIL_RECIPIENT_LIMIT", 5)
+        self.recipient_window = config.get("MAIL_RECIPIENT_WINDOW", 3600)
+        self.lease = config.get("MAIL_CLAIM_LEASE", 300)
+        self.timeout = config.get("MAIL_SMTP_TIMEOUT", 30)
+        self.idle_disconnect = config.get("MAIL_IDLE_DISCONNECT", 60)
+        self._connection = None
+        self._last_used = 0.0
+
+    # ---------------- SMTP connection ----------------
+    def _connect(self):
+        if self._connection is None:
+            self._connection = _SMTPConnection(current_app.extensions["mail"], self.timeout).__enter__()
+        self._last_used = time.monotonic()
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                if self._connection.host is not None:
+                    self._connection.host.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._connection = None
+
+    def _send(self, row):
+        message = Message(subject=row.subject, recipients=[row.recipient], html=row.html, body=row.body)
+        try:
+            self._connect().send(message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle connection; reconnect once and resend
+            self._connection = None
+            self._connect().send(message)
+
+    # ---------------- Outbox ----------------
+    def _claim(self):
+        now = _utcnow()
+        due = (EmailOutbox.status.in_(("pending", "sending")), EmailOutbox.next_attempt_at <= now)
+        ids = [row_id for (row_id,) in db.session.query(EmailOutbox.id).filter(*due)
+               .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(self.batch_size)]
+        if not ids:
+            db.session.rollback()
+            return []
+        token = secrets.token_hex(16)
+        db.session.query(EmailOutbox).filter(EmailOutbox.id.in_(ids), *due).update(
+            {"status": "sending", "claim_token": token, "next_attempt_at": now + timedelta(seconds=self.lease)},
+            synchronize_session=False,
+        )
+        db.session.commit()
+        return EmailOutbox.query.filter_by(claim_token=token, status="sending").order_by(EmailOutbox.id).all()
+
+    def _recent_sends(self, recipients):
+        """{recipient: [count, oldest sent_at]} for sends inside the rate-limit window."""
+        since = _utcnow() - timedelta(seconds=self.recipient_window)
+        rows = db.session.query(
+            EmailOutbox.recipient, db.func.count(EmailOutbox.id), db.func.min(EmailOutbox.sent_at)
+        ).filter(
+            EmailOutbox.status == "sent", EmailOutbox.sent_at >= since, EmailOutbox.recipient.in_(recipients)
+        ).group_by(EmailOutbox.recipient)
+        return {recipient: [count, oldest] for recipient, count, oldest in rows}
+
+    def _retry(self, row, error):
+        row.attempts += 1
+        row.last_error = str(error)[:1000]
+        row.claim_token = None
+        if _is_permanent(error) or row.attempts >= self.max_attempts:
+            row.status = "failed"
+            EMAILS.inc(outcome="failed")
+            current_app.logger.error(f"Email {row.id} to {row.recipient} failed: {row.last_error}")
+            return
+        delay = min(self.retry_base * 2 ** (row.attempts - 1), self.retry_max) * random.uniform(0.8, 1.2)
+        row.status = "pending"
+        row.next_attempt_at = _utcnow() + timedelta(seconds=delay)
+        EMAILS.inc(outcome="retried")
+
+    def deliver_batch(self):
+        """Claim and deliver one batch. Returns the number of rows claimed."""
+        rows = self._claim()
+        if not rows:
+            return 0
+        recent = self._recent_sends({row.recipient for row in rows})
+        window = timedelta(seconds=self.recipient_window)
+        connection_error = None
+
+        for row in rows:
+            sent = recent.setdefault(row.recipient, [0, None])
+            if sent[0] >= self.recipient_limit:
+                row.status = "pending"
+                row.claim_token = None
+                row.next_attempt_at = (sent[1] or _utcnow()) + window
+                EMAILS.inc(outcome="deferred")
+                continue
+            if connection_error is not None:
+                self._retry(row, connection_error)
+                continue
+            try:
+                self._send(row)
+            except smtplib.SMTPConnectError as e:
+                connection_error = e
+                self._connection = None
+                self._retry(row, e)
+                continue
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+                # The server rejected this message; the connection is still usable
+                self._retry(row, e)
+                continue
+            except OSError as e:
+                # Disconnects, timeouts, refused connections: no point trying the
+                # rest of the batch against a dead server
+                connection_error = e
+                self._connection = None
+                self._retry(row, e)
+                continue
+            except Exception as e:
+                self._retry(row, e)
+                continue
+            now = _utcnow()
+            row.status = "sent"
+            row.sent_at = now
+            row.claim_token = None
+            row.last_error = None
+            sent[0] += 1
+            sent[1] = sent[1] or now
+            EMAILS.inc(outcome="sent")
+
+        db.session.commit()
+        return len(rows)
+
+    def run_once(self):
+        """Deliver everything currently due, batch after batch. Returns rows processed."""
+        total = 0
+        while True:
+            claimed = self.deliver_batch()
+            total += claimed
+            if claimed < self.batch_size:
+                return total
+
+    def run_forever(self, poll_interval=5.0):
+        try:
+            while True:
+                if not self.run_once():
+                    if self._connection is not None and time.monotonic() - self._last_used > self.idle_disconnect:
+                        self.close()
+                    time.sleep(poll_interval)
+        finally:
+            self.close()
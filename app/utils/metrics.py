@@ -0,0 +1,363 @@
+# app/utils/metrics.py
+"""
+In-process metrics registry exposed in Prometheus text format.
+
+Each process keeps its own counters, gauges and histograms in memory. When
+METRICS_DIR is configured (one directory shared by every gunicorn worker),
+each process periodically writes a snapshot to ``metrics_<pid>.json`` in that
+directory and ``/metrics`` merges every snapshot it finds, so the numbers are
+correct no matter which worker answers the scrape. Counters and histograms of
+workers that have exited stay in the totals (dropping them would make the
+counters go backwards); their gauges describe a process that no longer
+exists and are left out.
+"""
+import os
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """Base class holding the samples of one metric family."""
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.samples[key] = self.samples.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Gauge with a cross-process aggregation mode:
+    ``all`` keeps one series per worker (adds a ``pid`` label),
+    ``latest`` keeps the value from the most recently written snapshot.
+    """
+    kind = "gauge"
+
+    def __init__(self, registry, name, documentation, labelnames=(), mode="all"):
+        super().__init__(registry, name, documentation, labelnames)
+        self.mode = mode
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.samples[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self.samples[key] = sample
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["buckets"][i] += 1
+                    break
+            sample["sum"] += value
+            sample["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the ``with`` block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """Flask extension owning every metric family and the shared-file backend."""
+
+    def __init__(self, app=None):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+        self.directory = None
+        self.flush_interval = 1.0
+        self._last_flush = 0.0
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    # ---------------- Metric declaration ----------------
+    def _register(self, metric):
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), mode="all"):
+        return self._register(Gauge(self, name, documentation, labelnames, mode=mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def register_collector(self, func):
+        """Register a callable run right before every scrape (e.g. to refresh gauges)."""
+        self.collectors.append(func)
+        return func
+
+    # ---------------- Flask integration ----------------
+    def init_app(self, app):
+        self.directory = app.config.get("METRICS_DIR")
+        self.flush_interval = app.config.get("METRICS_FLUSH_INTERVAL", 1.0)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+        app.extensions["metrics"] = self
+
+    # ---------------- Shared-file backend ----------------
+    def _snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    "samples": [
+                        [list(key), value if metric.kind != "histogram" else dict(value, buckets=list(value["buckets"]))]
+                        for key, value in metric.samples.items()
+                    ]
+                }
+                for name, metric in self.metrics.items()
+            }
+
+    def flush(self):
+        """Atomically write this process's snapshot to the shared directory."""
+        if not self.directory:
+            return
+        payload = {"ts": time.time(), "metrics": self._snapshot()}
+        path = os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        """Flush at most once per METRICS_FLUSH_INTERVAL seconds."""
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _load_snapshots(self):
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith("metrics_") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # file vanished or is being replaced; skip this round
+            pid = filename[len("metrics_"):-len(".json")]
+            snapshots.append((pid, data.get("ts", 0), data.get("metrics", {})))
+        return snapshots
+
+    @staticmethod
+    def _alive(pid):
+        """Whether the worker that wrote a snapshot is still running (the directory is per host)."""
+        try:
+            os.kill(int(pid), 0)
+        except (ValueError, ProcessLookupError):
+            return False
+        except PermissionError:
+            return True  # exists, owned by another user
+        return True
+
+    def _merged_samples(self):
+        """Return {name: {labels_tuple: value}} merged across every worker snapshot."""
+        if not self.directory:
+            with self.lock:
+                return {
+                    name: {key: (dict(v, buckets=list(v["buckets"])) if isinstance(v, dict) else v)
+                           for key, v in metric.samples.items()}
+                    for name, metric in self.metrics.items()
+                }
+
+        self.flush()
+        merged = {name: {} for name in self.metrics}
+        latest_ts = {}
+        for pid, ts, families in self._load_snapshots():
+            alive = self._alive(pid)
+            for name, family in families.items():
+                metric = self.metrics.get(name)
+                if metric is None or (metric.kind == "gauge" and not alive):
+                    continue
+                target = merged[name]
+                for key, value in family["samples"]:
+                    key = tuple(key)
+                    if metric.kind == "counter":
+                        target[key] = target.get(key, 0.0) + value
+                    elif metric.kind == "histogram":
+                        current = target.get(key)
+                        if current is None:
+                            target[key] = {"buckets": list(value["buckets"]), "sum": value["sum"], "count": value["count"]}
+                        else:
+                            current["buckets"] = [a + b for a, b in zip(current["buckets"], value["buckets"])]
+                            current["sum"] += value["sum"]
+                            current["count"] += value["count"]
+                    elif metric.mode == "latest":
+                        if ts >= latest_ts.get((name, key), -1):
+                            latest_ts[(name, key)] = ts
+                            target[key] = value
+                    else:
+                        target[key + (pid,)] = value
+        return merged
+
+    # ---------------- Exposition ----------------
+    @staticmethod
+    def _format_labels(names, values, extra=()):
+        pairs = list(zip(names, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = []
+        for name, value in pairs:
+            value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+            escaped.append(f'{name}="{value}"')
+        return "{" + ",".join(escaped) + "}"
+
+    def render(self):
+        """Run collectors and return every metric in Prometheus text format 0.0.4."""
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception:
+                pass  # a broken collector must never take down the scrape
+        merged = self._merged_samples()
+
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            labelnames = metric.labelnames
+            if metric.kind == "gauge" and metric.mode == "all" and self.directory:
+                labelnames = labelnames + ("pid",)
+            for key, value in sorted(merged.get(name, {}).items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{self._format_labels(labelnames, key)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(metric.buckets, value["buckets"]):
+                    cumulative += count
+                    labels = self._format_labels(labelnames, key, [("le", bound)])
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = self._format_labels(labelnames, key, [("le", "+Inf")])
+                lines.append(f"{name}_bucket{labels} {value['count']}")
+                lines.append(f"{name}_sum{self._format_labels(labelnames, key)} {value['sum']}")
+                lines.append(f"{name}_count{self._format_labels(labelnames, key)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# ---------------- Application metrics ----------------
+metrics = MetricsRegistry()
+
+REQUEST_LATENCY = metrics.histogram(
+    "http_request_duration_seconds", "Request latency by blueprint and endpoint.",
+    ("blueprint", "endpoint", "method"),
+)
+REQUEST_COUNT = metrics.counter(
+    "http_requests_total", "Requests served by blueprint, endpoint and status code.",
+    ("blueprint", "endpoint", "status"),
+)
+DB_POOL_CHECKED_OUT = metrics.gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the SQLAlchemy pool.",
+)
+DB_POOL_SIZE = metrics.gauge(
+    "db_pool_size", "Configured size of the SQLAlchemy connection pool.",
+)
+PDF_RENDER_SECONDS = metrics.histogram(
+    "pdf_render_duration_seconds", "Time spent building PDF documents.", ("document",),
+)
+UPLOAD_BYTES = metrics.counter(
+    "upload_bytes_total", "Bytes received through student file uploads.", ("kind",),
+)
+UPLOAD_COUNT = metrics.counter(
+    "uploads_total", "Number of student file uploads.", ("kind",),
+)
+CHATBOT_MATCH_SECONDS = metrics.histogram(
+    "chatbot_match_duration_seconds", "Time spent matching a chatbot question to a category.",
+    ("category",), buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+PENDING_PAYMENTS = metrics.gauge(
+    "payments_pending", "Payments waiting for admin approval.", mode="latest",
+)
+AUDIT_EVENTS = metrics.counter(
+    "audit_events_total", "Audit events by outcome (queued, written, dropped, failed).", ("outcome",),
+)
+TIMETABLE_CACHE = metrics.counter(
+    "timetable_cache_total", "Timetable file requests by document and outcome (hit, miss).", ("document", "outcome"),
+)
+EMAILS = metrics.counter(
+    "emails_total", "Outbox emails by outcome (queued, sent, retried, deferred, failed).", ("outcome",),
+)
+
+
+def instrument_app(app):
+    """Attach request timing hooks and scrape-time collectors to the app."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request_metrics(response):
+        start = g.pop("_metrics_start", None)
+        if start is not None:
+            blueprint = request.blueprint or "app"
+            endpoint = request.endpoint or "unmatched"
+            REQUEST_LATENCY.observe(time.perf_counter() - start,
+                                    blueprint=blueprint, endpoint=endpoint, method=request.method)
+            REQUEST_COUNT.inc(blueprint=blueprint, endpoint=endpoint, status=response.status_code)
+        _sample_db_pool()
+        metrics.maybe_flush()
+        return response
+
+
+def _sample_db_pool():
+    from app.extensions import db
+    pool = db.engine.pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+    if hasattr(pool, "size"):
+        DB_POOL_SIZE.set(pool.size())
+
+
+@metrics.register_collector
+def _collect_pending_payments():
+    from app.models import Payment
+    PENDING_PAYMENTS.set(Payment.query.filter_by(status="pending").count())
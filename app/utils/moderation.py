@@ -0,0 +1,125 @@
+# app/utils/moderation.py
+"""
+Exam-board moderation of a course's marks.
+
+A moderation adjusts one assessment component for every enrollment of a
+course in one academic year and semester:
+
+- linear: mark * scale + offset
+- curve:  100 * (mark / 100) ** exponent  (an exponent below 1 lifts low
+  marks the most and leaves 0 and 100 where they are)
+
+Adjusted marks are clipped to 0-100. preview() loads the course's marks
+once as NumPy arrays and re-derives every total and grade in a single
+pass, so the board sees the grade distribution before and after while it
+tunes the parameters. apply() repeats the calculation on the current marks
+and writes the result back with one executemany UPDATE. Adjustments
+compound: applying the same moderation twice moves the marks twice.
+"""
+import numpy as np
+from sqlalchemy import select, update
+
+from app.models import db, CourseEnrollment
+from app.utils.grades import COMPONENTS, grade_indices, grade_scale, letter_grades, weighted_totals
+
+METHODS = ("linear", "curve")
+HISTOGRAM_BINS = np.arange(0, 101, 10)
+
+
+def adjust(marks, method, scale=1.0, offset=0.0, exponent=1.0):
+    """Moderated copy of a marks array (NaN stays NaN)."""
+    marks = np.asarray(marks, dtype=np.float64)
+    if method == "linear":
+        adjusted = marks * scale + offset
+    elif method == "curve":
+        if exponent <= 0:
+            raise ValueError("The curve exponent must be greater than zero.")
+        adjusted = 100.0 * (np.clip(marks, 0.0, 100.0) / 100.0) ** exponent
+    else:
+        raise ValueError(f"Unknown moderation method {method!r}.")
+    return np.round(np.clip(adjusted, 0.0, 100.0), 2)
+
+
+def _load(course_id, academic_year, semester):
+    columns = [getattr(CourseEnrollment, column) for column in COMPONENTS.values()]
+    rows = db.session.execute(
+        select(CourseEnrollment.id, *columns).where(
+            CourseEnrollment.course_id == course_id,
+            CourseEnrollment.academic_year == academic_year,
+            CourseEnrollment.semester == semester,
+        ).order_by(CourseEnrollment.id)
+    ).all()
+    ids, *marks = zip(*rows) if rows else [()] * (len(columns) + 1)
+    return np.array(ids, dtype=np.int64), {
+        name: np.array(values, dtype=np.float64) for name, values in zip(COMPONENTS, marks)
+    }
+
+
+def _distribution(totals, indices, letters):
+    graded = indices >= 0
+    counts = np.bincount(indices[graded], minlength=len(letters))
+    values = totals[graded]
+    histogram, _ = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        "grades": {letter: int(count) for letter, count in zip(letters[::-1], counts[::-1])},  # best first
+        "graded": int(graded.sum()),
+        "mean": round(float(values.mean()), 2) if len(values) else None,
+        "median": round(float(np.median(values)), 2) if len(values) else None,
+        "pass_rate": round(float((indices[graded] > 0).mean()) * 100, 1) if len(values) else None,
+        "histogram": histogram.tolist(),
+    }
+
+
+def _moderate(components, component, method, params):
+    if component not in COMPONENTS:
+        raise ValueError(f"Unknown assessment component {component!r}.")
+    letters, _ = grade_scale()
+    before_totals = weighted_totals(components)
+    before = grade_indices(before_totals)
+
+    adjusted = dict(components)
+    adjusted[component] = adjust(components[component], method, **params)
+    after_totals = weighted_totals(adjusted)
+    after = grade_indices(after_totals)
+
+    summary = {
+        "enrollments": len(before),
+        "component": component,
+        "method": method,
+        "params": params,
+        "letters": letters[::-1],
+        "bins": [f"{low}-{low + 9}" if low < 90 else "90-100" for low in HISTOGRAM_BINS[:-1].tolist()],
+        "before": _distribution(before_totals, before, letters),
+        "after": _distribution(after_totals, after, letters),
+        "moved_up": int(((after > before) & (before >= 0)).sum()),
+        "moved_down": int(((after < before) & (after >= 0)).sum()),
+    }
+    return summary, adjusted, after_totals
+
+
+def preview(course_id, academic_year, semester, component="final", method="linear", **params):
+    """Grade distribution before and after the adjustment; nothing is written."""
+    _, components = _load(course_id, academic_year, semester)
+    return _moderate(components, component, method, params)[0]
+
+
+def apply(course_id, academic_year, semester, component="final", method="linear", **params):
+    """Apply the adjustment to the current marks with one bulk UPDATE; returns the preview summary and rows written."""
+    ids, components = _load(course_id, academic_year, semester)
+    summary, adjusted, totals = _moderate(components, component, method, params)
+
+    grades = letter_grades(totals)
+    old, new = components[component], adjusted[component]
+    changed = ~np.isnan(old) & (old != new)
+
+    column = COMPONENTS[component]
+    rows = [
+        {"id": enrollment_id, column: mark, "marks": None if np.isnan(total) else total, "grade": grade}
+        for enrollment_id, mark, total, grade in zip(
+            ids[changed].tolist(), new[changed].tolist(), totals[changed].tolist(), grades[changed].tolist()
+        )
+    ]
+    if rows:
+        db.session.execute(update(CourseEnrollment), rows)
+        db.session.commit()
+    return summary, len(rows)
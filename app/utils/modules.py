@@ -0,0 +1,178 @@
+# app/utils/modules.py
+"""
+Module (course) selection on semester registrations.
+
+Students pick modules by course code when they register; each pick is a
+RegistrationModule row pointing at the registration and the course. Once a
+registration is approved, enroll_registrations() turns its picks into
+CourseEnrollment rows with a single INSERT ... SELECT, for one
+registration or for every approved registration at once, skipping
+enrollments that already exist. Courses with a capacity for the period
+claim their seats one by one instead (see app/utils/capacity.py).
+Rosters and per-module counts then come from indexed queries on
+course_enrollment (approved) or registration_module (still pending).
+"""
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import and_, case, exists, func, insert, literal, select
+
+from app.models import db, Course, CourseEnrollment, CourseSection, Registration, RegistrationModule, Student
+from app.utils.capacity import ENROLLED, enroll_student
+
+_SEPARATORS = re.compile(r"[,;/|\n\r\t]+")
+
+# Older registration forms stored the semester as First/Second
+SEMESTER_ALIASES = {"First": "Semester 1", "Second": "Semester 2"}
+
+
+def parse_module_codes(text, known_codes=None):
+    """
+    Course codes in the order given, upper-cased and without duplicates.
+    Codes are separated by commas, semicolons, slashes or new lines;
+    "CS 101" is read as CS101 when that is a known code, otherwise its words
+    are taken as separate codes.
+    """
+    codes = []
+    for piece in _SEPARATORS.split(text or ""):
+        piece = piece.strip().upper()
+        joined = re.sub(r"\s+", "", piece)
+        for code in ([joined] if known_codes is None or joined in known_codes else piece.split()):
+            if code and code not in codes:
+                codes.append(code)
+    return codes
+
+
+def resolve_modules(text):
+    """Parse a module list against the course table; returns ({code: course_id}, [unknown codes])."""
+    # Both readings of every piece ("CS 101" -> CS101, CS, 101), so one query settles which codes exist
+    candidates = set(parse_module_codes(text)) | set(re.split(r"[\s,;/|]+", (text or "").upper())) - {""}
+    if not candidates:
+        return {}, []
+    known = dict(db.session.query(Course.code, Course.id).filter(Course.code.in_(candidates)))
+    codes = parse_module_codes(text, known)
+    return {code: known[code] for code in codes if code in known}, [code for code in codes if code not in known]
+
+
+def _semester_names(semester):
+    """A semester name and the older aliases stored for it."""
+    return [semester] + [alias for alias, name in SEMESTER_ALIASES.items() if name == semester]
+
+
+def _semester(column):
+    return case(*((column == alias, literal(name)) for alias, name in SEMESTER_ALIASES.items()), else_=column)
+
+
+def enroll_registrations(registration_ids=None, academic_year=None, semester=None):
+    """
+    Create CourseEnrollment rows for the modules of approved registrations,
+    optionally only the given registrations or period. Modules the student
+    is already enrolled on for that academic year are skipped, so running it
+    again is harmless. Courses without a capacity for the period are
+    enrolled in one INSERT ... SELECT; those with one go through
+    capacity.enroll_student(), oldest registration first, so students past
+    the capacity are waitlisted instead. Returns the number of enrollments
+    created; the caller commits.
+    """
+    existing = exists().where(and_(
+        CourseEnrollment.student_id == Registration.student_id,
+        CourseEnrollment.course_id == RegistrationModule.course_id,
+        CourseEnrollment.academic_year == Registration.academic_year,
+    ))
+    capped = exists().where(and_(
+        CourseSection.course_id == RegistrationModule.course_id,
+        CourseSection.academic_year == Registration.academic_year,
+        CourseSection.semester == _semester(Registration.semester),
+    ))
+    picks = select(
+        Registration.student_id,
+        RegistrationModule.course_id,
+        Registration.academic_year,
+        func.min(_semester(Registration.semester)),
+        literal(datetime.now(timezone.utc).replace(tzinfo=None)),
+    ).select_from(RegistrationModule).join(Registration, Registration.id == RegistrationModule.registration_id).where(
+        Registration.is_registered.is_(True),
+        Registration.academic_year.isnot(None),
+        ~existing,
+    )
+    if registration_ids is not None:
+        picks = picks.where(Registration.id.in_(list(registration_ids)))
+    if academic_year:
+        picks = picks.where(Registration.academic_year == academic_year)
+    if semester:
+        picks = picks.where(Registration.semester.in_(_semester_names(semester)))
+    # A student may pick the same module on two registrations for one year; enroll them once
+    picks = picks.group_by(Registration.student_id, RegistrationModule.course_id, Registration.academic_year)
+
+    result = db.session.execute(insert(CourseEnrollment).from_select(
+        ["student_id", "course_id", "academic_year", "semester", "enrollment_date"], picks.where(~capped)
+    ))
+    created = result.rowcount
+
+    # Sorted by course so concurrent runs claim section rows in the same order and can't deadlock
+    limited = db.session.execute(picks.where(capped).add_columns(func.min(Registration.id).label("first")).order_by(
+        RegistrationModule.course_id, "first"
+    )).all()
+    for student_id, course_id, year, period_semester, _, _ in limited:
+        created += enroll_student(student_id, course_id, year, period_semester) == ENROLLED
+    return created
+
+
+def module_periods():
+    """(academic_year, semester) pairs with enrollments or module picks, newest first."""
+    enrolled = db.session.query(CourseEnrollment.academic_year, CourseEnrollment.semester).distinct()
+    picked = db.session.query(Registration.academic_year, _semester(Registration.semester)).join(
+        RegistrationModule, RegistrationModule.registration_id == Registration.id
+    ).distinct()
+    periods = {(year, semester) for year, semester in enrolled.union(picked) if year and semester}
+    return sorted(periods, reverse=True)
+
+
+def module_counts(academic_year, semester):
+    """
+    {course_id: {"enrolled": n, "pending": n}} for one period: enrollments
+    from course_enrollment, picks on registrations awaiting approval from
+    registration_module.
+    """
+    counts = {}
+    enrolled = db.session.query(CourseEnrollment.course_id, func.count(CourseEnrollment.id)).filter(
+        CourseEnrollment.academic_year == academic_year, CourseEnrollment.semester == semester
+    ).group_by(CourseEnrollment.course_id)
+    for course_id, count in enrolled:
+        counts.setdefault(course_id, {"enrolled": 0, "pending": 0})["enrolled"] = count
+
+    pending = db.session.query(RegistrationModule.course_id, func.count(RegistrationModule.id)).join(
+        Registration, Registration.id == RegistrationModule.registration_id
+    ).filter(
+        Registration.academic_year == academic_year,
+        Registration.semester.in_(_semester_names(semester)),
+        Registration.is_registered.isnot(True),
+    ).group_by(RegistrationModule.course_id)
+    for course_id, count in pending:
+        counts.setdefault(course_id, {"enrolled": 0, "pending": 0})["pending"] = count
+    return counts
+
+
+def roster_query(course_id, academic_year, semester):
+    """Students enrolled on a module for one period, by student number."""
+    return db.session.query(Student, CourseEnrollment).join(
+        CourseEnrollment, CourseEnrollment.student_id == Student.id
+    ).filter(
+        CourseEnrollment.course_id == course_id,
+        CourseEnrollment.academic_year == academic_year,
+        CourseEnrollment.semester == semester,
+    ).order_by(Student.student_number)
+
+
+def pending_roster_query(course_id, academic_year, semester):
+    """Students who picked a module on a registration that is not approved yet."""
+    return db.session.query(Student, Registration).join(
+        Registration, Registration.student_id == Student.id
+    ).join(
+        RegistrationModule, RegistrationModule.registration_id == Registration.id
+    ).filter(
+        RegistrationModule.course_id == course_id,
+        Registration.academic_year == academic_year,
+        Registration.semester.in_(_semester_names(semester)),
+        Registration.is_registered.isnot(True),
+    ).order_by(Student.student_number)
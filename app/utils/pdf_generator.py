@@ -0,0 +1,254 @@
+# app/utils/pdf_generator.py
+"""PDF builders for student documents (timetable, exam dockets)."""
+import io
+from datetime import datetime
+from itertools import groupby
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.graphics.barcode import qrencoder
+from reportlab.pdfgen import canvas
+
+from app.utils.metrics import PDF_RENDER_SECONDS
+
+
+def build_timetable_pdf(student, timetable):
+    """Build the timetable PDF for a student from student_timetable() and return its bytes."""
+    # Create PDF in memory
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*inch, bottomMargin=1*inch)
+
+    # Create styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        spaceAfter=30,
+        alignment=1,
+        textColor=colors.HexColor('#1e3c72')
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=12,
+        spaceAfter=12,
+        textColor=colors.HexColor('#2a5298')
+    )
+
+    # Build story (content)
+    story = []
+
+    # University Header
+    story.append(Paragraph("CAVENDISH UNIVERSITY", title_style))
+    story.append(Paragraph("Lusaka, Zambia", styles['Heading2']))
+    story.append(Spacer(1, 20))
+
+    # Document Title
+    story.append(Paragraph("STUDENT TIMETABLE", title_style))
+    story.append(Spacer(1, 30))
+
+    # Student Information
+    story.append(Paragraph("STUDENT INFORMATION", heading_style))
+
+    student_data = [
+        ["Student Name:", student.name],
+        ["Student ID:", student.student_number],
+        ["Academic Year:", timetable["academic_year"] or "Not enrolled"],
+        ["Date Generated:", datetime.now().strftime('%d-%m-%Y')]
+    ]
+
+    # Create table for student info
+    normal_style = styles['Normal']
+    table_data = []
+    for label, value in student_data:
+        table_data.append([Paragraph(f"<b>{label}</b>", normal_style), Paragraph(value, normal_style)])
+
+    student_table = Table(table_data, colWidths=[2*inch, 3*inch])
+    student_table.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+
+    story.append(student_table)
+    story.append(Spacer(1, 30))
+
+    # Timetable Data
+    story.append(Paragraph("CLASS SCHEDULE", heading_style))
+    if not timetable["semesters"]:
+        story.append(Paragraph("No classes are scheduled for your enrolled courses yet.", normal_style))
+        story.append(Spacer(1, 30))
+
+    for semester, entries in timetable["semesters"].items():
+        story.append(Paragraph(semester.upper(), styles['Heading3']))
+        timetable_data = [['Day', 'Time', 'Course Code', 'Course Name', 'Venue', 'Lecturer']]
+        for entry in entries:
+            timetable_data.append([
+                entry["day"],
+                f"{entry['start']:%H:%M}-{entry['end']:%H:%M}",
+                entry["code"],
+                Paragraph(f"{entry['title']} ({entry['session_type']})", normal_style),
+                entry["venue"],
+                Paragraph(entry["lecturer"] or "TBA", normal_style),
+            ])
+
+        timetable_table = Table(timetable_data, colWidths=[0.8*inch, 1.2*inch, 1*inch, 2*inch, 0.8*inch, 1.2*inch])
+        table_style = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3c72')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]
+        # Classes that overlap another of the student's classes
+        table_style += [
+            ('BACKGROUND', (0, row), (-1, row), colors.HexColor('#f8d7da'))
+            for row, entry in enumerate(entries, start=1) if entry["clash"]
+        ]
+        timetable_table.setStyle(TableStyle(table_style))
+
+        story.append(timetable_table)
+        story.append(Spacer(1, 20))
+
+    if timetable["clashes"]:
+        story.append(Paragraph(
+            f"<font color='#b02a37'><b>{timetable['clashes']} clash(es):</b> the highlighted classes overlap. "
+            "Please report them to the academic office.</font>", normal_style
+        ))
+        story.append(Spacer(1, 20))
+
+    # Important Notes
+    story.append(Paragraph("IMPORTANT NOTES", heading_style))
+    notes = [
+        "1. This timetable is subject to changes. Please check regularly for updates.",
+        "2. Students are expected to be punctual for all classes.",
+        "3. Any timetable conflicts should be reported to the academic office immediately.",
+        "4. Laboratory sessions will be scheduled separately.",
+    ]
+
+    for note in notes:
+        story.append(Paragraph(note, normal_style))
+        story.append(Spacer(1, 5))
+
+    # Build PDF
+    with PDF_RENDER_SECONDS.time(document="timetable"):
+        doc.build(story)
+    buffer.seek(0)
+    return buffer.getvalue()
+
+
+def qr_path(data, level="L", border=4):
+    """
+    PDF path operators filling the dark modules of data's QR code, one
+    rectangle per run of dark modules, in module units with the origin at the
+    lower left corner of the quiet zone. Returns (modules across including the
+    border, operators). A plain string pickles cheaply, so codes can be
+    encoded in worker processes and drawn by the parent.
+    """
+    code = qrencoder.QRCode(None, getattr(qrencoder.QRErrorCorrectLevel, level))
+    code.addData(data)
+    code.make()
+    count = code.getModuleCount()
+    rects = []
+    for r, row in enumerate(code.modules):
+        y, column = count + border - 1 - r, border
+        for dark, group in groupby(row):
+            length = len(list(group))
+            if dark:
+                rects.append(f"{column} {y} {length} 1 re")
+            column += length
+    return count + 2 * border, " ".join(rects)
+
+
+def _draw_qr(pdf, code, x, y, size):
+    """Draw a qr_path() code as a size x size square with its lower left corner at (x, y)."""
+    modules, path = code
+    scale = size / modules
+    pdf.saveState()
+    pdf.transform(scale, 0, 0, scale, x, y)  # integer module coordinates keep the page stream small
+    pdf.addLiteral(f"{path} f")
+    pdf.restoreState()
+
+
+def build_dockets_pdf(dockets, codes=None):
+    """
+    One docket per A4 page, drawn straight on the canvas, and return the PDF
+    bytes. Each docket is a dict with name, student_number, program,
+    assessment, qr (the text encoded in its QR code) and optionally
+    course_code, course_title, period, seats (printed lines, one per exam
+    seat) and valid_until. codes maps qr texts to their
+    qr_path(); missing ones are encoded here, once per distinct text.
+    """
+    codes = dict(codes or {})
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=A4, pageCompression=1)
+    pdf.setTitle("Exam dockets" if len(dockets) != 1 else f"Docket - {dockets[0]['assessment']}")
+    width, height = A4
+    issued = datetime.now().strftime('%d-%m-%Y')
+
+    for docket in dockets:
+        y = height - inch
+        pdf.setFont("Helvetica-Bold", 18)
+        pdf.drawCentredString(width / 2, y, f"Docket - {docket['assessment']}")
+        pdf.setFont("Helvetica", 11)
+        y -= 0.45 * inch
+        pdf.drawCentredString(width / 2, y, "CAVENDISH UNIVERSITY - Lusaka, Zambia")
+
+        lines = [
+            ("Student", f"{docket['name']} ({docket['student_number']})"),
+            ("Program", docket.get("program") or "Not specified"),
+        ]
+        if docket.get("course_code"):
+            lines.append(("Course", f"{docket['course_code']} - {docket.get('course_title') or ''}"))
+        if docket.get("period"):
+            lines.append(("Period", docket["period"]))
+        lines.extend(("Exam seat", seat) for seat in docket.get("seats") or ())
+        lines.append(("Issued", issued))
+        if docket.get("valid_until"):
+            lines.append(("Valid until", docket["valid_until"]))
+
+        y -= 0.5 * inch
+        for label, value in lines:
+            pdf.setFont("Helvetica-Bold", 11)
+            pdf.drawString(inch, y, f"{label}:")
+            pdf.setFont("Helvetica", 11)
+            pdf.drawString(2.2 * inch, y, value[:80])
+            y -= 0.3 * inch
+
+        if docket["qr"] not in codes:
+            codes[docket["qr"]] = qr_path(docket["qr"])
+        y -= 150 + 0.1 * inch
+        _draw_qr(pdf, codes[docket["qr"]], inch, y, 150)
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(inch, y - 0.3 * inch, "Scan this QR code to verify docket details online.")
+        pdf.showPage()
+
+    pdf.save()
+    return buf.getvalue()
+
+
+def build_docket_pdf(student, assessment, qr_text, seats=None):
+    """
+    Build a printable docket PDF with a QR code encoding qr_text and return
+    its bytes. seats are (course code, seat label) pairs of the student's
+    planned exam seats.
+    """
+    docket = {
+        "name": student.name, "student_number": student.student_number, "program": student.program,
+        "assessment": assessment, "qr": qr_text, "seats": [f"{code}: {label}" for code, label in seats or ()],
+    }
+    with PDF_RENDER_SECONDS.time(document="docket"):
+        return build_dockets_pdf([docket])
@@ -0,0 +1,404 @@
+# app/utils/profiler.py
+"""
+On-demand request profiler.
+
+An admin arms a rule ("profile the next N requests for endpoint X / path
+matching Y"). The rule is stored as a file in the profiles folder so every
+gunicorn worker sees it; each worker re-reads it at most once per second.
+Matching requests are sampled by a background thread that records the
+request thread's stack every few milliseconds, and the result is written as
+a speedscope JSON file plus a self-contained flame graph HTML page.
+
+Requests that do not match the armed rule only pay for a dictionary lookup
+and, when a rule exists, a string comparison or regex search.
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import html
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+RULE_FILENAME = "active_rule.json"
+
+
+class _StackSampler(threading.Thread):
+    """Background thread sampling the stack of one target thread."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class _ProfileSession:
+    """State for one profiled request."""
+
+    def __init__(self, rule, slot, interval):
+        self.rule = rule
+        self.slot = slot
+        self.interval = interval
+        self.started_at = datetime.utcnow()
+        self.trace_memory = rule.get("tracemalloc", False)
+        self.sampler = _StackSampler(threading.get_ident(), interval)
+        self._start = None
+        self._owns_trace = False
+
+    def start(self):
+        self._owns_trace = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._owns_trace = True
+        self._start = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        duration = time.perf_counter() - self._start
+        top_allocations = []
+        if self.trace_memory:
+            snapshot = tracemalloc.take_snapshot()
+            if self._owns_trace:
+                tracemalloc.stop()
+            for stat in snapshot.statistics("lineno")[:25]:
+                frame = stat.traceback[0]
+                top_allocations.append({
+                    "file": frame.filename,
+                    "line": frame.lineno,
+                    "size_kb": round(stat.size / 1024.0, 1),
+                    "count": stat.count,
+                })
+        return duration, top_allocations
+
+
+class RequestProfiler:
+    """Flask extension that profiles requests selected by an admin-armed rule."""
+
+    def __init__(self, app=None):
+        self.folder = None
+        self.sample_interval = 0.005
+        self._rule = None
+        self._rule_mtime = None
+        self._pattern = None
+        self._checked_at = 0.0
+        self._exhausted = set()
+        self._lock = threading.Lock()
+        self._busy = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.folder = app.config.get("PROFILE_FOLDER") or os.path.join(app.instance_path, "profiles")
+        self.sample_interval = app.config.get("PROFILER_SAMPLE_INTERVAL", 0.005)
+        os.makedirs(os.path.join(self.folder, "claims"), exist_ok=True)
+        app.extensions["profiler"] = self
+        app.before_request(self._before_request)
+        app.teardown_request(self._teardown_request)
+
+    # ---------------- Rule management ----------------
+    @property
+    def rule_path(self):
+        return os.path.join(self.folder, RULE_FILENAME)
+
+    def arm(self, endpoint=None, pattern=None, limit=5, trace_memory=False, created_by=None):
+        """Arm a new rule, replacing any existing one. Returns the stored rule."""
+        if not endpoint and not pattern:
+            raise ValueError("An endpoint or a URL pattern is required.")
+        if pattern:
+            re.compile(pattern)  # surface invalid regexes to the caller
+        self.disarm()
+        rule = {
+            "id": uuid.uuid4().hex[:12],
+            "endpoint": endpoint or None,
+            "pattern": pattern or None,
+            "limit": int(limit),
+            "tracemalloc": bool(trace_memory),
+            "created_by": created_by,
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        }
+        tmp_path = f"{self.rule_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(rule, f)
+        os.replace(tmp_path, self.rule_path)
+        self._checked_at = 0.0
+        return rule
+
+    def disarm(self):
+        rule = self.current_rule()
+        if os.path.exists(self.rule_path):
+            os.remove(self.rule_path)
+        if rule:
+            self._remove_claims(rule["id"])
+        self._checked_at = 0.0
+
+    def current_rule(self):
+        """Return the armed rule as stored on disk, or None."""
+        try:
+            with open(self.rule_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def claimed_count(self, rule):
+        prefix = f"{rule['id']}."
+        return len([f for f in os.listdir(os.path.join(self.folder, "claims")) if f.startswith(prefix)])
+
+    def _remove_claims(self, rule_id):
+        claims_dir = os.path.join(self.folder, "claims")
+        for filename in os.listdir(claims_dir):
+            if filename.startswith(f"{rule_id}."):
+                try:
+                    os.remove(os.path.join(claims_dir, filename))
+                except OSError:
+                    pass
+
+    def _refresh_rule(self):
+        """Reload the rule file at most once per second."""
+        now = time.monotonic()
+        if now - self._checked_at < 1.0:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.rule_path).st_mtime
+        except OSError:
+            self._rule, self._rule_mtime, self._pattern = None, None, None
+            return
+        if mtime != self._rule_mtime:
+            rule = self.current_rule()
+            self._rule = rule
+            self._rule_mtime = mtime
+            self._pattern = re.compile(rule["pattern"]) if rule and rule.get("pattern") else None
+
+    def _claim_slot(self, rule):
+        """Atomically claim one of the rule's N slots across all workers (O_EXCL files)."""
+        claims_dir = os.path.join(self.folder, "claims")
+        for slot in range(rule["limit"]):
+            try:
+                fd = os.open(os.path.join(claims_dir, f"{rule['id']}.{slot}"), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            except OSError:
+                return None
+            os.close(fd)
+            return slot
+        self._exhausted.add(rule["id"])
+        return None
+
+    # ---------------- Request hooks ----------------
+    def _matches(self, request):
+        rule = self._rule
+        if rule is None or rule["id"] in self._exhausted:
+            return None
+        if rule.get("endpoint") and request.endpoint != rule["endpoint"]:
+            return None
+        if self._pattern is not None and not self._pattern.search(request.path):
+            return None
+        return rule
+
+    def _before_request(self):
+        from flask import g, request
+        self._refresh_rule()
+        rule = self._matches(request)
+        if rule is None:
+            return
+        with self._lock:
+            # tracemalloc is process-wide, so only one request per worker is profiled at a time
+            if self._busy:
+                return
+            slot = self._claim_slot(rule)
+            if slot is None:
+                return
+            self._busy = True
+        session = _ProfileSession(rule, slot, self.sample_interval)
+        g._profile_session = session
+        session.start()
+
+    def _teardown_request(self, exc):
+        from flask import g, request
+        session = g.pop("_profile_session", None)
+        if session is None:
+            return
+        try:
+            duration, allocations = session.stop()
+            self._write_profile(session, request, duration, allocations, exc)
+        finally:
+            with self._lock:
+                self._busy = False
+
+    # ---------------- Output ----------------
+    def _write_profile(self, session, request, duration, allocations, exc):
+        stacks = session.sampler.stacks
+        endpoint = request.endpoint or "unmatched"
+        base = f"{session.started_at.strftime('%Y%m%d_%H%M%S')}_{re.sub(r'[^A-Za-z0-9_]+', '_', endpoint)}_{session.rule['id']}_{session.slot}"
+        title = f"{request.method} {request.full_path.rstrip('?')} ({endpoint})"
+
+        with open(os.path.join(self.folder, f"{base}.speedscope.json"), "w") as f:
+            json.dump(_to_speedscope(stacks, session.interval, title), f)
+        with open(os.path.join(self.folder, f"{base}.html"), "w", encoding="utf-8") as f:
+            f.write(_to_flamegraph_html(stacks, session.interval, title, duration, allocations))
+        meta = {
+            "name": base,
+            "title": title,
+            "endpoint": endpoint,
+            "path": request.path,
+            "method": request.method,
+            "rule_id": session.rule["id"],
+            "started_at": session.started_at.isoformat(timespec="seconds"),
+            "duration_ms": round(duration * 1000.0, 2),
+            "samples": sum(stacks.values()),
+            "error": repr(exc) if exc else None,
+            "allocations": allocations,
+        }
+        with open(os.path.join(self.folder, f"{base}.meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    def list_profiles(self):
+        """Return metadata for stored profiles, newest first."""
+        profiles = []
+        for filename in os.listdir(self.folder):
+            if not filename.endswith(".meta.json"):
+                continue
+            try:
+                with open(os.path.join(self.folder, filename)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda p: p.get("started_at", ""), reverse=True)
+
+    def delete_profile(self, name):
+        for suffix in (".speedscope.json", ".html", ".meta.json"):
+            path = os.path.join(self.folder, f"{name}{suffix}")
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _frame_label(frame):
+    name, filename, line = frame
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _to_speedscope(stacks, interval, title):
+    """Convert sampled stacks to the speedscope 'sampled' file format."""
+    frame_index = {}
+    frames = []
+    samples = []
+    weights = []
+    for stack, count in stacks.items():
+        indices = []
+        for frame in stack:
+            if frame not in frame_index:
+                frame_index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            indices.append(frame_index[frame])
+        samples.append(indices)
+        weights.append(count * interval)
+    total = sum(weights)
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": title,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": total,
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": title,
+        "exporter": "cavendish-portal-profiler",
+    }
+
+
+def _to_flamegraph_html(stacks, interval, title, duration, allocations):
+    """Render sampled stacks as a static, self-contained flame graph page."""
+    root = {"name": "all", "value": 0, "children": {}}
+    for stack, count in stacks.items():
+        root["value"] += count
+        node = root
+        for frame in stack:
+            label = _frame_label(frame)
+            child = node["children"].setdefault(label, {"name": label, "value": 0, "children": {}})
+            child["value"] += count
+            node = child
+
+    rows = []
+    max_depth = [0]
+
+    def render(node, left, depth):
+        if root["value"] == 0:
+            return
+        width = node["value"] / root["value"] * 100.0
+        if width < 0.1:
+            return
+        max_depth[0] = max(max_depth[0], depth)
+        ms = node["value"] * interval * 1000.0
+        hue = 20 + (hash(node["name"]) % 40)
+        label = html.escape(node["name"])
+        rows.append(
+            f'<div class="f" style="left:{left:.4f}%;width:{width:.4f}%;bottom:{depth * 18}px;'
+            f'background:hsl({hue},85%,60%)" title="{label} — {ms:.1f} ms ({width:.1f}%)">{label}</div>'
+        )
+        offset = left
+        for child in sorted(node["children"].values(), key=lambda c: c["name"]):
+            render(child, offset, depth + 1)
+            offset += child["value"] / root["value"] * 100.0
+
+    render(root, 0.0, 0)
+    height = (max_depth[0] + 1) * 18
+
+    allocation_rows = "".join(
+        f"<tr><td>{html.escape(a['file'])}:{a['line']}</td><td>{a['size_kb']}</td><td>{a['count']}</td></tr>"
+        for a in allocations
+    )
+    allocation_table = (
+        f"<h3>Top allocations (tracemalloc)</h3><table><tr><th>Location</th><th>KiB</th><th>Blocks</th></tr>"
+        f"{allocation_rows}</table>" if allocations else ""
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<title>Flame graph - {html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 20px; }}
+#graph {{ position: relative; height: {height}px; border: 1px solid #ccc; }}
+.f {{ position: absolute; height: 17px; overflow: hidden; white-space: nowrap; font-size: 11px;
+      line-height: 17px; padding-left: 2px; box-sizing: border-box; border-right: 1px solid #fff; cursor: default; }}
+table {{ border-collapse: collapse; font-size: 12px; }}
+td, th {{ border: 1px solid #ccc; padding: 2px 6px; }}
+</style>
+</head>
+<body>
+<h2>{html.escape(title)}</h2>
+<p>Wall time: {duration * 1000.0:.1f} ms &middot; Samples: {root['value']} every {interval * 1000.0:.1f} ms</p>
+<div id="graph">{''.join(rows)}</div>
+{allocation_table}
+</body>
+</html>
+"""
+
+
+profiler = RequestProfiler()
@@ -0,0 +1,314 @@
+# app/utils/reconciliation.py
+"""
+Bank / mobile-money statement reconciliation.
+
+A statement CSV is streamed line by line and matched against pending
+payments using two in-memory hash indexes built once per import:
+
+1. by reference (normalised: upper-case, alphanumerics only), when the
+   amounts agree and the line names no other student, and
+2. by (student number, amount) with the statement date within a few days
+   of the payment's submission date.
+
+Students type the reference in themselves, so a reference alone never
+approves a payment: one copied from someone else's slip would otherwise
+claim their money. References that normalise to the same key for several
+pending payments ("AB-12" and "ab12") match none of them; their lines are
+queued for a person to decide.
+
+Exact matches are approved through approve_payment(), the same path as the
+admin "approve" button. Everything else is written, in batches, to the
+unmatched_statement_line review queue. Memory stays bounded by the number
+of pending payments plus one batch of lines, not by the statement size.
+"""
+import csv
+import re
+from collections import defaultdict, namedtuple
+from datetime import date, datetime, timezone
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app.models import db, Payment, Student, StatementImport, UnmatchedStatementLine
+from app.utils.helpers import approve_payment
+
+HEADER_ALIASES = {
+    "reference": {"reference", "ref", "transaction reference", "transaction id", "txn id", "receipt", "receipt number"},
+    "amount": {"amount", "credit", "credit amount", "paid in", "amount (zmw)"},
+    "date": {"date", "transaction date", "value date", "posting date", "txn date"},
+    "student_number": {"student number", "student_number", "student no", "account", "customer reference"},
+    "description": {"description", "narration", "details", "particulars", "remarks"},
+}
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d %b %Y", "%d-%b-%Y", "%Y-%m-%d %H:%M:%S")
+
+StatementLine = namedtuple("StatementLine", "line_number reference amount_cents date student_number description")
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]")
+_AMOUNT_JUNK = re.compile(r"[^0-9.\-]")
+
+
+def normalise_reference(value):
+    if not value:
+        return None
+    return _NON_ALNUM.sub("", value.upper()) or None
+
+
+def _parse_amount(value):
+    """Amount in cents, or None. Accepts '1,250.00', 'K1250', 'ZMW 1250'."""
+    cleaned = _AMOUNT_JUNK.sub("", value or "")
+    if not cleaned:
+        return None
+    try:
+        return round(float(cleaned) * 100)
+    except ValueError:
+        return None
+
+
+def _parse_date(value):
+    value = (value or "").strip()
+    try:
+        return date.fromisoformat(value[:10])  # fast path for the common YYYY-MM-DD export
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _resolve_columns(fieldnames):
+    columns = {}
+    for name in fieldnames or []:
+        key = (name or "").strip().lower()
+        for field, aliases in HEADER_ALIASES.items():
+            if key in aliases and field not in columns:
+                columns[field] = name
+    missing = {"amount", "date"} - set(columns)
+    if missing or not ({"reference", "student_number", "description"} & set(columns)):
+        raise ValueError(
+            "Statement needs amount and date columns plus a reference, student number or description column; "
+            f"found: {', '.join(fieldnames or []) or 'no header'}"
+        )
+    return columns
+
+
+def parse_statement(stream):
+    """Yield StatementLine tuples from a CSV text stream without reading it all into memory."""
+    reader = csv.DictReader(stream)
+    columns = _resolve_columns(reader.fieldnames)
+    get = {field: columns.get(field) for field in HEADER_ALIASES}
+    for line_number, row in enumerate(reader, start=2):  # line 1 is the header
+        yield StatementLine(
+            line_number=line_number,
+            reference=(row.get(get["reference"]) or "").strip() or None if get["reference"] else None,
+            amount_cents=_parse_amount(row.get(get["amount"])),
+            date=_parse_date(row.get(get["date"])),
+            student_number=(row.get(get["student_number"]) or "").strip().upper() or None if get["student_number"] else None,
+            description=(row.get(get["description"]) or "").strip() or None if get["description"] else None,
+        )
+
+
+class PendingPaymentIndex:
+    """Hash indexes over pending payments, built once per import."""
+
+    def __init__(self, date_window_days=3):
+        self.date_window_days = date_window_days
+        self.by_reference = {}
+        self.ambiguous_references = set()  # keys shared by several pending payments
+        self.by_student_amount = defaultdict(list)
+        self.student_numbers = set()
+        # payment_id -> (amount_cents, reference key, student/amount key, student number)
+        # so a matched payment can be dropped from both indexes in O(1)
+        self.entries = {}
+
+    @classmethod
+    def build(cls, date_window_days=3):
+        index = cls(date_window_days)
+        rows = db.session.query(
+            Payment.id, Payment.reference, Payment.amount, Payment.submitted_date, Student.student_number
+        ).join(Student, Payment.student_id == Student.id).filter(Payment.status == "pending").yield_per(10000)
+        for payment_id, reference, amount, submitted, student_number in rows:
+            amount_cents = round(amount * 100) if amount is not None else None
+            ref = normalise_reference(reference)
+            if ref in index.by_reference or ref in index.ambiguous_references:
+                index.by_reference.pop(ref, None)
+                index.ambiguous_references.add(ref)
+            elif ref:
+                index.by_reference[ref] = payment_id
+            student_number = student_number.upper() if student_number else None
+            key = None
+            if student_number:
+                index.student_numbers.add(student_number)
+                if amount_cents is not None:
+                    key = (student_number, amount_cents)
+                    index.by_student_amount[key].append((payment_id, submitted.date() if submitted else None))
+            index.entries[payment_id] = (amount_cents, ref, key, student_number)
+        return index
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _student_number_for(self, line):
+        if line.student_number:
+            return line.student_number
+        # Narrations often carry the student number somewhere in free text
+        for token in _NON_ALNUM.split((line.description or "").upper()):
+            if token in self.student_numbers:
+                return token
+        return None
+
+    def _names_other_student(self, line, student_number):
+        """Whether the line's student number column, or a student number in its narration, is someone else's."""
+        if line.student_number:
+            return line.student_number != student_number
+        tokens = set(_NON_ALNUM.split((line.description or "").upper()))
+        return student_number not in tokens and bool(tokens & self.student_numbers)
+
+    def _consume(self, payment_id):
+        """Remove a matched payment so a duplicate statement line can't match it again."""
+        _, ref, key, _ = self.entries.pop(payment_id)
+        if ref:
+            self.by_reference.pop(ref, None)
+        if key:
+            remaining = [c for c in self.by_student_amount[key] if c[0] != payment_id]
+            if remaining:
+                self.by_student_amount[key] = remaining
+            else:
+                del self.by_student_amount[key]
+
+    def match(self, line):
+        """Return (payment_id, None) for an exact match or (None, reason)."""
+        if line.amount_cents is None or line.date is None:
+            return None, "unreadable amount or date"
+
+        ref = normalise_reference(line.reference)
+        if ref in self.ambiguous_references:
+            return None, "reference matches several pending payments"
+        if ref and ref in self.by_reference:
+            payment_id = self.by_reference[ref]
+            expected, _, _, student_number = self.entries[payment_id]
+            if expected is None:
+                return None, "reference matches a payment with no amount"
+            if expected != line.amount_cents:
+                return None, "reference matches but amount differs"
+            if self._names_other_student(line, student_number):
+                return None, "reference matches another student's payment"
+            self._consume(payment_id)
+            return payment_id, None
+
+        number = self._student_number_for(line)
+        if not number:
+            return None, "no matching reference or student number"
+        candidates = [
+            payment_id for payment_id, submitted in self.by_student_amount.get((number, line.amount_cents), ())
+            if submitted is None or abs((line.date - submitted).days) <= self.date_window_days
+        ]
+        if not candidates:
+            return None, "no pending payment with this amount and date"
+        if len(candidates) > 1:
+            return None, "several pending payments match"
+        self._consume(candidates[0])
+        return candidates[0], None
+
+
+def _queued(import_id, line, reason):
+    """An unmatched_statement_line row for the review queue."""
+    return {
+        "import_id": import_id,
+        "line_number": line.line_number,
+        "reference": line.reference[:100] if line.reference else None,
+        "amount": line.amount_cents / 100.0 if line.amount_cents is not None else None,
+        "transaction_date": line.date,
+        "student_number": line.student_number[:20] if line.student_number else None,
+        "description": line.description,
+        "reason": reason,
+        "status": "open",
+        "payment_id": None,
+        "resolved_at": None,
+    }
+
+
+def reconcile_statement(stream, filename, imported_by=None, batch_size=5000, date_window_days=3):
+    """
+    Stream a statement, auto-approve exact matches and queue the rest.
+    Returns the finished StatementImport.
+    """
+    statement_import = StatementImport(filename=filename, imported_by=imported_by)
+    db.session.add(statement_import)
+    db.session.commit()
+    import_id = statement_import.id
+
+    index = PendingPaymentIndex.build(date_window_days)
+    current_app.logger.info(f"Reconciling {filename}: {len(index)} pending payments indexed")
+
+    totals = {"total": 0, "matched": 0, "unmatched": 0}
+    unmatched = []
+    matched = []
+
+    def flush():
+        for payment_id, line in matched:
+            payment = db.session.get(Payment, payment_id)
+            if payment is not None and payment.status == "pending":
+                outcome = approve_payment(payment, approved_by=f"Statement reconciliation #{import_id}")
+                if outcome == "conflict":
+                    # An admin acted on the payment at the same moment; let a person look at the line
+                    totals["matched"] -= 1
+                    totals["unmatched"] += 1
+                    unmatched.append(_queued(import_id, line, "payment changed during import"))
+        matched.clear()
+        if unmatched:
+            db.session.execute(insert(UnmatchedStatementLine.__table__), unmatched)
+            unmatched.clear()
+        db.session.execute(
+            StatementImport.__table__.update().where(StatementImport.__table__.c.id == import_id).values(
+                total_lines=totals["total"], matched_lines=totals["matched"], unmatched_lines=totals["unmatched"]
+            )
+        )
+        db.session.commit()
+
+    try:
+        for line in parse_statement(stream):
+            if line.amount_cents is not None and line.amount_cents <= 0:
+                continue  # debits and reversals are never student payments
+            totals["total"] += 1
+            payment_id, reason = index.match(line)
+            if payment_id is not None:
+                totals["matched"] += 1
+                matched.append((payment_id, line))
+            else:
+                totals["unmatched"] += 1
+                unmatched.append(_queued(import_id, line, reason))
+            if len(unmatched) + len(matched) >= batch_size:
+                flush()
+        flush()
+    except Exception as e:
+        db.session.rollback()
+        statement_import = db.session.get(StatementImport, import_id)
+        statement_import.status = "failed"
+        statement_import.error = str(e)
+        statement_import.finished_at = datetime.now(timezone.utc)
+        db.session.commit()
+        raise
+
+    statement_import = db.session.get(StatementImport, import_id)
+    statement_import.status = "completed"
+    statement_import.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+    return statement_import
+
+
+def resolve_line(line, payment, approved_by):
+    """Manually match a queued line to a pending payment and approve it."""
+    line.status = "matched"
+    line.payment_id = payment.id
+    line.resolved_at = datetime.now(timezone.utc)
+    return approve_payment(payment, approved_by=approved_by)
+
+
+def dismiss_line(line):
+    """Mark a queued line as not a student payment."""
+    line.status = "dismissed"
+    line.resolved_at = datetime.now(timezone.utc)
+    db.session.commit()
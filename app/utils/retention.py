@@ -0,0 +1,221 @@
+# app/utils/retention.py
+"""
+Retention for append-only history tables (chatbot_message, system_log).
+
+Rows older than the configured age are moved out of the live database into
+gzip-compressed JSON Lines files, per table, month of created_at and run:
+
+    <ARCHIVE_FOLDER>/system_log/2025-03.20251112T101500123456.jsonl.gz
+
+Each run works in chunks: read a chunk of expired rows, write each month's
+rows to a new part file (through a temporary file that is fsynced and then
+os.replace()d into place, so a crash or full disk never leaves a truncated
+archive behind), then delete exactly those ids in a short transaction. At
+the end of the run the parts of each month are concatenated (gzip members
+read back as one stream) into the run's file the same way. A crash between
+writing and deleting can leave a row both archived and live; the next run
+archives it again and readers drop repeated ids, so nothing is ever lost.
+Archives written before per-run files, <month>.jsonl.gz, are still read.
+
+Archives are read back, read-only, with iter_archive() for the admin
+archive view.
+"""
+import gzip
+import json
+import os
+import re
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import delete, select
+
+from app.models import db, ChatbotMessage, SystemLog
+
+ARCHIVED_TABLES = {
+    "chatbot_message": ChatbotMessage.__table__,
+    "system_log": SystemLog.__table__,
+}
+
+_MONTH = re.compile(r"^(\d{4}-\d{2})(?:\.(\d{8}T\d{12})(?:-(\d+))?)?\.jsonl\.gz$")
+
+
+def archive_folder():
+    return current_app.config.get("ARCHIVE_FOLDER") or os.path.join(current_app.instance_path, "archives")
+
+
+def _table_folder(table_name):
+    return os.path.join(archive_folder(), table_name)
+
+
+def _month_files(table_name, month):
+    """Paths of every archive file of one table and month, oldest run first."""
+    folder = _table_folder(table_name)
+    if not os.path.isdir(folder):
+        return []
+    files = []
+    for filename in os.listdir(folder):
+        match = _MONTH.match(filename)
+        if match and match.group(1) == month:
+            files.append(((match.group(2) or "", int(match.group(3) or 0)), os.path.join(folder, filename)))
+    return [path for _, path in sorted(files)]
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _write_atomically(path, chunks):
+    """Write the byte chunks to path via a fsynced temporary file, so path is either complete or absent."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _write_part(table_name, month, run, part, rows):
+    folder = _table_folder(table_name)
+    os.makedirs(folder, exist_ok=True)
+    payload = "".join(json.dumps({k: _encode(v) for k, v in row.items()}) + "\n" for row in rows)
+    _write_atomically(os.path.join(folder, f"{month}.{run}-{part}.jsonl.gz"), [gzip.compress(payload.encode("utf-8"))])
+
+
+def _join_parts(table_name, run):
+    """Concatenate the run's part files into one file per month, then remove the parts."""
+    folder = _table_folder(table_name)
+    if not os.path.isdir(folder):
+        return
+    parts = {}
+    for filename in os.listdir(folder):
+        match = _MONTH.match(filename)
+        if match and match.group(2) == run and match.group(3):
+            parts.setdefault(match.group(1), []).append((int(match.group(3)), os.path.join(folder, filename)))
+    for month, files in parts.items():
+        paths = [path for _, path in sorted(files)]
+
+        def contents():
+            for path in paths:
+                with open(path, "rb") as f:
+                    yield f.read()
+
+        _write_atomically(os.path.join(folder, f"{month}.{run}.jsonl.gz"), contents())
+        for path in paths:
+            os.remove(path)
+
+
+def _remove_unfinished(table_name):
+    """Temporary files are only left behind by a run that crashed mid-write; they were never complete."""
+    folder = _table_folder(table_name)
+    if os.path.isdir(folder):
+        for filename in os.listdir(folder):
+            if filename.endswith(".jsonl.gz.tmp"):
+                os.remove(os.path.join(folder, filename))
+
+
+def archive_table(table_name, older_than_days, chunk_size=1000, pause=0.0, dry_run=False, log=print):
+    """
+    Move rows of `table_name` whose created_at is older than `older_than_days`
+    into monthly archive files. Returns the number of rows archived.
+    """
+    table = ARCHIVED_TABLES[table_name]
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=older_than_days)
+    expired = select(table).where(table.c.created_at < cutoff).order_by(table.c.created_at, table.c.id)
+
+    if dry_run:
+        count = db.session.query(db.func.count()).select_from(table).filter(table.c.created_at < cutoff).scalar()
+        log(f"{table_name}: {count:,} rows older than {cutoff:%Y-%m-%d} would be archived")
+        return count
+
+    _remove_unfinished(table_name)
+    run = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    archived = part = 0
+    while True:
+        rows = [dict(row) for row in db.session.execute(expired.limit(chunk_size)).mappings()]
+        db.session.rollback()  # end the read transaction before touching the archive
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row["created_at"].strftime("%Y-%m"), []).append(row)
+        part += 1
+        for month, month_rows in by_month.items():
+            _write_part(table_name, month, run, part, month_rows)
+
+        db.session.execute(delete(table).where(table.c.id.in_([row["id"] for row in rows])))
+        db.session.commit()
+        archived += len(rows)
+        log(f"{table_name}: archived {archived:,} rows")
+        if len(rows) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)  # let request writers in between chunks
+    _join_parts(table_name, run)
+    return archived
+
+
+def apply_retention(chunk_size=None, dry_run=False, log=print):
+    """Archive every table in RETENTION_DAYS. Returns {table_name: rows archived}."""
+    chunk_size = chunk_size or current_app.config.get("RETENTION_CHUNK_SIZE", 1000)
+    pause = current_app.config.get("RETENTION_CHUNK_PAUSE", 0.0)
+    results = {}
+    for table_name, days in current_app.config.get("RETENTION_DAYS", {}).items():
+        if days is None or table_name not in ARCHIVED_TABLES:
+            continue
+        results[table_name] = archive_table(table_name, days, chunk_size=chunk_size, pause=pause, dry_run=dry_run, log=log)
+    return results
+
+
+# ---------------- Reading archives ----------------
+def list_archives():
+    """Return [{table, month, size}] for every archived month, newest month first."""
+    sizes = {}
+    for table_name in ARCHIVED_TABLES:
+        folder = _table_folder(table_name)
+        if not os.path.isdir(folder):
+            continue
+        for filename in os.listdir(folder):
+            match = _MONTH.match(filename)
+            if match:
+                key = (table_name, match.group(1))
+                sizes[key] = sizes.get(key, 0) + os.path.getsize(os.path.join(folder, filename))
+    archives = [{"table": table, "month": month, "size": size} for (table, month), size in sizes.items()]
+    return sorted(archives, key=lambda a: (a["month"], a["table"]), reverse=True)
+
+
+def iter_archive(table_name, month, term=None):
+    """Yield archived rows (dicts) for one table and month, optionally filtered by a search term."""
+    if table_name not in ARCHIVED_TABLES or not re.fullmatch(r"\d{4}-\d{2}", month or ""):
+        raise ValueError("Unknown archive")
+    paths = _month_files(table_name, month)
+    if not paths:
+        raise ValueError("Unknown archive")
+    term = (term or "").lower()
+    seen = set()
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if term and term not in line.lower():
+                    continue
+                row = json.loads(line)
+                if row["id"] in seen:
+                    continue
+                seen.add(row["id"])
+                yield row
+
+
+def read_archive_page(table_name, month, term=None, page=1, per_page=50):
+    """One page of an archive plus the total number of matching rows."""
+    start = (max(page, 1) - 1) * per_page
+    items = []
+    total = 0
+    for row in iter_archive(table_name, month, term):
+        if start <= total < start + per_page:
+            items.append(row)
+        total += 1
+    return items, total
@@ -0,0 +1,461 @@
+# app/utils/seed.py
+"""
+Synthetic data generator for realistic, large datasets.
+
+Rows are built as plain dicts with explicit primary keys and written with
+bulk Core inserts (executemany), so 100k students with their users, payments,
+slips and enrollments are generated in seconds. The same seed always produces
+the same dataset, which makes it the baseline for performance measurements.
+"""
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as time_of_day, timedelta
+
+from sqlalchemy import func, insert, text
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db
+from app.models import (
+    User, UserRole, Student, Lecturer, Course, CourseEnrollment, Payment,
+    RegistrationSlip, Registration, RegistrationModule, TimetableSlot, ChatbotMessage, DocketEligibility,
+    ExamHall, ExamSession, ExamSeat, CourseSection
+)
+from app.utils.dockets import refresh_eligibility, thresholds
+from app.utils.seating import plan_seating
+
+SEED_PASSWORD = "SeedPass123"
+
+FACULTIES = {
+    "Business & Management": ["BBA", "BCom Accounting", "BSc Economics", "MBA"],
+    "Information Technology": ["BSc Computer Science", "BSc Information Systems", "BSc Software Engineering"],
+    "Medicine & Health Sciences": ["MBChB", "BSc Nursing", "BSc Public Health", "BPharm"],
+    "Law": ["LLB"],
+    "Education": ["BEd Mathematics", "BEd English", "BEd Science"],
+    "Social Sciences": ["BA Development Studies", "BA Social Work", "BA Psychology"],
+}
+FACULTY_WEIGHTS = [25, 22, 20, 8, 12, 13]
+
+FIRST_NAMES = [
+    "Mwila", "Chanda", "Mutale", "Bwalya", "Natasha", "Kondwani", "Thandiwe", "Lombe", "Mapalo", "Chileshe",
+    "Musonda", "Kasonde", "Mulenga", "Nkandu", "Alphaus", "Grace", "Joseph", "Ruth", "Peter", "Esther",
+    "Daniel", "Martha", "Brian", "Mercy", "Kelvin", "Naomi", "Emmanuel", "Precious", "Victor", "Faith",
+]
+LAST_NAMES = [
+    "Banda", "Phiri", "Mwale", "Tembo", "Zulu", "Mumba", "Sakala", "Lungu", "Mwanza", "Daka",
+    "Ngoma", "Chisenga", "Kapata", "Nyirenda", "Simukonda", "Mbewe", "Chilufya", "Kabwe", "Siame", "Hamoonga",
+]
+
+GRADES = ["A", "B+", "B", "C+", "C", "D", "F"]
+GRADE_WEIGHTS = [10, 15, 22, 20, 18, 9, 6]
+# Course totals drawn for each grade, inside the default GRADE_BOUNDARIES, and the default component weights
+GRADE_TOTALS = {"A": (81, 94), "B+": (76, 79), "B": (71, 74), "C+": (66, 69), "C": (61, 64), "D": (51, 59), "F": (22, 38)}
+CAT_WEIGHT, FINAL_WEIGHT = 0.15, 0.70
+
+# Weekly meetings per course and semester: (session type, hours); classes run 08:00-18:00 Monday-Friday
+TIMETABLE_SESSIONS = [("Lecture", 2), ("Tutorial", 1)]
+VENUES_PER_COURSE = 0.15
+PLACEMENT_ATTEMPTS = 50
+
+PAYMENT_STATUSES = ["approved", "pending", "rejected"]
+PAYMENT_STATUS_WEIGHTS = [72, 18, 10]
+PAYMENT_METHODS = ["Bank Transfer", "Mobile Money", "Online Portal", "Cash"]
+PAYMENT_METHOD_WEIGHTS = [45, 35, 15, 5]
+
+SEMESTERS = ["Semester 1", "Semester 2"]
+
+# The current year's modules are capped at their enrollment plus this share, so they look nearly full
+SECTION_SLACK = 10  # percent
+
+# Exam halls as (name, share of the student body seated at once, seats per row), and the
+# current year's FINAL sittings: two a weekday for three weeks from each semester's start date
+EXAM_HALLS = [("Main Hall", 0.06, 12), ("Sports Hall", 0.04, 10), ("LT1", 0.015, 8), ("LT2", 0.015, 8)]
+EXAM_STARTS = {"Semester 1": datetime(2025, 12, 1), "Semester 2": datetime(2026, 5, 4)}
+EXAM_DAYS = 15
+EXAM_SITTINGS = [(9, 0), (14, 0)]
+
+# Parents before children so foreign keys resolve on databases that enforce them
+INSERT_ORDER = [
+    Lecturer, Course, TimetableSlot, Student, User, Payment, Registration, RegistrationSlip, CourseEnrollment,
+    RegistrationModule, ChatbotMessage,
+]
+
+CHATBOT_QUESTIONS = {
+    "password": ["i forgot my password", "how do i reset password", "password reset not working"],
+    "payment": ["how do i pay my fees", "what are the payment methods", "how much is tuition fee"],
+    "payment_status": ["check payment status", "has my payment been verified", "upload payment slip"],
+    "registration": ["how do i register", "registration process for new students"],
+    "deadline": ["when is the registration deadline", "last date for registration"],
+    "results": ["where can i check results", "how do i see my grades", "request transcript"],
+    "timetable": ["where is my class timetable", "course schedule for this semester"],
+    "greeting": ["hello", "hi", "good morning"],
+    "gratitude": ["thanks", "thank you so much"],
+    "unknown": ["is there a swimming pool", "can i bring my dog to campus", "what is the wifi password"],
+}
+CHATBOT_WEIGHTS = [12, 15, 14, 8, 6, 12, 8, 10, 5, 10]
+
+INTAKE_YEARS = [2021, 2022, 2023, 2024, 2025]
+INTAKE_WEIGHTS = [8, 17, 23, 27, 25]
+CURRENT_YEAR = 2025
+
+
+def _cumulative(weights):
+    """Pre-compute cumulative weights so rng.choices doesn't rebuild them on every call."""
+    total, out = 0, []
+    for weight in weights:
+        total += weight
+        out.append(total)
+    return out
+
+
+@dataclass
+class SeedVolumes:
+    """How many rows of each kind to generate."""
+    students: int = 1000
+    lecturers: int = 40
+    courses: int = 120
+    admins: int = 3
+    payments_per_student: float = 2.5
+    enrollments_per_student: int = 6
+    chatbot_messages: int = 2000
+
+
+def _academic_year(start_year):
+    return f"{start_year}/{start_year + 1}"
+
+
+def _marks(grade, rng):
+    """(cat1, cat2, final, total) consistent with the grade, or Nones for ungraded enrollments."""
+    if grade is None:
+        return None, None, None, None
+    target = rng.uniform(*GRADE_TOTALS[grade])
+    cat1, cat2 = (round(min(100.0, max(0.0, rng.gauss(target, 6))) * 2) / 2 for _ in range(2))
+    final = round(min(100.0, max(0.0, (target - CAT_WEIGHT * (cat1 + cat2)) / FINAL_WEIGHT)) * 2) / 2
+    return cat1, cat2, final, round(CAT_WEIGHT * (cat1 + cat2) + FINAL_WEIGHT * final, 2)
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _bulk_insert(model, rows, batch_size):
+    """
+    Insert rows with one compiled Core INSERT and the driver's executemany.
+    Every row must share the same keys. Bind processors are applied once per
+    value here instead of going through per-row parameter construction,
+    which is where most of the time went for millions of rows.
+    """
+    table = model.__table__
+    keys = list(rows[0])
+    connection = db.session.connection()
+    dialect = connection.dialect
+    compiled = insert(table).compile(dialect=dialect, column_keys=keys)
+    processors = [table.c[key].type.dialect_impl(dialect).bind_processor(dialect) for key in keys]
+    converters = [(key, proc) for key, proc in zip(keys, processors)]
+
+    if compiled.positional:
+        order = [keys.index(name) for name in compiled.positiontup]
+        converters = [converters[i] for i in order]
+
+    # Seeded columns repeat a handful of values (dates, statuses), so memoise processed values per batch
+    memo = [{} for _ in converters]
+
+    def process(i, proc, value):
+        if proc is None or value is None:
+            return value
+        cache = memo[i]
+        if value not in cache:
+            cache[value] = proc(value)
+        return cache[value]
+
+    def convert(row):
+        values = [process(i, proc, row[key]) for i, (key, proc) in enumerate(converters)]
+        return tuple(values) if compiled.positional else dict(zip((key for key, _ in converters), values))
+
+    sql = str(compiled)
+    for start in range(0, len(rows), batch_size):
+        connection.exec_driver_sql(sql, [convert(row) for row in rows[start:start + batch_size]])
+        for cache in memo:
+            cache.clear()
+
+
+def seed_database(volumes=None, seed=42, batch_size=5000, log=print):
+    """
+    Generate a reproducible synthetic dataset in the current app's database.
+    Returns a dict of row counts per table.
+    """
+    volumes = volumes or SeedVolumes()
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    now = datetime(2025, 10, 1, 8, 0, 0)  # fixed "now" keeps runs byte-for-byte reproducible
+
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(text("PRAGMA synchronous=OFF"))
+
+    # One hash for every seeded account: hashing 100k passwords would dominate the run
+    password_hash = generate_password_hash(SEED_PASSWORD)
+
+    user_id = _next_id(User)
+    student_id = _next_id(Student)
+    lecturer_id = _next_id(Lecturer)
+    course_id = _next_id(Course)
+    enrollment_id = _next_id(CourseEnrollment)
+    payment_id = _next_id(Payment)
+    slip_id = _next_id(RegistrationSlip)
+    registration_id = _next_id(Registration)
+    module_id = _next_id(RegistrationModule)
+    timetable_id = _next_id(TimetableSlot)
+    chatbot_id = _next_id(ChatbotMessage)
+
+    # Buffers are flushed parents-first whenever one fills up, keeping memory bounded
+    buffers = {model: [] for model in INSERT_ORDER}
+    counts = {model.__tablename__: 0 for model in INSERT_ORDER}
+
+    def flush(force=False):
+        if not force and not any(len(rows) >= batch_size for rows in buffers.values()):
+            return
+        for model in INSERT_ORDER:
+            rows = buffers[model]
+            if rows:
+                _bulk_insert(model, rows, batch_size)
+                counts[model.__tablename__] += len(rows)
+                rows.clear()
+
+    users, lecturers, courses = buffers[User], buffers[Lecturer], buffers[Course]
+    students, enrollments, payments = buffers[Student], buffers[CourseEnrollment], buffers[Payment]
+    slips, registrations, messages = buffers[RegistrationSlip], buffers[Registration], buffers[ChatbotMessage]
+    modules, timetable = buffers[RegistrationModule], buffers[TimetableSlot]
+
+    faculty_cum = _cumulative(FACULTY_WEIGHTS)
+    grade_cum = _cumulative(GRADE_WEIGHTS)
+    status_cum = _cumulative(PAYMENT_STATUS_WEIGHTS)
+    method_cum = _cumulative(PAYMENT_METHOD_WEIGHTS)
+    intake_cum = _cumulative(INTAKE_WEIGHTS)
+    enrollment_dates = {year: datetime(year, 8, 15) for year in INTAKE_YEARS}
+
+    # ---------------- Admins ----------------
+    for i in range(volumes.admins):
+        users.append({
+            "id": user_id, "username": f"seed_admin_{user_id}", "email": f"seed.admin.{user_id}@cavendish.ac.zm",
+            "password_hash": password_hash, "role": UserRole.ADMIN,
+            "student_id": None, "lecturer_id": None, "created_at": now,
+        })
+        user_id += 1
+
+    # ---------------- Lecturers & courses ----------------
+    faculty_names = list(FACULTIES)
+    for i in range(volumes.lecturers):
+        department = rng.choices(faculty_names, cum_weights=faculty_cum)[0]
+        name = f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        lecturers.append({
+            "id": lecturer_id, "staff_number": f"SL{lecturer_id:06d}", "name": name,
+            "email": f"seed.lecturer.{lecturer_id}@cavendish.ac.zm", "department": department, "created_at": now,
+        })
+        users.append({
+            "id": user_id, "username": f"seed_lecturer_{lecturer_id}", "email": f"seed.lecturer.{lecturer_id}@cavendish.ac.zm",
+            "password_hash": password_hash, "role": UserRole.LECTURER,
+            "student_id": None, "lecturer_id": lecturer_id, "created_at": now,
+        })
+        lecturer_id += 1
+        user_id += 1
+
+    first_lecturer = lecturer_id - volumes.lecturers
+    course_ids, course_lecturers, faculty_courses = [], {}, {}
+    for i in range(volumes.courses):
+        department = rng.choices(faculty_names, cum_weights=faculty_cum)[0]
+        courses.append({
+            "id": course_id, "code": f"SC{course_id:05d}", "title": f"{department} Module {i + 1}",
+            "credits": rng.choice([10.0, 15.0, 15.0, 20.0, 30.0]), "department": department,
+            "primary_lecturer_id": first_lecturer + rng.randrange(volumes.lecturers) if volumes.lecturers else None,
+        })
+        course_ids.append(course_id)
+        course_lecturers[course_id] = courses[-1]["primary_lecturer_id"]
+        faculty_courses.setdefault(department, []).append(course_id)
+        course_id += 1
+
+    # Every programme has a fixed set of courses for each year of study, drawn from its
+    # faculty's courses (or all of them when the faculty has too few): the first half
+    # is taught in Semester 1, the rest in Semester 2. Students take their programme's
+    # courses, so only courses sharing a curriculum share students.
+    per_year = min(volumes.enrollments_per_student, len(course_ids))
+    curricula = {}
+    for faculty, programs in FACULTIES.items():
+        pool = faculty_courses.get(faculty, [])
+        pool = pool if len(pool) >= per_year else course_ids
+        for program in programs:
+            for year_of_study in range(1, 5):
+                picked = rng.sample(pool, per_year)
+                curricula[program, year_of_study] = [
+                    (course, SEMESTERS[2 * i >= per_year]) for i, course in enumerate(picked)
+                ]
+
+    # ---------------- Students and their history ----------------
+    for i in range(volumes.students):
+        faculty = rng.choices(faculty_names, cum_weights=faculty_cum)[0]
+        program = rng.choice(FACULTIES[faculty])
+        intake_year = rng.choices(INTAKE_YEARS, cum_weights=intake_cum)[0]
+        year_of_study = min(4, CURRENT_YEAR - intake_year + 1)
+        created_at = datetime(intake_year, rng.choice([1, 8]), 1) + timedelta(days=rng.randrange(30))
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        student_number = f"SD{student_id:07d}"
+
+        students.append({
+            "id": student_id, "student_number": student_number, "name": name,
+            "email": f"{student_number.lower()}@students.cavendish.ac.zm", "phone": f"+2609{rng.randrange(10**7, 10**8)}",
+            "program": program[:50], "faculty": faculty, "intake_year": intake_year,
+            "year_of_study": year_of_study, "semester": rng.choice(SEMESTERS), "created_at": created_at,
+        })
+        users.append({
+            "id": user_id, "username": student_number, "email": f"{student_number.lower()}@cavendish.ac.zm",
+            "password_hash": password_hash, "role": UserRole.STUDENT,
+            "student_id": student_id, "lecturer_id": None, "created_at": created_at,
+        })
+        user_id += 1
+
+        # Payments: Poisson-ish count around the configured mean, amounts log-normal around ~K4,000
+        has_approved = False
+        payment_count = max(0, int(rng.gauss(volumes.payments_per_student, 1.0) + 0.5))
+        for _ in range(payment_count):
+            status = rng.choices(PAYMENT_STATUSES, cum_weights=status_cum)[0]
+            submitted = now - timedelta(days=rng.randrange(0, 365 * (CURRENT_YEAR - intake_year + 1)), minutes=rng.randrange(1440))
+            has_approved = has_approved or status == "approved"
+            payments.append({
+                "id": payment_id, "slip_filename": f"seed_{payment_id}.pdf", "status": status,
+                "description": f"Tuition payment {student_number}", "submitted_date": submitted,
+                "approved_date": submitted + timedelta(hours=rng.randrange(2, 96)) if status == "approved" else None,
+                "student_id": student_id, "amount": round(rng.lognormvariate(8.2, 0.5), 2),
+                "method": rng.choices(PAYMENT_METHODS, cum_weights=method_cum)[0],
+                "reference": f"SEED-PAY-{payment_id}",
+            })
+            payment_id += 1
+
+        current_registration = None
+        if has_approved:
+            current_registration = registration_id
+            registrations.append({
+                "id": registration_id, "semester": "Semester 1", "academic_year": _academic_year(CURRENT_YEAR),
+                "registration_date": now, "is_registered": True, "student_id": student_id,
+                "program": program, "mode_of_study": rng.choice(["Full Time", "Part Time", "Distance"]),
+                "is_returning": intake_year < CURRENT_YEAR,
+            })
+            registration_id += 1
+            slips.append({
+                "id": slip_id, "slip_number": f"RS-SEED-{student_id:07d}", "student_id": student_id,
+                "issue_date": now, "created_by": "seed", "created_date": now,
+                "academic_year": _academic_year(CURRENT_YEAR), "semester": "Semester 1",
+                "program_name": program, "faculty_name": faculty,
+            })
+            slip_id += 1
+
+        # Enrollments across every year the student has studied; the current year is ungraded
+        if course_ids:
+            for year in range(intake_year, CURRENT_YEAR + 1):
+                academic_year = _academic_year(year)
+                grades = rng.choices(GRADES, cum_weights=grade_cum, k=per_year) if year < CURRENT_YEAR else [None] * per_year
+                for (course, semester), grade in zip(curricula[program, min(4, year - intake_year + 1)], grades):
+                    cat1, cat2, final, total = _marks(grade, rng)
+                    enrollments.append({
+                        "id": enrollment_id, "student_id": student_id, "course_id": course,
+                        "academic_year": academic_year, "semester": semester,
+                        "grade": grade, "cat1_marks": cat1, "cat2_marks": cat2, "final_marks": final,
+                        "marks": total, "enrollment_date": enrollment_dates[year],
+                    })
+                    enrollment_id += 1
+                    if year == CURRENT_YEAR and current_registration:
+                        # The current year's enrollments are the modules picked on the approved registration
+                        modules.append({"id": module_id, "registration_id": current_registration, "course_id": course})
+                        module_id += 1
+
+        student_id += 1
+        flush()
+
+    # ---------------- Chatbot log ----------------
+    categories = list(CHATBOT_QUESTIONS)
+    for i in range(volumes.chatbot_messages):
+        category = rng.choices(categories, CHATBOT_WEIGHTS)[0]
+        messages.append({
+            "id": chatbot_id, "question": f"{rng.choice(CHATBOT_QUESTIONS[category])} #{chatbot_id}",
+            "answer": "Seeded answer.", "category": category, "is_known_response": category != "unknown",
+            "created_at": now - timedelta(minutes=rng.randrange(60 * 24 * 365)),
+        })
+        chatbot_id += 1
+        flush()
+
+    # ---------------- Timetable ----------------
+    # Placed greedily so venues and lecturers are never double-booked; students
+    # still get clashes, because the placement ignores the curricula. Generated
+    # last so adding it left every other seeded row unchanged.
+    venues = [f"LT{i + 1}" if i < 4 else f"Room {100 + i}" for i in range(max(4, int(len(course_ids) * VENUES_PER_COURSE)))]
+    for semester in SEMESTERS:
+        booked = set()  # (venue or lecturer, day, hour)
+        for course in course_ids:
+            lecturer = course_lecturers[course]
+            for session_type, hours in TIMETABLE_SESSIONS:
+                for _ in range(PLACEMENT_ATTEMPTS):
+                    day, start, venue = rng.randrange(5), rng.randrange(8, 18 - hours + 1), rng.choice(venues)
+                    needed = [(resource, day, hour) for resource in (venue, lecturer) if resource is not None
+                              for hour in range(start, start + hours)]
+                    if not booked.intersection(needed):
+                        break
+                else:
+                    continue  # no free venue and lecturer time found; leave the session unscheduled
+                booked.update(needed)
+                timetable.append({
+                    "id": timetable_id, "course_id": course, "academic_year": _academic_year(CURRENT_YEAR),
+                    "semester": semester, "day_of_week": day, "start_time": time_of_day(start),
+                    "end_time": time_of_day(start + hours), "venue": venue, "lecturer_id": lecturer,
+                    "session_type": session_type,
+                })
+                timetable_id += 1
+        flush()
+
+    flush(force=True)
+    # Docket eligibility is derived from the approved payments, as the app keeps it
+    counts[DocketEligibility.__tablename__] = refresh_eligibility() * len(thresholds())
+
+    # ---------------- Course capacities ----------------
+    enrolled = func.count(CourseEnrollment.id)
+    sections = db.session.query(
+        CourseEnrollment.course_id, CourseEnrollment.academic_year, CourseEnrollment.semester,
+        enrolled + enrolled * SECTION_SLACK // 100, enrolled
+    ).filter(
+        CourseEnrollment.academic_year == _academic_year(CURRENT_YEAR),
+        CourseEnrollment.course_id.in_(course_ids),
+    ).group_by(CourseEnrollment.course_id, CourseEnrollment.academic_year, CourseEnrollment.semester)
+    counts[CourseSection.__tablename__] = db.session.execute(insert(CourseSection).from_select(
+        ["course_id", "academic_year", "semester", "capacity", "seats_taken"], sections
+    )).rowcount
+
+    # ---------------- Exam seating ----------------
+    # Halls grow with the student body (names are unique, so a second run reuses them);
+    # the FINAL seats are then planned as an admin would
+    existing = {name for (name,) in db.session.query(ExamHall.name)}
+    halls = [hall for hall in EXAM_HALLS if hall[0] not in existing]
+    for name, share, per_row in halls:
+        db.session.add(ExamHall(name=name, capacity=max(20, int(volumes.students * share)), seats_per_row=per_row))
+    for semester, first_day in EXAM_STARTS.items():
+        weekdays = [first_day + timedelta(days=day) for day in range(EXAM_DAYS * 7 // 5 + 2)]
+        for day in [day for day in weekdays if day.weekday() < 5][:EXAM_DAYS]:
+            for hour, minute in EXAM_SITTINGS:
+                db.session.add(ExamSession(
+                    academic_year=_academic_year(CURRENT_YEAR), semester=semester, assessment="FINAL",
+                    starts_at=day.replace(hour=hour, minute=minute), duration_minutes=180,
+                ))
+    db.session.flush()
+    counts[ExamHall.__tablename__] = len(halls)
+    counts[ExamSession.__tablename__] = len(EXAM_STARTS) * EXAM_DAYS * len(EXAM_SITTINGS)
+    counts[ExamSeat.__tablename__] = sum(
+        plan_seating(_academic_year(CURRENT_YEAR), semester, "FINAL")["seats"] for semester in EXAM_STARTS
+    )
+    if db.engine.dialect.name == "postgresql":
+        # Explicit ids bypass the serial sequences, so move them past the seeded rows
+        for model in INSERT_ORDER:
+            table = model.__tablename__
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table}\"', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM \"{table}\"))"
+            ))
+    db.session.commit()
+
+    log(f"Seeded {sum(counts.values()):,} rows in {time.perf_counter() - started:.2f}s (seed={seed})")
+    return counts
@@ -0,0 +1,31 @@
+# app/utils/signing.py
+"""
+The key behind tokens that are checked without a login: docket QR codes and
+calendar feed URLs.
+
+It is DOCKET_SIGNING_KEY, which Config takes from the DOCKET_SIGNING_KEY or
+SECRET_KEY environment variable. The SECRET_KEY default in config.py is
+published with the source, so anything signed with it could be forged;
+without a key from the environment these tokens are neither issued nor
+accepted.
+"""
+import hashlib
+
+from flask import current_app
+
+
+class SigningKeyMissing(RuntimeError):
+    """No signing key was configured in the environment."""
+
+
+def signing_configured():
+    return bool(current_app.config.get("DOCKET_SIGNING_KEY"))
+
+
+def signing_key(purpose):
+    """A key for one kind of token, derived from DOCKET_SIGNING_KEY so the kinds can't stand in for each other."""
+    secret = current_app.config.get("DOCKET_SIGNING_KEY")
+    if not secret:
+        raise SigningKeyMissing("Set DOCKET_SIGNING_KEY (or SECRET_KEY) in the environment "
+                                "to sign dockets and calendar feeds")
+    return hashlib.sha256(f"{purpose}:".encode() + secret.encode()).digest()
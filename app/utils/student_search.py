@@ -0,0 +1,151 @@
+# app/utils/student_search.py
+"""
+Full-text search over students.
+
+SQLite gets an external-content FTS5 table (student_fts) and Postgres a
+tsvector column with a GIN index; triggers keep either one in step with the
+student table. The index is created by the Alembic migration and, for
+databases built with db.create_all() (seeding, benchmarks), by the
+after_create hook below. Other backends, or a database missing the index,
+fall back to LIKE matching.
+"""
+import re
+
+from sqlalchemy import Float, Integer, event, or_, text
+
+from app.extensions import db
+from app.models import Student
+
+SEARCH_COLUMNS = ("student_number", "name", "email", "program", "faculty")
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS student_fts USING fts5(
+        student_number, name, email, program, faculty,
+        content='student', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS student_fts_ai AFTER INSERT ON student BEGIN
+        INSERT INTO student_fts(rowid, student_number, name, email, program, faculty)
+        VALUES (new.id, new.student_number, new.name, new.email, new.program, new.faculty);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS student_fts_ad AFTER DELETE ON student BEGIN
+        INSERT INTO student_fts(student_fts, rowid, student_number, name, email, program, faculty)
+        VALUES ('delete', old.id, old.student_number, old.name, old.email, old.program, old.faculty);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS student_fts_au
+    AFTER UPDATE OF student_number, name, email, program, faculty ON student BEGIN
+        INSERT INTO student_fts(student_fts, rowid, student_number, name, email, program, faculty)
+        VALUES ('delete', old.id, old.student_number, old.name, old.email, old.program, old.faculty);
+        INSERT INTO student_fts(rowid, student_number, name, email, program, faculty)
+        VALUES (new.id, new.student_number, new.name, new.email, new.program, new.faculty);
+    END""",
+    "INSERT INTO student_fts(student_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_DDL = [
+    "ALTER TABLE student ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_student_search_vector ON student USING gin(search_vector)",
+    "DROP TRIGGER IF EXISTS student_search_vector_update ON student",
+    """CREATE TRIGGER student_search_vector_update BEFORE INSERT OR UPDATE ON student
+    FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(
+        search_vector, 'pg_catalog.simple', student_number, name, email, program, faculty
+    )""",
+    """UPDATE student SET search_vector = to_tsvector('pg_catalog.simple',
+        concat_ws(' ', student_number, name, email, program, faculty))""",
+]
+
+# Per-engine answer to "does this database have the search index?"
+_index_available = {}
+
+
+def install_search_index(connection):
+    """Create (or rebuild) the search index and its triggers on this connection."""
+    statements = {"sqlite": SQLITE_DDL, "postgresql": POSTGRES_DDL}.get(connection.dialect.name, [])
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    _index_available.clear()
+
+
+def drop_search_index(connection):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS student_fts")
+    _index_available.clear()
+
+
+@event.listens_for(Student.__table__, "after_create")
+def _create_index_with_table(target, connection, **kw):
+    install_search_index(connection)
+
+
+@event.listens_for(Student.__table__, "before_drop")
+def _drop_index_with_table(target, connection, **kw):
+    drop_search_index(connection)
+
+
+def _has_index(engine):
+    key = id(engine)
+    if key not in _index_available:
+        with engine.connect() as conn:
+            if engine.dialect.name == "sqlite":
+                found = conn.exec_driver_sql(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'student_fts'"
+                ).first()
+            elif engine.dialect.name == "postgresql":
+                found = conn.exec_driver_sql(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'student' AND column_name = 'search_vector'"
+                ).first()
+            else:
+                found = None
+        _index_available[key] = found is not None
+    return _index_available[key]
+
+
+def _tokens(term):
+    """Split user input into word tokens; punctuation never reaches the MATCH syntax."""
+    return re.findall(r"\w+", term or "")[:8]
+
+
+def student_search_query(term):
+    """Return a Student query matching every word of `term` (prefix match), best matches first."""
+    tokens = _tokens(term)
+    query = Student.query
+    if not tokens:
+        return query.order_by(Student.student_number)
+
+    engine = db.engine
+    if _has_index(engine) and engine.dialect.name == "sqlite":
+        match = " ".join(f'"{token}"*' for token in tokens)
+        hits = text(
+            "SELECT rowid AS id, bm25(student_fts) AS rank FROM student_fts WHERE student_fts MATCH :match"
+        ).bindparams(match=match).columns(id=Integer, rank=Float).subquery("hits")
+        return query.join(hits, hits.c.id == Student.id).order_by(hits.c.rank, Student.student_number)
+
+    if _has_index(engine) and engine.dialect.name == "postgresql":
+        tsquery = " & ".join(f"{token}:*" for token in tokens)
+        return query.filter(
+            text("student.search_vector @@ to_tsquery('pg_catalog.simple', :tsquery)").bindparams(tsquery=tsquery)
+        ).order_by(
+            text("ts_rank(student.search_vector, to_tsquery('pg_catalog.simple', :tsquery)) DESC").bindparams(tsquery=tsquery),
+            Student.student_number,
+        )
+
+    for token in tokens:
+        pattern = f"%{token}%"
+        query = query.filter(or_(*(getattr(Student, column).ilike(pattern) for column in SEARCH_COLUMNS)))
+    return query.order_by(Student.student_number)
+
+
+def typeahead(term, limit=10):
+    """Small JSON-ready list of the best matches for an as-you-type box."""
+    if not _tokens(term):
+        return []
+    return [
+        {
+            "id": student.id,
+            "student_number": student.student_number,
+            "name": student.name,
+            "program": student.program,
+            "faculty": student.faculty,
+        }
+        for student in student_search_query(term).limit(limit)
+    ]
@@ -0,0 +1,170 @@
+# app/utils/submissions.py
+"""
+Idempotency keys for student form submissions.
+
+The payment upload and semester registration forms carry a random key
+issued when the form is rendered. The Payment and Registration rows a
+submission creates store it under a unique constraint, so when a slow
+connection makes the student click again (or the browser resends the
+POST), the repeat finds the first submission's rows and gets the same
+answer instead of saving another file and queueing another pending
+payment. Two copies arriving at the same moment are stopped by the
+constraint itself.
+
+deduplicate_submissions() cleans up the duplicates created before the keys
+existed. Payments only count as duplicates when their files are byte for
+byte the same (SHA-256): perceptual hashes also match a second, genuinely
+different slip photographed the same way, and deleting that would lose a
+real payment.
+"""
+import hashlib
+import os
+import re
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import delete, func, select
+
+from app.models import db, Payment, Registration, RegistrationModule
+
+_KEY = re.compile(r"^[0-9a-f]{32}$")
+_CHUNK = 500
+_READ_SIZE = 1 << 20
+
+
+def new_submission_key():
+    """A fresh key for a form being rendered."""
+    return uuid.uuid4().hex
+
+
+def submission_key(form):
+    """The key a form was posted with, or None if it has none (a page rendered before keys existed)."""
+    key = (form.get("submission_key") or "").strip().lower()
+    return key if _KEY.match(key) else None
+
+
+def _repeats(rows, window, same, removable):
+    """
+    Ids of the rows that repeat an earlier row with the same `same(row)`
+    within `window` of it. rows are (id, time, ...) tuples in time order;
+    only rows for which removable(row) holds are reported.
+    """
+    first_seen, repeats = {}, []
+    for row in rows:
+        key, at = same(row), row[1]
+        first = first_seen.get(key)
+        if first is not None and at is not None and at - first <= window and removable(row):
+            repeats.append(row[0])
+        else:
+            first_seen[key] = at
+    return repeats
+
+
+def _content_hashes(names):
+    """{file name: SHA-256 of its bytes} of the uploads among `names` that are still on disk."""
+    folder = current_app.config["UPLOAD_FOLDER"]
+    hashes = {}
+    for name in names:
+        digest = hashlib.sha256()
+        try:
+            with open(os.path.join(folder, name), "rb") as f:
+                while chunk := f.read(_READ_SIZE):
+                    digest.update(chunk)
+        except OSError:
+            continue
+        hashes[name] = digest.hexdigest()
+    return hashes
+
+
+def duplicate_payments(window):
+    """
+    Pending payments repeating an earlier payment of the same student: an
+    identical uploaded file (by SHA-256 of its contents), the same amount
+    and description, submitted within `window` of it. A payment whose file
+    is missing is never a duplicate.
+    """
+    students = select(Payment.student_id).group_by(Payment.student_id).having(func.count(Payment.id) > 1)
+    rows = db.session.query(
+        Payment.id, Payment.submitted_date, Payment.student_id, Payment.slip_filename,
+        Payment.amount, Payment.description, Payment.status
+    ).filter(Payment.student_id.in_(students)).order_by(Payment.submitted_date, Payment.id).all()
+    hashes = _content_hashes({row.slip_filename for row in rows if row.slip_filename})
+    return _repeats(
+        rows, window,
+        same=lambda r: (r.student_id, hashes.get(r.slip_filename) or ("unreadable", r.id), r.amount, r.description),
+        removable=lambda r: r.status == "pending",
+    )
+
+
+def duplicate_registrations(window):
+    """
+    Registrations not yet approved that repeat an earlier registration of
+    the same student for the same period, programme, mode of study and
+    modules, made within `window` of it.
+    """
+    periods = select(Registration.student_id, Registration.academic_year, Registration.semester).group_by(
+        Registration.student_id, Registration.academic_year, Registration.semester
+    ).having(func.count(Registration.id) > 1).subquery()
+    rows = db.session.query(
+        Registration.id, Registration.registration_date, Registration.student_id, Registration.academic_year,
+        Registration.semester, Registration.program, Registration.mode_of_study, Registration.is_returning,
+        Registration.modules, Registration.is_registered
+    ).join(periods, (periods.c.student_id == Registration.student_id)
+           & (periods.c.academic_year == Registration.academic_year)
+           & (periods.c.semester == Registration.semester)
+    ).order_by(Registration.registration_date, Registration.id).all()
+
+    picks = defaultdict(set)
+    ids = [row.id for row in rows]
+    for start in range(0, len(ids), _CHUNK):
+        for registration_id, course_id in db.session.query(
+            RegistrationModule.registration_id, RegistrationModule.course_id
+        ).filter(RegistrationModule.registration_id.in_(ids[start:start + _CHUNK])):
+            picks[registration_id].add(course_id)
+    return _repeats(
+        rows, window,
+        same=lambda r: (r.student_id, r.academic_year, r.semester, r.program, r.mode_of_study, r.is_returning,
+                        r.modules, frozenset(picks[r.id])),
+        removable=lambda r: not r.is_registered,
+    )
+
+
+def deduplicate_submissions(window=timedelta(minutes=30), dry_run=True):
+    """
+    Delete the duplicate pending payments (and their uploaded files) and
+    unapproved registrations left by double-submitted forms, keeping the
+    first of each. Returns ([payment ids], [registration ids]) of the rows
+    removed, or that would be with dry_run (the default). Commits when
+    not a dry run.
+    """
+    payments, registrations = duplicate_payments(window), duplicate_registrations(window)
+    if dry_run:
+        return payments, registrations
+
+    files = set()
+    for start in range(0, len(payments), _CHUNK):
+        chunk = payments[start:start + _CHUNK]
+        files.update(name for (name,) in db.session.query(Payment.slip_filename).filter(Payment.id.in_(chunk)))
+        db.session.execute(delete(Payment).where(Payment.id.in_(chunk)).execution_options(synchronize_session=False))
+    for start in range(0, len(registrations), _CHUNK):
+        chunk = registrations[start:start + _CHUNK]
+        db.session.execute(delete(RegistrationModule).where(RegistrationModule.registration_id.in_(chunk)))
+        db.session.execute(
+            delete(Registration).where(Registration.id.in_(chunk)).execution_options(synchronize_session=False)
+        )
+    # A file only goes once no remaining payment points at it
+    names, kept = sorted(files), set()
+    for start in range(0, len(names), _CHUNK):
+        kept.update(name for (name,) in db.session.query(Payment.slip_filename).filter(
+            Payment.slip_filename.in_(names[start:start + _CHUNK])
+        ))
+    db.session.commit()
+
+    folder = current_app.config["UPLOAD_FOLDER"]
+    for name in files - kept:
+        path = os.path.join(folder, name)
+        if os.path.exists(path):
+            os.remove(path)
+    return payments, registrations
@@ -0,0 +1,218 @@
+# app/utils/timetable.py
+"""
+Class timetables and clash detection.
+
+student_timetable() builds a student's week from their enrollments with one
+query joining course_enrollment to timetable_slot on (course, academic year,
+semester).
+
+Clashes are found with a sweep line instead of comparing every pair of
+meetings: find_clashes() sorts the meetings of each (resource, day) by start
+time and keeps the ones still running in a heap ordered by end time, so a
+meeting is only ever compared with the meetings it actually overlaps --
+O(n log n + k) for n meetings and k clashes. validate_timetable() checks a
+whole period: venues and lecturers directly, students through the pairs of
+overlapping slots whose courses share enrolled students.
+"""
+import heapq
+import time
+from collections import defaultdict
+from itertools import groupby
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import joinedload
+
+from app.models import db, Course, CourseEnrollment, Lecturer, Student, TimetableSlot
+
+STUDENT_SAMPLE_SIZE = 5
+
+
+def minutes(value):
+    """Minutes since midnight of a datetime.time."""
+    return value.hour * 60 + value.minute
+
+
+def find_clashes(intervals):
+    """
+    Overlapping pairs among (resource, day, start, end, item) tuples, where
+    start and end are comparable (e.g. minutes). Meetings only clash with
+    others of the same resource and day; back-to-back meetings (one ends as
+    the next starts) don't clash. Returns [(resource, day, item_a, item_b)],
+    item_a starting first.
+    """
+    clashes = []
+    ordered = sorted(intervals, key=lambda interval: interval[:3])
+    for (resource, day), meetings in groupby(ordered, key=lambda interval: interval[:2]):
+        running = []  # (end, sequence, item) of meetings that started and haven't ended
+        for sequence, (_, _, start, end, item) in enumerate(meetings):
+            while running and running[0][0] <= start:
+                heapq.heappop(running)
+            clashes.extend((resource, day, other, item) for _, _, other in running)
+            heapq.heappush(running, (end, sequence, item))
+    return clashes
+
+
+def student_timetable(student_id, academic_year=None):
+    """
+    A student's classes for one academic year (their latest one by default):
+    {"academic_year": ..., "semesters": {semester: [entry, ...]}, "clashes": n}.
+    Entries are dicts ordered by day and start time; "clash" marks entries
+    that overlap another of the student's classes.
+    """
+    if academic_year is None:
+        academic_year = select(func.max(CourseEnrollment.academic_year)).where(
+            CourseEnrollment.student_id == student_id
+        ).scalar_subquery()
+    rows = db.session.query(TimetableSlot, Course.code, Course.title, Lecturer.name).join(
+        CourseEnrollment, and_(
+            CourseEnrollment.course_id == TimetableSlot.course_id,
+            CourseEnrollment.academic_year == TimetableSlot.academic_year,
+            CourseEnrollment.semester == TimetableSlot.semester,
+        )
+    ).join(Course, Course.id == TimetableSlot.course_id).outerjoin(
+        Lecturer, Lecturer.id == TimetableSlot.lecturer_id
+    ).filter(
+        CourseEnrollment.student_id == student_id,
+        TimetableSlot.academic_year == academic_year,
+    ).order_by(TimetableSlot.semester, TimetableSlot.day_of_week, TimetableSlot.start_time, Course.code).all()
+
+    semesters = {}
+    for slot, code, title, lecturer in rows:
+        semesters.setdefault(slot.semester, []).append({
+            "slot_id": slot.id, "day_of_week": slot.day_of_week, "day": slot.day_name,
+            "start": slot.start_time, "end": slot.end_time, "code": code, "title": title,
+            "venue": slot.venue, "lecturer": lecturer, "session_type": slot.session_type, "clash": False,
+        })
+
+    clashes = find_clashes(
+        (semester, entry["day_of_week"], minutes(entry["start"]), minutes(entry["end"]), i)
+        for semester, entries in semesters.items() for i, entry in enumerate(entries)
+    )
+    for semester, _, first, second in clashes:
+        semesters[semester][first]["clash"] = semesters[semester][second]["clash"] = True
+    return {
+        "academic_year": rows[0][0].academic_year if rows else None,
+        "semesters": semesters,
+        "clashes": len(clashes),
+    }
+
+
+def _period_slots(academic_year, semester):
+    return db.session.query(TimetableSlot, Course.code, Lecturer.name).join(
+        Course, Course.id == TimetableSlot.course_id
+    ).outerjoin(Lecturer, Lecturer.id == TimetableSlot.lecturer_id).filter(
+        TimetableSlot.academic_year == academic_year, TimetableSlot.semester == semester
+    ).all()
+
+
+def _describe(slot, code, lecturer):
+    return {
+        "id": slot.id, "code": code, "day": slot.day_name, "start": slot.start_time.strftime("%H:%M"),
+        "end": slot.end_time.strftime("%H:%M"), "venue": slot.venue, "lecturer": lecturer,
+        "session_type": slot.session_type,
+    }
+
+
+def validate_timetable(academic_year, semester):
+    """
+    Every venue, lecturer and student clash of one period. Student clashes
+    are reported per pair of slots with the number of students affected and
+    a few of their student numbers.
+    """
+    started = time.perf_counter()
+    rows = _period_slots(academic_year, semester)
+    slots = {slot.id: (slot, code, lecturer) for slot, code, lecturer in rows}
+    spans = [(slot.day_of_week, minutes(slot.start_time), minutes(slot.end_time), slot) for slot, _, _ in rows]
+
+    venue = find_clashes((s.venue.strip().upper(), day, start, end, s.id) for day, start, end, s in spans)
+    lecturer = find_clashes(
+        (s.lecturer_id, day, start, end, s.id) for day, start, end, s in spans if s.lecturer_id is not None
+    )
+
+    # Students clash wherever two overlapping slots belong to courses they both take
+    overlapping = [
+        (day, first, second)
+        for _, day, first, second in find_clashes((None, day, start, end, s.id) for day, start, end, s in spans)
+        if slots[first][0].course_id != slots[second][0].course_id
+    ]
+    courses = {slots[slot_id][0].course_id for _, first, second in overlapping for slot_id in (first, second)}
+    enrolled = defaultdict(set)
+    if courses:
+        enrollments = select(CourseEnrollment.course_id, CourseEnrollment.student_id).where(
+            CourseEnrollment.academic_year == academic_year,
+            CourseEnrollment.semester == semester,
+            CourseEnrollment.course_id.in_(list(courses)),
+        )
+        for course_id, student_id in db.session.connection().execute(enrollments):
+            enrolled[course_id].add(student_id)
+
+    student = []
+    for day, first, second in overlapping:
+        shared = enrolled[slots[first][0].course_id] & enrolled[slots[second][0].course_id]
+        if shared:
+            student.append((day, first, second, len(shared), sorted(shared)[:STUDENT_SAMPLE_SIZE]))
+    student.sort(key=lambda clash: -clash[3])
+
+    sample_ids = {student_id for clash in student for student_id in clash[4]}
+    numbers = dict(
+        db.session.query(Student.id, Student.student_number).filter(Student.id.in_(list(sample_ids)))
+    ) if sample_ids else {}
+
+    def pair(first, second):
+        return {"a": _describe(*slots[first]), "b": _describe(*slots[second])}
+
+    return {
+        "academic_year": academic_year,
+        "semester": semester,
+        "slots": len(rows),
+        "venue": [{"resource": slots[first][0].venue, **pair(first, second)} for _, _, first, second in venue],
+        "lecturer": [{"resource": slots[first][2], **pair(first, second)} for _, _, first, second in lecturer],
+        "student": [
+            {"students": count, "sample": [numbers.get(student_id) for student_id in sample], **pair(first, second)}
+            for _, first, second, count, sample in student
+        ],
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def slot_conflicts(slot):
+    """
+    Clashes a new or edited slot would cause, for checking a form before it
+    is saved: ([venue clashes], [lecturer clashes], students affected).
+    """
+    overlapping = TimetableSlot.query.filter(
+        TimetableSlot.academic_year == slot.academic_year,
+        TimetableSlot.semester == slot.semester,
+        TimetableSlot.day_of_week == slot.day_of_week,
+        TimetableSlot.start_time < slot.end_time,
+        TimetableSlot.end_time > slot.start_time,
+    )
+    if slot.id is not None:
+        overlapping = overlapping.filter(TimetableSlot.id != slot.id)
+    overlapping = overlapping.options(joinedload(TimetableSlot.course)).all()
+
+    venue = [other for other in overlapping if other.venue.strip().upper() == slot.venue.strip().upper()]
+    lecturer = [other for other in overlapping if slot.lecturer_id and other.lecturer_id == slot.lecturer_id]
+
+    other_courses = {other.course_id for other in overlapping} - {slot.course_id}
+    students = 0
+    if other_courses:
+        mine = CourseEnrollment.query.with_entities(CourseEnrollment.student_id).filter(
+            CourseEnrollment.course_id == slot.course_id,
+            CourseEnrollment.academic_year == slot.academic_year,
+            CourseEnrollment.semester == slot.semester,
+        )
+        students = db.session.query(func.count(func.distinct(CourseEnrollment.student_id))).filter(
+            CourseEnrollment.course_id.in_(list(other_courses)),
+            CourseEnrollment.academic_year == slot.academic_year,
+            CourseEnrollment.semester == slot.semester,
+            CourseEnrollment.student_id.in_(mine),
+        ).scalar()
+    return venue, lecturer, students
+
+
+def timetable_periods():
+    """(academic_year, semester) pairs with timetable slots or enrollments, newest first."""
+    slotted = db.session.query(TimetableSlot.academic_year, TimetableSlot.semester).distinct()
+    enrolled = db.session.query(CourseEnrollment.academic_year, CourseEnrollment.semester).distinct()
+    return sorted({(year, semester) for year, semester in slotted.union(enrolled)}, reverse=True)
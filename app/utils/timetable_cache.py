@@ -0,0 +1,175 @@
+# app/utils/timetable_cache.py
+"""
+Cached timetable files (PDF and ICS calendar feed) per student.
+
+Each file is stored as <TIMETABLE_CACHE_FOLDER>/<student id>-<version>.<kind>,
+where the version is a stamp of everything the timetable is built from: the
+student's name and number, their enrollments (count, highest id, sum of
+revisions), the slots of their courses (count, highest id, sum of
+revisions) and the revisions of those courses and of the slots'
+lecturers. A change to any of them gives a new version, so the next
+request builds a fresh file and removes the old one; nothing has to
+invalidate the cache explicitly. The cache lives on disk, so every worker
+process shares it.
+
+The version is also the file's ETag and its mtime the Last-Modified date, so
+calendar apps polling the feed get a 304 after a single query.
+"""
+import glob
+import hashlib
+import os
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, func
+
+from app.models import db, Course, CourseEnrollment, Lecturer, Student, TimetableSlot
+from app.utils.metrics import TIMETABLE_CACHE
+from app.utils.signing import SigningKeyMissing, signing_key
+
+# Bump when the PDF or ICS layout changes, so files built by older code are replaced
+FORMAT_VERSION = 1
+
+
+def cache_folder():
+    return current_app.config.get("TIMETABLE_CACHE_FOLDER") or os.path.join(current_app.instance_path, "timetables")
+
+
+def timetable_version(student):
+    """Stamp that changes whenever anything shown on the student's timetable may have changed."""
+    stamp = db.session.query(
+        func.count(CourseEnrollment.id), func.max(CourseEnrollment.id), func.sum(CourseEnrollment.revision),
+        func.count(TimetableSlot.id), func.max(TimetableSlot.id), func.sum(TimetableSlot.revision),
+        func.sum(Course.revision), func.sum(Lecturer.revision),
+    ).join(Course, Course.id == CourseEnrollment.course_id).outerjoin(TimetableSlot, and_(
+        TimetableSlot.course_id == CourseEnrollment.course_id,
+        TimetableSlot.academic_year == CourseEnrollment.academic_year,
+        TimetableSlot.semester == CourseEnrollment.semester,
+    )).outerjoin(Lecturer, Lecturer.id == TimetableSlot.lecturer_id).filter(CourseEnrollment.student_id == student.id).one()
+    key = "|".join(str(part) for part in (FORMAT_VERSION, student.student_number, student.name, *stamp))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def cached_timetable(student, kind, build):
+    """
+    Path and version of the student's current timetable file of `kind`
+    ("pdf" or "ics"), calling build() for its bytes when it isn't cached yet.
+    """
+    version = timetable_version(student)
+    folder = cache_folder()
+    path = os.path.join(folder, f"{student.id}-{version}.{kind}")
+    if os.path.exists(path):
+        TIMETABLE_CACHE.inc(document=kind, outcome="hit")
+        return path, version
+
+    TIMETABLE_CACHE.inc(document=kind, outcome="miss")
+    os.makedirs(folder, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(build())
+    os.replace(temporary, path)  # atomic, so a concurrent request never serves half a file
+    for stale in glob.glob(os.path.join(folder, f"{student.id}-*.{kind}")):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass  # already removed by another worker
+    return path, version
+
+
+# ---------------- Calendar feed ----------------
+def _serializer():
+    return URLSafeSerializer(signing_key("timetable-feed"), salt="timetable-feed")
+
+
+def feed_token(student_id):
+    """
+    Token for the student's calendar feed URL; calendar apps can't log in, so
+    the URL is the credential. Raises SigningKeyMissing without a signing key.
+    """
+    return _serializer().dumps(student_id)
+
+
+def student_from_feed_token(token):
+    try:
+        student_id = _serializer().loads(token)
+    except (BadSignature, SigningKeyMissing):
+        return None
+    return db.session.get(Student, student_id)
+
+
+def _escape(text):
+    return (text or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line):
+    """Split a content line into 75-octet pieces, as RFC 5545 requires."""
+    data = line.encode()
+    if len(data) <= 75:
+        return line
+    pieces, start = [], 0
+    while start < len(data):
+        end = min(start + (75 if not pieces else 74), len(data))
+        while end < len(data) and data[end] & 0xC0 == 0x80:  # don't split a UTF-8 character
+            end -= 1
+        pieces.append(data[start:end].decode())
+        start = end
+    return "\r\n ".join(pieces)
+
+
+def _first_class(academic_year, semester, day_of_week):
+    """Date of the first class on day_of_week in the semester, or None for an unknown semester."""
+    start = current_app.config.get("SEMESTER_STARTS", {}).get(semester)
+    if not start or not academic_year:
+        return None
+    years_after, month, day = start
+    first_day = date(int(academic_year[:4]) + years_after, month, day)
+    return first_day + timedelta(days=(day_of_week - first_day.weekday()) % 7)
+
+
+def build_timetable_ics(student, timetable):
+    """iCalendar bytes with one weekly recurring event per class of student_timetable()."""
+    tzid = current_app.config.get("TIMEZONE", "UTC")
+    weeks = current_app.config.get("SEMESTER_WEEKS", 15)
+    offset = datetime.now(ZoneInfo(tzid)).strftime("%z")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Cavendish University//Student Timetable//EN",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(f'Timetable {student.student_number}')}",
+        f"X-WR-TIMEZONE:{tzid}",
+        "BEGIN:VTIMEZONE",
+        f"TZID:{tzid}",
+        "BEGIN:STANDARD",
+        "DTSTART:19700101T000000",
+        f"TZOFFSETFROM:{offset}",
+        f"TZOFFSETTO:{offset}",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+    ]
+    for semester, entries in timetable["semesters"].items():
+        for entry in entries:
+            first = _first_class(timetable["academic_year"], semester, entry["day_of_week"])
+            if first is None:
+                continue
+            description = entry["title"] + (f"\nLecturer: {entry['lecturer']}" if entry["lecturer"] else "")
+            lines += [
+                "BEGIN:VEVENT",
+                f"UID:slot-{entry['slot_id']}-student-{student.id}@cavendish.ac.zm",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART;TZID={tzid}:{datetime.combine(first, entry['start']):%Y%m%dT%H%M%S}",
+                f"DTEND;TZID={tzid}:{datetime.combine(first, entry['end']):%Y%m%dT%H%M%S}",
+                f"RRULE:FREQ=WEEKLY;COUNT={weeks}",
+                f"SUMMARY:{_escape(entry['code'] + ' ' + (entry['session_type'] or ''))}",
+                f"LOCATION:{_escape(entry['venue'])}",
+                f"DESCRIPTION:{_escape(description)}",
+                "END:VEVENT",
+            ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_fold(line) for line in lines) + "\r\n").encode()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Move old chatbot_message and system_log rows into monthly gzip archives.
+
+Ages come from RETENTION_DAYS in the config; --older-than overrides them for
+the tables given with --table. Archived rows stay browsable at /admin/archives.
+Run it from cron, e.g. nightly.
+
+Examples:
+    python archive_logs.py --dry-run
+    python archive_logs.py
+    python archive_logs.py --table system_log --older-than 90 --chunk-size 5000
+"""
+import argparse
+import time
+
+from app import create_app
+from app.config import Config
+from app.utils.retention import ARCHIVED_TABLES, apply_retention, archive_table
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Archive and delete expired log rows.")
+    parser.add_argument("--table", action="append", choices=sorted(ARCHIVED_TABLES),
+                        help="Only archive this table (repeatable)")
+    parser.add_argument("--older-than", type=int, help="Age in days, overriding RETENTION_DAYS")
+    parser.add_argument("--chunk-size", type=int, help="Rows moved per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="Only report how many rows would move")
+    parser.add_argument("--database", help="Override SQLALCHEMY_DATABASE_URI")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    class ArchiveConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or Config.SQLALCHEMY_DATABASE_URI
+
+    app = create_app(ArchiveConfig)
+    started = time.perf_counter()
+    with app.app_context():
+        if args.table or args.older_than is not None:
+            chunk_size = args.chunk_size or app.config["RETENTION_CHUNK_SIZE"]
+            results = {}
+            for table_name in args.table or sorted(ARCHIVED_TABLES):
+                days = args.older_than if args.older_than is not None else app.config["RETENTION_DAYS"].get(table_name)
+                if days is None:
+                    continue
+                results[table_name] = archive_table(
+                    table_name, days, chunk_size=chunk_size,
+                    pause=app.config["RETENTION_CHUNK_PAUSE"], dry_run=args.dry_run,
+                )
+        else:
+            results = apply_retention(chunk_size=args.chunk_size, dry_run=args.dry_run)
+
+    verb = "would archive" if args.dry_run else "archived"
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+    for table_name, count in results.items():
+        print(f"  - {table_name}: {verb} {count:,} rows")
+
+
+if __name__ == "__main__":
+    main()
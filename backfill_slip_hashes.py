@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Compute perceptual hashes for payment slips uploaded before hashing existed.
+
+New uploads are hashed as they arrive; run this once after upgrading so the
+reuse check on the payment preview page also covers older slips. Restart
+the app afterwards so workers rebuild their in-memory index.
+
+Examples:
+    python backfill_slip_hashes.py
+    python backfill_slip_hashes.py --batch-size 200
+"""
+import argparse
+import os
+
+from app import create_app, db
+from app.models import Payment
+from app.utils.image_hash import hash_file
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hash payment slips that have no perceptual hash yet.")
+    parser.add_argument("--batch-size", type=int, default=500, help="Payments per commit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = create_app()
+    with app.app_context():
+        folder = app.config["UPLOAD_FOLDER"]
+        hashed = missing = unreadable = 0
+        last_id = 0
+        while True:
+            payments = Payment.query.filter(
+                Payment.slip_hash.is_(None), Payment.id > last_id
+            ).order_by(Payment.id).limit(args.batch_size).all()
+            if not payments:
+                break
+            for payment in payments:
+                last_id = payment.id
+                path = os.path.join(folder, payment.slip_filename)
+                if not os.path.exists(path):
+                    missing += 1
+                    continue
+                payment.slip_hash = hash_file(path)
+                if payment.slip_hash:
+                    hashed += 1
+                else:
+                    unreadable += 1
+            db.session.commit()
+
+    print(f"Hashed {hashed} slips ({missing} files missing, {unreadable} could not be decoded).")
+
+
+if __name__ == "__main__":
+    main()
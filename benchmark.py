@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""
+Function-level micro-benchmarks for the portal's hot paths.
+
+Each target runs against freshly seeded SQLite databases of several sizes
+(see app/utils/seed.py). Results are stored as JSON and two result files can
+be compared; the comparison exits non-zero when any target's median got
+slower than the threshold, so it can gate a deploy.
+
+Examples:
+    python benchmark.py run --sizes 1000,10000 --output benchmarks/results/main.json
+    python benchmark.py run --sizes 1000 --targets chatbot_extract_context,paid_percentage
+    python benchmark.py compare benchmarks/results/main.json benchmarks/results/branch.json --threshold 0.10
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DEFAULT_RESULTS_DIR = os.path.join("benchmarks", "results")
+
+CHATBOT_QUESTIONS = [
+    "hello there", "I forgot my password and can't login", "what are the payment methods",
+    "when is the registration deadline", "where can i check my exam results",
+    "is there a swimming pool on campus", "thanks a lot", "the portal is down, system error",
+]
+
+
+def _make_app(database_path, scratch_dir):
+    from app import create_app
+    from app.config import Config
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+        UPLOAD_FOLDER = os.path.join(scratch_dir, "uploads")
+        REGISTRATION_SLIP_FOLDER = os.path.join(scratch_dir, "registration_slips")
+        PROFILE_FOLDER = os.path.join(scratch_dir, "profiles")
+        SERVER_NAME = "bench.local"
+
+    return create_app(BenchConfig)
+
+
+# ---------------- Targets ----------------
+# Each factory receives (rng, fixtures) and returns a zero-argument callable to time.
+
+def _target_chatbot_extract_context(rng, fx):
+    from app.routes.chatbot.chatbot_routes import chatbot
+    return lambda: chatbot._extract_context(rng.choice(CHATBOT_QUESTIONS).lower())
+
+
+def _target_chatbot_generate_response(rng, fx):
+    from app.routes.chatbot.chatbot_routes import chatbot
+    return lambda: chatbot.generate_response(rng.choice(CHATBOT_QUESTIONS))
+
+
+def _target_registration_slip_pdf(rng, fx):
+    from app.extensions import db
+    from app.models import RegistrationSlip
+    from app.utils.helpers import generate_registration_slip_pdf
+    return lambda: generate_registration_slip_pdf(db.session.get(RegistrationSlip, rng.choice(fx["slip_ids"])))
+
+
+def _target_timetable_pdf(rng, fx):
+    from app.extensions import db
+    from app.models import Student
+    from app.utils.pdf_generator import build_timetable_pdf
+    from app.utils.timetable import student_timetable
+
+    def run():
+        student = db.session.get(Student, rng.choice(fx["student_ids"]))
+        return build_timetable_pdf(student, student_timetable(student.id))
+    return run
+
+
+def _target_docket_pdf(rng, fx):
+    from app.extensions import db
+    from app.models import Student
+    from app.utils.pdf_generator import build_docket_pdf
+    return lambda: build_docket_pdf(
+        db.session.get(Student, rng.choice(fx["student_ids"])), "CAT1", "http://bench.local/student/docket#assessment=CAT1"
+    )
+
+
+def _target_paid_percentage(rng, fx):
+    from app.utils.dockets import paid_percentage
+    return lambda: paid_percentage(rng.choice(fx["student_ids"]))
+
+
+def _target_check_password(rng, fx):
+    from app.extensions import db
+    from app.models import User
+    from app.utils.seed import SEED_PASSWORD
+    user = db.session.get(User, fx["user_id"])
+    return lambda: user.check_password(SEED_PASSWORD)
+
+
+def _target_student_results(rng, fx):
+    from sqlalchemy.orm import joinedload
+    from app.models import CourseEnrollment
+    from app.routes.student_routes import _build_results
+
+    def run():
+        enrollments = CourseEnrollment.query.options(joinedload(CourseEnrollment.course)).filter_by(
+            student_id=rng.choice(fx["student_ids"])
+        ).order_by(CourseEnrollment.academic_year.desc(), CourseEnrollment.semester.desc()).all()
+        return _build_results(enrollments)
+    return run
+
+
+TARGETS = {
+    "chatbot_extract_context": _target_chatbot_extract_context,
+    "chatbot_generate_response": _target_chatbot_generate_response,
+    "registration_slip_pdf": _target_registration_slip_pdf,
+    "timetable_pdf": _target_timetable_pdf,
+    "docket_pdf": _target_docket_pdf,
+    "paid_percentage": _target_paid_percentage,
+    "check_password": _target_check_password,
+    "student_results": _target_student_results,
+}
+
+
+def _time_target(func, min_time, min_iterations, max_iterations):
+    """Call func until both min_time and min_iterations are reached; return per-call seconds."""
+    from app.extensions import db
+
+    func()  # warm-up (imports, caches, first query compilation)
+    db.session.rollback()
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_iterations and (len(timings) < min_iterations or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - t0)
+        db.session.expire_all()  # avoid measuring identity-map hits instead of the real work
+    db.session.rollback()
+    return timings
+
+
+def _summarise(timings):
+    ordered = sorted(timings)
+    return {
+        "iterations": len(ordered),
+        "min_ms": ordered[0] * 1000.0,
+        "median_ms": statistics.median(ordered) * 1000.0,
+        "mean_ms": statistics.fmean(ordered) * 1000.0,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000.0,
+    }
+
+
+def run_benchmarks(args):
+    from app.extensions import db
+    from app.models import RegistrationSlip, Student, User
+    from app.utils.seed import SeedVolumes, seed_database
+
+    targets = args.targets.split(",") if args.targets else list(TARGETS)
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        sys.exit(f"Unknown targets: {', '.join(unknown)}. Choose from: {', '.join(TARGETS)}")
+
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        scratch = tempfile.mkdtemp(prefix=f"cavendish_bench_{size}_")
+        try:
+            app = _make_app(os.path.join(scratch, "bench.db"), scratch)
+            with app.app_context():
+                db.create_all()
+                seed_database(SeedVolumes(students=size), seed=args.seed, log=lambda msg: print(f"[{size}] {msg}"))
+                fixtures = {
+                    "student_ids": [s for (s,) in db.session.query(Student.id).limit(2000)],
+                    "slip_ids": [s for (s,) in db.session.query(RegistrationSlip.id).limit(2000)],
+                    "user_id": db.session.query(User.id).filter(User.student_id.isnot(None)).first()[0],
+                }
+                for name in targets:
+                    rng = random.Random(args.seed)
+                    func = TARGETS[name](rng, fixtures)
+                    summary = _summarise(_time_target(func, args.min_time, args.min_iterations, args.max_iterations))
+                    key = f"{name}@{size}"
+                    results[key] = summary
+                    print(f"  {key:<40} median {summary['median_ms']:9.3f} ms  p95 {summary['p95_ms']:9.3f} ms"
+                          f"  ({summary['iterations']} runs)")
+                db.session.remove()
+                db.engine.dispose()
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    payload = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.platform(),
+        "seed": args.seed,
+        "results": results,
+    }
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"bench_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare_to:
+        with open(args.compare_to) as f:
+            baseline = json.load(f)
+        return compare_results(baseline, payload, args.threshold)
+    return 0
+
+
+def compare_results(baseline, current, threshold):
+    """Print a comparison table and return 1 if any median regressed beyond threshold."""
+    regressions = []
+    print(f"\n{'Target':<40}{'baseline':>12}{'current':>12}{'change':>10}")
+    for key, now in sorted(current["results"].items()):
+        before = baseline["results"].get(key)
+        if before is None:
+            print(f"{key:<40}{'-':>12}{now['median_ms']:>12.3f}{'new':>10}")
+            continue
+        change = (now["median_ms"] - before["median_ms"]) / before["median_ms"] if before["median_ms"] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        print(f"{key:<40}{before['median_ms']:>12.3f}{now['median_ms']:>12.3f}{change * 100:>9.1f}%{flag}")
+        if change > threshold:
+            regressions.append(key)
+
+    if regressions:
+        print(f"\n{len(regressions)} target(s) slower than the {threshold:.0%} threshold: {', '.join(regressions)}")
+        return 1
+    print(f"\nNo regressions above {threshold:.0%}.")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for hot functions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Seed databases and time every target")
+    run.add_argument("--sizes", default="1000,10000", help="Comma-separated student counts to seed")
+    run.add_argument("--targets", help=f"Comma-separated subset of: {', '.join(TARGETS)}")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--min-time", type=float, default=0.5, help="Minimum seconds spent per target")
+    run.add_argument("--min-iterations", type=int, default=5)
+    run.add_argument("--max-iterations", type=int, default=2000)
+    run.add_argument("--output", help="Where to write the JSON results")
+    run.add_argument("--compare-to", help="Baseline JSON to compare against after the run")
+    run.add_argument("--threshold", type=float, default=0.10, help="Allowed median slowdown (0.10 = 10%%)")
+
+    compare = sub.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.10, help="Allowed median slowdown (0.10 = 10%%)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "run":
+        sys.exit(run_benchmarks(args))
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    sys.exit(compare_results(baseline, current, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 # cleanup_database.py
 from app import create_app, db
-from app.models import Payment, RegistrationSlip, Registration, Student, User
+from app.models import CourseWaitlist, DocketEligibility, ExamSeat, Payment, RegistrationSlip, Registration, Student, User
 import os
 
 def cleanup_database():
@@ -24,6 +24,9 @@ def cleanup_database():
         print(f"  - Users: {users_count}")
         
         # Delete all data except users
+        CourseWaitlist.query.delete()
+        DocketEligibility.query.delete()
+        ExamSeat.query.delete()
         Payment.query.delete()
         RegistrationSlip.query.delete()
         Registration.query.delete()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""
+Remove duplicate payments and registrations left by double-submitted forms.
+
+Forms now carry an idempotency key, so a repeated submission no longer
+creates new rows. Run this once after upgrading to clear the duplicates made
+before that. A pending payment is a duplicate when the same student
+uploaded a byte-for-byte identical file (same SHA-256) with the same
+amount and description shortly before. An unapproved registration is a
+duplicate when it repeats an earlier one for the same period, programme
+and modules. The first of each is kept, and the duplicates' uploaded files
+are deleted.
+
+Nothing is deleted without --apply; by default it only reports what would go.
+
+Examples:
+    python dedupe_submissions.py
+    python dedupe_submissions.py --window-minutes 60 --apply
+"""
+import argparse
+from datetime import timedelta
+
+from app import create_app
+from app.config import Config
+from app.utils.submissions import deduplicate_submissions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Delete duplicate pending payments and registrations.")
+    parser.add_argument("--window-minutes", type=int, default=30,
+                        help="How soon after the first a repeat counts as a duplicate (default: 30)")
+    parser.add_argument("--apply", action="store_true",
+                        help="Delete the duplicates (default: only report what would be deleted)")
+    parser.add_argument("--database", help="Override SQLALCHEMY_DATABASE_URI")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    class DedupeConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or Config.SQLALCHEMY_DATABASE_URI
+
+    app = create_app(DedupeConfig)
+    with app.app_context():
+        payments, registrations = deduplicate_submissions(
+            window=timedelta(minutes=args.window_minutes), dry_run=not args.apply
+        )
+    verb = "Deleted" if args.apply else "Would delete"
+    print(f"{verb} {len(payments):,} duplicate payment(s) and {len(registrations):,} duplicate registration(s).")
+    if not args.apply and payments:
+        print(f"  payment ids: {', '.join(map(str, payments[:50]))}{' ...' if len(payments) > 50 else ''}")
+    if not args.apply and registrations:
+        print(f"  registration ids: {', '.join(map(str, registrations[:50]))}{' ...' if len(registrations) > 50 else ''}")
+    if not args.apply and (payments or registrations):
+        print("Run again with --apply to delete them.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+"""
+Turn the module picks of approved registrations into course enrollments.
+
+Payment approval already enrolls the student on the modules of their latest
+registration; this catches up everything else (registrations approved before
+module selection existed, or imported in bulk) with one INSERT ... SELECT.
+Enrollments that already exist are skipped, so it is safe to re-run.
+
+Examples:
+    python enroll_modules.py
+    python enroll_modules.py --academic-year 2024/2025 --semester "Semester 1"
+"""
+import argparse
+import time
+
+from app import create_app
+from app.config import Config
+from app.models import db
+from app.utils.modules import enroll_registrations
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Create course enrollments for approved module registrations.")
+    parser.add_argument("--academic-year", help="Only registrations for this academic year, e.g. 2024/2025")
+    parser.add_argument("--semester", help='Only registrations for this semester, e.g. "Semester 1"')
+    parser.add_argument("--database", help="Override SQLALCHEMY_DATABASE_URI")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    class EnrollConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or Config.SQLALCHEMY_DATABASE_URI
+
+    app = create_app(EnrollConfig)
+    started = time.perf_counter()
+    with app.app_context():
+        created = enroll_registrations(academic_year=args.academic_year, semester=args.semester)
+        db.session.commit()
+    print(f"Created {created:,} enrollment(s) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
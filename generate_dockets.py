@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+"""
+Print the exam dockets of a whole session: one PDF per course, holding a
+docket for every student on it who has paid enough for the assessment.
+
+Courses are rendered in parallel worker processes (--processes, default
+DOCKET_PROCESSES or one per CPU). --refresh first recomputes every student's
+eligibility, which is needed after DOCKET_THRESHOLDS change. QR codes link to
+the online docket page, so pass the portal's public address with --base-url,
+and sign them with the portal's key: set DOCKET_SIGNING_KEY (or SECRET_KEY)
+in the environment as on the portal.
+
+Examples:
+    python generate_dockets.py --academic-year 2025/2026 --semester "Semester 1" --assessment FINAL
+    python generate_dockets.py --academic-year 2025/2026 --semester "Semester 1" --assessment CAT1 \\
+        --output dockets/cat1 --processes 8 --base-url https://portal.cavendish.co.zm
+    python generate_dockets.py --refresh
+"""
+import argparse
+import sys
+import time
+
+from app import create_app
+from app.config import Config
+from app.models import db
+from app.utils.dockets import generate_session, refresh_eligibility
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate exam docket PDFs for every course of a session.")
+    parser.add_argument("--academic-year", help="Academic year of the session, e.g. 2025/2026")
+    parser.add_argument("--semester", help='Semester of the session, e.g. "Semester 1"')
+    parser.add_argument("--assessment", type=str.upper, choices=sorted(Config.DOCKET_THRESHOLDS),
+                        help="Assessment whose dockets to print")
+    parser.add_argument("--output", default="dockets", help="Folder for the PDFs (default: ./dockets)")
+    parser.add_argument("--processes", type=int, help="Worker processes, overriding DOCKET_PROCESSES")
+    parser.add_argument("--base-url", default="http://localhost:5000", help="Portal address used in the QR codes")
+    parser.add_argument("--refresh", action="store_true", help="Recompute docket eligibility first")
+    parser.add_argument("--database", help="Override SQLALCHEMY_DATABASE_URI")
+    args = parser.parse_args()
+    session = (args.academic_year, args.semester, args.assessment)
+    if any(session) and not all(session):
+        parser.error("--academic-year, --semester and --assessment go together")
+    if not any(session) and not args.refresh:
+        parser.error("give a session to print (--academic-year, --semester, --assessment) and/or --refresh")
+    return args
+
+
+def main():
+    args = parse_args()
+
+    class DocketConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or Config.SQLALCHEMY_DATABASE_URI
+
+    app = create_app(DocketConfig)
+    if args.assessment and not app.config.get("DOCKET_SIGNING_KEY"):
+        sys.exit("Set DOCKET_SIGNING_KEY (or SECRET_KEY) in the environment to sign the dockets' QR codes.")
+    started = time.perf_counter()
+    with app.test_request_context(base_url=args.base_url):
+        if args.refresh:
+            students = refresh_eligibility()
+            db.session.commit()
+            print(f"Recomputed docket eligibility for {students:,} student(s)")
+        if args.assessment:
+            written = generate_session(args.academic_year, args.semester, args.assessment, args.output,
+                                       processes=args.processes)
+            for code, count, path in written:
+                print(f"  - {code}: {count:,} docket(s) -> {path}")
+            print(f"Wrote {sum(count for _, count, _ in written):,} docket(s) in {len(written)} PDF(s)")
+    print(f"Done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+"""
+HTTP load test for every portal role.
+
+Logs in as seeded students, admins and lecturers (see seed_data.py) and
+drives weighted traffic mixes against a running server, then reports
+p50/p95/p99 latency, throughput and error rate per endpoint. Results can be
+saved as the baseline and later runs compared against it.
+
+Examples:
+    python seed_data.py --students 20000 --database sqlite:////tmp/load.db --reset
+    python load_test.py --database sqlite:////tmp/load.db --start-server --workers 4 --users 50 --duration 60
+    python load_test.py --base-url http://127.0.0.1:8000 --database sqlite:////tmp/load.db --save-baseline
+"""
+import argparse
+import io
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+from app.utils.seed import SEED_PASSWORD
+
+DEFAULT_BASELINE = os.path.join("benchmarks", "loadtest_baseline.json")
+
+# Role -> share of virtual users. Registration week is dominated by students.
+ROLE_WEIGHTS = {"student": 75, "admin": 10, "lecturer": 5, "chatbot": 10}
+
+# A tiny valid PNG so uploads exercise the real save path without large payloads
+TINY_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+class Recorder:
+    """Thread-safe collection of (endpoint, latency, ok) samples."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, name, seconds, ok):
+        with self.lock:
+            self.samples[name].append(seconds)
+            if not ok:
+                self.errors[name] += 1
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _is_ok(response):
+    """Errors are 4xx/5xx responses and redirects back to a login page (lost session)."""
+    if response.status_code >= 400:
+        return False
+    if response.is_redirect and "login" in response.headers.get("Location", ""):
+        return False
+    return True
+
+
+class VirtualUser(threading.Thread):
+    """Closed-loop user: log in once, then pick weighted actions until the deadline."""
+
+    def __init__(self, role, base_url, accounts, recorder, deadline, think_time, rng):
+        super().__init__(daemon=True)
+        self.role = role
+        self.base_url = base_url.rstrip("/")
+        self.accounts = accounts
+        self.recorder = recorder
+        self.deadline = deadline
+        self.think_time = think_time
+        self.rng = rng
+        self.http = requests.Session()
+
+    def _call(self, name, method, path, **kwargs):
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.http.request(method, self.base_url + path, allow_redirects=False, timeout=30, **kwargs)
+            ok = _is_ok(response)
+        except requests.RequestException:
+            response = None
+        self.recorder.record(name, time.perf_counter() - start, ok)
+        return response
+
+    # ---------------- Logins ----------------
+    def login(self):
+        if self.role == "student":
+            username = self.rng.choice(self.accounts["students"])
+            self._call("student.login", "POST", "/student/login",
+                       data={"student_number": username, "password": SEED_PASSWORD})
+        elif self.role == "admin":
+            username = self.rng.choice(self.accounts["admins"])
+            self._call("admin.login", "POST", "/admin/login",
+                       data={"username": username, "password": SEED_PASSWORD})
+        elif self.role == "lecturer":
+            email = self.rng.choice(self.accounts["lecturers"])
+            self._call("lecturer.login", "POST", "/lecturer/login",
+                       data={"email": email, "password": SEED_PASSWORD})
+
+    # ---------------- Mixes ----------------
+    def student_action(self):
+        action = self.rng.choices(
+            ["dashboard", "docket", "results", "upload", "timetable"], [40, 20, 20, 10, 10]
+        )[0]
+        if action == "dashboard":
+            self._call("student.dashboard", "GET", "/student/dashboard")
+        elif action == "docket":
+            self._call("student.docket", "GET", "/student/docket")
+        elif action == "results":
+            self._call("student.results", "GET", "/student/results")
+        elif action == "upload":
+            files = {"payment_slip": ("load_test.png", io.BytesIO(TINY_PNG), "image/png")}
+            details = {"reference": f"LT{self.rng.getrandbits(64):016X}", "amount": f"{self.rng.randint(500, 9000)}.00"}
+            self._call("student.upload_payment", "POST", "/student/upload_payment", data=details, files=files)
+        else:
+            self._call("student.download_timetable", "GET", "/student/download_timetable")
+
+    def admin_action(self):
+        action = self.rng.choices(["dashboard", "approve", "slips", "student"], [40, 20, 25, 15])[0]
+        if action == "dashboard":
+            self._call("admin.dashboard", "GET", "/admin/dashboard")
+        elif action == "approve":
+            try:
+                # Shared by every virtual user; a single pop() is atomic, a check-then-pop is not
+                payment_id, version = self.accounts["pending_payments"].pop()
+            except IndexError:
+                payment_id = None
+            if payment_id is None:
+                self._call("admin.dashboard", "GET", "/admin/dashboard")
+            else:
+                self._call("admin.manage_payment", "GET", f"/admin/payment/{payment_id}/approve?version={version}")
+        elif action == "slips":
+            self._call("admin.view_registration_slips", "GET", "/admin/view_registration_slips")
+        else:
+            student_id = self.rng.choice(self.accounts["student_ids"])
+            self._call("admin.view_student_details", "GET", f"/admin/student/{student_id}")
+
+    def lecturer_action(self):
+        action = self.rng.choices(["dashboard", "students"], [50, 50])[0]
+        if action == "dashboard":
+            self._call("lecturer.dashboard", "GET", "/lecturer/dashboard")
+        else:
+            self._call("lecturer.students", "GET", "/lecturer/students")
+
+    def chatbot_action(self):
+        question = self.rng.choice([
+            "how do i pay my fees", "i forgot my password", "when is the registration deadline",
+            "where can i check results", "hello", "is there a swimming pool",
+        ])
+        # A random suffix keeps most questions off the stored-answer fast path, like real traffic
+        if self.rng.random() < 0.7:
+            question = f"{question} {self.rng.randrange(10**6)}"
+        self._call("chatbot.ask", "POST", "/chatbot/ask", json={"message": question})
+
+    def run(self):
+        self.login()
+        action = getattr(self, f"{self.role}_action")
+        while time.monotonic() < self.deadline:
+            action()
+            if self.think_time:
+                time.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+
+def load_accounts(database_url, limit=5000):
+    """Read seeded credentials and ids straight from the database the server uses."""
+    from app import create_app
+    from app.config import Config
+    from app.models import User, UserRole, Payment
+
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+
+    app = create_app(LoadTestConfig)
+    with app.app_context():
+        students = [u for (u,) in User.query.with_entities(User.username).filter_by(role=UserRole.STUDENT)
+                    .filter(User.username.like("SD%")).limit(limit)]
+        admins = [u for (u,) in User.query.with_entities(User.username).filter_by(role=UserRole.ADMIN)
+                  .filter(User.username.like("seed_admin_%"))]
+        lecturers = [e for (e,) in User.query.with_entities(User.email).filter_by(role=UserRole.LECTURER)
+                     .filter(User.username.like("seed_lecturer_%"))]
+        student_ids = [s for (s,) in User.query.with_entities(User.student_id).filter_by(role=UserRole.STUDENT)
+                       .filter(User.student_id.isnot(None)).limit(limit)]
+        # (id, version): approvals carry the version the admin saw, as the dashboard buttons do
+        pending = [tuple(p) for p in Payment.query.with_entities(Payment.id, Payment.version)
+                   .filter_by(status="pending").limit(limit)]
+
+    if not students or not admins:
+        sys.exit("No seeded accounts found. Run seed_data.py against this database first.")
+    return {
+        "students": students, "admins": admins, "lecturers": lecturers,
+        "student_ids": student_ids, "pending_payments": pending,
+    }
+
+
+def start_server(database_url, port, workers):
+    """Start gunicorn on localhost and wait for /ping to report ready."""
+    # Scratch folders keep uploads and generated slips from a load run out of the real app folders
+    scratch = tempfile.mkdtemp(prefix="cavendish_load_")
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        METRICS_DIR=os.path.join(scratch, "metrics"),
+        UPLOAD_FOLDER=os.path.join(scratch, "uploads"),
+        REGISTRATION_SLIP_FOLDER=os.path.join(scratch, "registration_slips"),
+    )
+    process = subprocess.Popen(
+        ["gunicorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning", "run:app"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if requests.get(base_url + "/ping", timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    sys.exit("gunicorn did not become ready on /ping")
+
+
+def summarise(recorder, elapsed):
+    report = {}
+    for name, values in sorted(recorder.samples.items()):
+        values = sorted(values)
+        report[name] = {
+            "requests": len(values),
+            "errors": recorder.errors.get(name, 0),
+            "error_rate": recorder.errors.get(name, 0) / len(values),
+            "throughput_rps": len(values) / elapsed,
+            "p50_ms": _percentile(values, 50) * 1000.0,
+            "p95_ms": _percentile(values, 95) * 1000.0,
+            "p99_ms": _percentile(values, 99) * 1000.0,
+        }
+    return report
+
+
+def print_report(report, elapsed, baseline=None):
+    total = sum(r["requests"] for r in report.values())
+    errors = sum(r["errors"] for r in report.values())
+    print(f"\n{'Endpoint':<34}{'Reqs':>8}{'RPS':>8}{'Err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}  vs baseline p95")
+    for name, r in report.items():
+        delta = ""
+        if baseline and name in baseline:
+            base = baseline[name]["p95_ms"]
+            delta = f"{(r['p95_ms'] - base) / base * 100.0:+.0f}%" if base else ""
+        print(f"{name:<34}{r['requests']:>8}{r['throughput_rps']:>8.1f}{r['error_rate'] * 100:>7.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}  {delta}")
+    print(f"\nTotal: {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), "
+          f"error rate {errors / max(total, 1) * 100:.2f}%")
+
+
+def find_regressions(report, baseline, tolerance, error_tolerance):
+    regressions = []
+    for name, r in report.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base["p95_ms"] and r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {r['p95_ms']:.1f}ms vs baseline {base['p95_ms']:.1f}ms")
+        if r["error_rate"] > base["error_rate"] + error_tolerance:
+            regressions.append(f"{name}: error rate {r['error_rate']:.2%} vs baseline {base['error_rate']:.2%}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test the portal with seeded accounts.")
+    parser.add_argument("--database", required=True, help="Database URL the server uses (for seeded accounts)")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--start-server", action="store_true", help="Start a local gunicorn instance")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--users", type=int, default=40, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between actions (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed p95 growth vs baseline (0.25 = 25%%)")
+    parser.add_argument("--error-tolerance", type=float, default=0.01, help="Allowed absolute error-rate growth")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    accounts = load_accounts(args.database)
+
+    server = None
+    base_url = args.base_url
+    if args.start_server:
+        server, base_url = start_server(args.database, args.port, args.workers)
+
+    try:
+        recorder = Recorder()
+        roles = list(ROLE_WEIGHTS)
+        started = time.monotonic()
+        deadline = started + args.duration
+        users = [
+            VirtualUser(rng.choices(roles, list(ROLE_WEIGHTS.values()))[0], base_url, accounts,
+                        recorder, deadline, args.think_time, random.Random(rng.random()))
+            for _ in range(args.users)
+        ]
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - started
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = summarise(recorder, elapsed)
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["endpoints"]
+    print_report(report, elapsed, baseline)
+
+    payload = {"users": args.users, "duration_s": elapsed, "workers": args.workers, "endpoints": report}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(payload, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(payload, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif baseline:
+        regressions = find_regressions(report, baseline, args.tolerance, args.error_tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
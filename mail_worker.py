@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Deliver queued emails from the email_outbox table.
+
+Routes only enqueue messages; this worker sends them in batches over one
+persistent SMTP connection, retrying temporary failures with backoff and
+holding back recipients who hit MAIL_RECIPIENT_LIMIT. Run one (or a few)
+alongside the web workers.
+
+Examples:
+    python mail_worker.py                # run until interrupted
+    python mail_worker.py --once         # deliver what is due now and exit (cron)
+    MAIL_SERVER=localhost MAIL_PORT=8025 python mail_worker.py --poll-interval 1
+"""
+import argparse
+import time
+
+from app import create_app
+from app.config import Config
+from app.utils.mailer import OutboxWorker
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Send queued emails.")
+    parser.add_argument("--once", action="store_true", help="Deliver everything due now, then exit")
+    parser.add_argument("--batch-size", type=int, help="Messages claimed per batch (default MAIL_BATCH_SIZE)")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds to wait when the outbox is empty")
+    parser.add_argument("--database", help="Override SQLALCHEMY_DATABASE_URI")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    class WorkerConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or Config.SQLALCHEMY_DATABASE_URI
+
+    app = create_app(WorkerConfig)
+    with app.app_context():
+        worker = OutboxWorker(app, batch_size=args.batch_size)
+        if args.once:
+            started = time.perf_counter()
+            try:
+                processed = worker.run_once()
+            finally:
+                worker.close()
+            print(f"Processed {processed:,} queued emails in {time.perf_counter() - started:.1f}s")
+            return
+        print(f"Mail worker delivering via {app.config['MAIL_SERVER']}:{app.config['MAIL_PORT']} (Ctrl+C to stop)")
+        try:
+            worker.run_forever(poll_interval=args.poll_interval)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
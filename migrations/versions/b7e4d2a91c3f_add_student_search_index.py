@@ -0,0 +1,76 @@
+"""Add full-text search index over students
+
+Revision ID: b7e4d2a91c3f
+Revises: 66841a9d04f8
+Create Date: 2025-10-20 09:12:31.402118
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4d2a91c3f'
+down_revision = '66841a9d04f8'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS student_fts USING fts5(
+        student_number, name, email, program, faculty,
+        content='student', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS student_fts_ai AFTER INSERT ON student BEGIN
+        INSERT INTO student_fts(rowid, student_number, name, email, program, faculty)
+        VALUES (new.id, new.student_number, new.name, new.email, new.program, new.faculty);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS student_fts_ad AFTER DELETE ON student BEGIN
+        INSERT INTO student_fts(student_fts, rowid, student_number, name, email, program, faculty)
+        VALUES ('delete', old.id, old.student_number, old.name, old.email, old.program, old.faculty);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS student_fts_au
+    AFTER UPDATE OF student_number, name, email, program, faculty ON student BEGIN
+        INSERT INTO student_fts(student_fts, rowid, student_number, name, email, program, faculty)
+        VALUES ('delete', old.id, old.student_number, old.name, old.email, old.program, old.faculty);
+        INSERT INTO student_fts(rowid, student_number, name, email, program, faculty)
+        VALUES (new.id, new.student_number, new.name, new.email, new.program, new.faculty);
+    END""",
+    "INSERT INTO student_fts(student_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS student_fts_au",
+    "DROP TRIGGER IF EXISTS student_fts_ad",
+    "DROP TRIGGER IF EXISTS student_fts_ai",
+    "DROP TABLE IF EXISTS student_fts",
+]
+
+POSTGRES_UPGRADE = [
+    "ALTER TABLE student ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "CREATE INDEX IF NOT EXISTS ix_student_search_vector ON student USING gin(search_vector)",
+    "DROP TRIGGER IF EXISTS student_search_vector_update ON student",
+    """CREATE TRIGGER student_search_vector_update BEFORE INSERT OR UPDATE ON student
+    FOR EACH ROW EXECUTE FUNCTION tsvector_update_trigger(
+        search_vector, 'pg_catalog.simple', student_number, name, email, program, faculty
+    )""",
+    """UPDATE student SET search_vector = to_tsvector('pg_catalog.simple',
+        concat_ws(' ', student_number, name, email, program, faculty))""",
+]
+
+POSTGRES_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS student_search_vector_update ON student",
+    "DROP INDEX IF EXISTS ix_student_search_vector",
+    "ALTER TABLE student DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_UPGRADE, 'postgresql': POSTGRES_UPGRADE}.get(dialect, []):
+        op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for statement in {'sqlite': SQLITE_DOWNGRADE, 'postgresql': POSTGRES_DOWNGRADE}.get(dialect, []):
+        op.execute(statement)
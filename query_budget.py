@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+"""
+Query-count budgets for every GET route.
+
+Seeds two throwaway SQLite databases (a small and a larger one, see
+app/utils/seed.py), renders every registered route against each with the
+right session, and counts the SQL statements issued per request. A route
+fails when it exceeds its declared budget or when its count grows with the
+number of rows — the signature of a relationship lazily loaded in a loop.
+Failures list the most repeated statement so the N+1 is easy to find.
+
+Examples:
+    python query_budget.py
+    python query_budget.py --sizes 30,300 --endpoint admin.dashboard -v
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+from sqlalchemy import event, func
+
+# Maximum statements per request. Routes not listed get DEFAULT_BUDGET.
+DEFAULT_BUDGET = 5
+BUDGETS = {
+    "admin.dashboard": 4,
+    "admin.module_roster": 10,  # course + periods + section + a count and a page for each of the three rosters
+    "admin.modules": 6,  # user + courses + periods + counts + section seats/waitlists
+    "admin.view_registration_slips": 2,
+    "admin.view_students": 4,  # includes the Flask-Login user lookup for admins
+    "general.verify_docket": 0,  # checked at the exam door; must work without the database
+    "student.student_results": 6,  # Flask-Login user + two loading the student's class for the GPA (cached afterwards)
+    "results.results_analysis": 6,  # user + five aggregate queries
+}
+
+# Routes that change data, need files on disk, or are not pages.
+SKIPPED = {
+    "static": "static files",
+    "admin.admin_logout": "clears the session",
+    "student.student_logout": "clears the session",
+    "lecturer.logout": "clears the session",
+    "admin.delete_admin": "mutates data",
+    "admin.delete_registration_slip": "mutates data",
+    "admin.manage_payment": "mutates data",
+    "admin.regenerate_slip_pdf": "writes a PDF",
+    "admin.serve_registration_slip": "serves a file from disk",
+    "admin.serve_uploaded_file": "serves a file from disk",
+    "admin.serve_profile": "serves a file from disk",
+    "student.uploaded_file": "serves a file from disk",
+}
+
+# Routes that currently error for reasons unrelated to query counts. They are
+# reported but do not fail the run; delete the entry once the route is fixed.
+KNOWN_BROKEN = {
+    "admin.create_registration_slip_form": "template links to a missing admin.create_registration_slip endpoint",
+    "chatbot.chatbot_stats": "jsonify() of SQLAlchemy Row objects",
+    "chatbot.view_unanswered": "chatbot/unanswered.html does not exist",
+    "results.results_analysis": "admin/results_analysis.html does not exist",
+    "results.view_student_results": "lecturer/student_results_view.html does not exist",
+}
+
+ROLE_BY_BLUEPRINT = {"admin": "admin", "student": "student", "lecturer": "lecturer", "chatbot": "admin", "results": "admin"}
+ROLE_BY_ENDPOINT = {"results.my_results": "student"}
+PUBLIC_ENDPOINTS = {
+    "admin.admin_login", "student.student_login", "student.student_register",
+    "lecturer.lecturer_login", "lecturer.lecturer_register", "chatbot.help_page",
+    "student.timetable_feed",
+}
+
+
+def _make_app(database_path, scratch_dir):
+    from app import create_app
+    from app.config import Config
+
+    class BudgetConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+        UPLOAD_FOLDER = os.path.join(scratch_dir, "uploads")
+        REGISTRATION_SLIP_FOLDER = os.path.join(scratch_dir, "registration_slips")
+        PROFILE_FOLDER = os.path.join(scratch_dir, "profiles")
+        TIMETABLE_CACHE_FOLDER = os.path.join(scratch_dir, "timetables")
+        DOCKET_SIGNING_KEY = "query-budget"
+
+    return create_app(BudgetConfig)
+
+
+def _fixtures(db):
+    """Pick the rows route arguments point at; the busiest student makes N+1s visible."""
+    from app.models import Course, CourseEnrollment, ExamSeat, Payment, RegistrationSlip, Student, User
+    from app.utils.timetable_cache import feed_token
+
+    busiest = (
+        db.session.query(Student.id)
+        .join(Payment, Payment.student_id == Student.id)
+        .join(RegistrationSlip, RegistrationSlip.student_id == Student.id)
+        .outerjoin(CourseEnrollment, CourseEnrollment.student_id == Student.id)
+        .group_by(Student.id)
+        .order_by(func.count(CourseEnrollment.id).desc(), Student.id)
+        .first()
+    )[0]
+    busiest_lecturer = (
+        db.session.query(User.id, User.lecturer_id)
+        .join(Course, Course.primary_lecturer_id == User.lecturer_id)
+        .join(CourseEnrollment, CourseEnrollment.course_id == Course.id)
+        .filter(User.role == "lecturer")
+        .group_by(User.id)
+        .order_by(func.count(CourseEnrollment.id).desc(), User.id)
+        .first()
+    )
+    busiest_course = (
+        db.session.query(CourseEnrollment.course_id)
+        .group_by(CourseEnrollment.course_id)
+        .order_by(func.count(CourseEnrollment.id).desc(), CourseEnrollment.course_id)
+        .first()
+    )[0]
+    busiest_hall = (
+        db.session.query(ExamSeat.session_id, ExamSeat.hall_id)
+        .group_by(ExamSeat.session_id, ExamSeat.hall_id)
+        .order_by(func.count(ExamSeat.id).desc(), ExamSeat.session_id, ExamSeat.hall_id)
+        .first()
+    )
+    return {
+        "student_id": busiest,
+        "student_user_id": db.session.query(User.id).filter_by(student_id=busiest).first()[0],
+        "course_id": busiest_course,
+        "lecturer_user_id": busiest_lecturer[0],
+        "lecturer_id": busiest_lecturer[1],
+        "payment_id": db.session.query(Payment.id).filter_by(student_id=busiest).first()[0],
+        "slip_id": db.session.query(RegistrationSlip.id).filter_by(student_id=busiest).first()[0],
+        "admin_id": db.session.query(User.id).filter_by(role="admin").order_by(User.id).first()[0],
+        "exam_session_id": busiest_hall[0],
+        "hall_id": busiest_hall[1],
+        # The busiest student's calendar feed; also (harmlessly) tried as a password reset token
+        "token": feed_token(busiest),
+    }
+
+
+def _url_kwargs(rule, fixtures):
+    values = {"assessment": "CAT1", "token": "not-a-real-token"}
+    values.update(fixtures)
+    kwargs = {}
+    for arg in rule.arguments:
+        if arg not in values:
+            return None
+        kwargs[arg] = values[arg]
+    return kwargs
+
+
+def _normalise(statement):
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+def measure_routes(size, seed, only=None):
+    """Seed a database with `size` students and return {endpoint: (status, [statements])}."""
+    from flask import g, url_for
+    from app.extensions import audit, db
+    from app.utils.gpa import clear_cache as clear_gpa_cache
+    from app.utils.seed import SeedVolumes, seed_database
+
+    scratch = tempfile.mkdtemp(prefix=f"cavendish_budget_{size}_")
+    try:
+        app = _make_app(os.path.join(scratch, "budget.db"), scratch)
+        results = {}
+        with app.app_context():
+            db.create_all()
+            seed_database(SeedVolumes(students=size), seed=seed, log=lambda msg: None)
+            fixtures = _fixtures(db)
+
+            captured = []
+            recording = [False]
+
+            def on_execute(conn, cursor, statement, parameters, context, executemany):
+                if recording[0]:
+                    captured.append(_normalise(statement))
+
+            event.listen(db.engine, "before_cursor_execute", on_execute)
+
+            client = app.test_client()
+            for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.endpoint):
+                if "GET" not in rule.methods or rule.endpoint in SKIPPED:
+                    continue
+                if only and rule.endpoint not in only:
+                    continue
+                kwargs = _url_kwargs(rule, fixtures)
+                if kwargs is None:
+                    results[rule.endpoint] = ("no fixture for " + ", ".join(sorted(rule.arguments)), [])
+                    continue
+                with app.test_request_context():
+                    url = url_for(rule.endpoint, **kwargs)
+
+                with client.session_transaction() as sess:
+                    sess.clear()
+                    role = None if rule.endpoint in PUBLIC_ENDPOINTS else ROLE_BY_ENDPOINT.get(
+                        rule.endpoint, ROLE_BY_BLUEPRINT.get(rule.endpoint.split(".")[0])
+                    )
+                    if role == "admin":
+                        sess["user_id"] = fixtures["admin_id"]
+                        sess["role"] = "admin"
+                        sess["_user_id"] = str(fixtures["admin_id"])  # Flask-Login, used by results
+                    elif role == "student":
+                        sess["student_id"] = fixtures["student_id"]
+                        sess["_user_id"] = str(fixtures["student_user_id"])
+                    elif role == "lecturer":
+                        sess["user_id"] = fixtures["lecturer_user_id"]
+                        sess["role"] = "lecturer"
+                        sess["lecturer_id"] = fixtures["lecturer_id"]
+                        sess["_user_id"] = str(fixtures["lecturer_user_id"])
+
+                # Requests share the outer app context (and its g and session), so
+                # drop the user Flask-Login cached for the previous request and
+                # any rows a crashed request left in the identity map; GPAs are
+                # measured on a cache miss
+                g.pop("_login_user", None)
+                db.session.remove()
+                clear_gpa_cache()
+                captured.clear()
+                recording[0] = True
+                try:
+                    response = client.get(url)
+                    status = response.status_code
+                    response.close()
+                except Exception as exc:  # a crashing route is reported, not fatal to the run
+                    status = f"{type(exc).__name__}: {exc}"
+                finally:
+                    recording[0] = False
+                # Write any audit events now, not on the writer thread's timer during the next request
+                audit.flush()
+                results[rule.endpoint] = (status, list(captured))
+
+            event.remove(db.engine, "before_cursor_execute", on_execute)
+            db.session.remove()
+            db.engine.dispose()
+        return results
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def check(small, large, sizes, verbose=False):
+    """Compare both runs against the budgets; return a list of failure messages."""
+    failures = []
+    print(f"{'Endpoint':<38}{'status':>8}{sizes[0]:>9}{sizes[1]:>9}{'budget':>8}")
+    for endpoint in sorted(large):
+        status, large_statements = large[endpoint]
+        _, small_statements = small.get(endpoint, (None, []))
+        budget = BUDGETS.get(endpoint, DEFAULT_BUDGET)
+        print(f"{endpoint:<38}{str(status)[:8]:>8}{len(small_statements):>9}{len(large_statements):>9}{budget:>8}")
+
+        problems = []
+        failed = not isinstance(status, int) or status >= 500
+        if endpoint in KNOWN_BROKEN:
+            if not failed:
+                problems.append("listed in KNOWN_BROKEN but now succeeds; remove the entry")
+        elif failed:
+            problems.append(f"request failed ({status})")
+        if len(large_statements) > budget:
+            problems.append(f"{len(large_statements)} statements exceed the budget of {budget}")
+        if len(large_statements) > len(small_statements):
+            problems.append(f"statement count grew from {len(small_statements)} to {len(large_statements)} with more rows")
+        if problems:
+            message = f"{endpoint}: " + "; ".join(problems)
+            repeated, times = Counter(large_statements).most_common(1)[0] if large_statements else (None, 0)
+            if times > 1:
+                message += f"\n    repeated {times}x: {repeated[:300]}"
+            failures.append(message)
+        if verbose:
+            for statement, times in Counter(large_statements).most_common():
+                print(f"    {times:>4}x {statement[:160]}")
+    return failures
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Assert per-route SQL statement budgets against seeded databases.")
+    parser.add_argument("--sizes", default="20,200", help="Two comma-separated student counts to seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--endpoint", action="append", help="Only check this endpoint (repeatable)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every statement per route")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+    if len(sizes) != 2:
+        sys.exit("--sizes needs exactly two values, e.g. 20,200")
+
+    only = set(args.endpoint) if args.endpoint else None
+    small = measure_routes(sizes[0], args.seed, only)
+    large = measure_routes(sizes[1], args.seed, only)
+    failures = check(small, large, sizes, args.verbose)
+
+    if failures:
+        print(f"\n{len(failures)} route(s) over budget:")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print(f"\nAll {len(large)} routes within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Reconcile a bank or mobile-money statement CSV against pending payments.
+
+Exact matches are approved (registration + slip, same as the admin approve
+button); everything else lands in the review queue at /admin/reconciliation.
+
+Examples:
+    python reconcile_statement.py statements/zanaco_2025_10.csv
+    python reconcile_statement.py big.csv --database sqlite:///bench.db --batch-size 10000
+"""
+import argparse
+import os
+import time
+
+from app import create_app
+from app.config import Config
+from app.utils.reconciliation import reconcile_statement
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Match statement lines to pending payments.")
+    parser.add_argument("statement", help="Path to the statement CSV")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Lines per database flush")
+    parser.add_argument("--date-window", type=int, default=3,
+                        help="Days either side of the submission date accepted by the amount + date fallback")
+    parser.add_argument("--database", help="Override SQLALCHEMY_DATABASE_URI")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    class ReconcileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = args.database or Config.SQLALCHEMY_DATABASE_URI
+
+    app = create_app(ReconcileConfig)
+    started = time.perf_counter()
+    with app.app_context(), open(args.statement, newline="", encoding="utf-8-sig") as stream:
+        result = reconcile_statement(
+            stream, os.path.basename(args.statement),
+            batch_size=args.batch_size, date_window_days=args.date_window,
+        )
+        print(f"Import #{result.id} {result.status} in {time.perf_counter() - started:.1f}s")
+        print(f"  - lines:     {result.total_lines:,}")
+        print(f"  - matched:   {result.matched_lines:,}")
+        print(f"  - unmatched: {result.unmatched_lines:,}")
+
+
+if __name__ == "__main__":
+    main()
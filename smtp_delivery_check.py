@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Check the mail worker against a real SMTP server.
+
+Starts an aiosmtpd sink on localhost that rejects one recipient with 550,
+points the app at it with a throwaway SQLite database, queues messages and
+runs OutboxWorker.run_once(). Then checks that:
+
+- every deliverable message arrived, over one SMTP session;
+- messages beyond MAIL_RECIPIENT_LIMIT for one recipient were deferred
+  until the window has passed, not sent or dropped;
+- the rejected recipient's message failed at once, without retries;
+- with the sink stopped, a message goes back to pending with a backoff
+  instead of failing.
+
+It exits with status 1 if any check fails. Needs aiosmtpd
+(pip install aiosmtpd); the app itself does not.
+
+Examples:
+    python smtp_delivery_check.py
+    python smtp_delivery_check.py --messages 200 --port 8025
+"""
+import argparse
+import os
+import shutil
+import socket
+import sys
+import tempfile
+from datetime import timedelta
+
+from app import create_app
+from app.config import Config
+from app.models import db, EmailOutbox
+from app.utils.mailer import OutboxWorker, _utcnow, enqueue_email
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:
+    Controller = None
+
+BUSY = "busy@example.com"
+REJECTED = "rejected@example.com"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Deliver the email outbox to a local aiosmtpd sink and check the outcome.")
+    parser.add_argument("--messages", type=int, default=30, help="Messages to distinct recipients (default: 30)")
+    parser.add_argument("--port", type=int, default=0, help="Port for the sink (default: a free one)")
+    return parser.parse_args()
+
+
+class Sink:
+    """aiosmtpd handler that keeps what it receives and refuses REJECTED."""
+
+    def __init__(self):
+        self.received = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address == REJECTED:
+            return "550 5.1.1 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(session.peer)
+        self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted for delivery"
+
+
+def _free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def _statuses():
+    return dict(db.session.query(EmailOutbox.status, db.func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+
+
+def run(app, sink, controller, args):
+    failures = []
+    limit = app.config["MAIL_RECIPIENT_LIMIT"]
+    with app.app_context():
+        db.create_all()
+        for i in range(args.messages):
+            enqueue_email(f"student{i}@example.com", f"Message {i}", body="Hello")
+        for i in range(limit + 2):
+            enqueue_email(BUSY, f"Busy {i}", body="Hello")
+        rejected = enqueue_email(REJECTED, "Rejected", body="Hello")
+        db.session.commit()
+
+        worker = OutboxWorker(app)
+        try:
+            processed = worker.run_once()
+            statuses = _statuses()
+            print(f"Run 1: {processed} row(s) processed, {len(sink.received)} delivered "
+                  f"over {len(sink.sessions)} session(s); outbox: {statuses}")
+
+            expected = args.messages + limit
+            if len(sink.received) != expected or statuses.get("sent", 0) != expected:
+                failures.append(f"{expected} messages should have been delivered, the sink got {len(sink.received)} "
+                                f"and {statuses.get('sent', 0)} are marked sent")
+            if len(sink.sessions) != 1:
+                failures.append(f"delivery used {len(sink.sessions)} SMTP sessions instead of 1")
+            if sink.received.count(BUSY) != limit:
+                failures.append(f"{BUSY} got {sink.received.count(BUSY)} messages, the limit is {limit}")
+
+            window = timedelta(seconds=app.config["MAIL_RECIPIENT_WINDOW"])
+            deferred = EmailOutbox.query.filter_by(recipient=BUSY, status="pending").all()
+            if len(deferred) != 2:
+                failures.append(f"{len(deferred)} message(s) to {BUSY} deferred instead of 2")
+            if any(row.attempts or row.next_attempt_at < _utcnow() + window - timedelta(minutes=1) for row in deferred):
+                failures.append("deferred messages were counted as attempts or are due before the window ends")
+
+            rejected = db.session.get(EmailOutbox, rejected.id)
+            if rejected.status != "failed" or rejected.attempts != 1 or "550" not in (rejected.last_error or ""):
+                failures.append(f"the 550 recipient ended {rejected.status} after {rejected.attempts} attempt(s) "
+                                f"({rejected.last_error!r}), not failed after 1")
+
+            controller.stop()
+            offline = enqueue_email("offline@example.com", "While the server is down", body="Hello")
+            db.session.commit()
+            worker.run_once()
+            offline = db.session.get(EmailOutbox, offline.id)
+            print(f"Run 2 (sink stopped): message {offline.status}, attempt {offline.attempts}, "
+                  f"next try in {(offline.next_attempt_at - _utcnow()).total_seconds():.0f}s ({offline.last_error})")
+            if offline.status != "pending" or offline.attempts != 1 or offline.next_attempt_at <= _utcnow():
+                failures.append(f"with the server down the message ended {offline.status} after "
+                                f"{offline.attempts} attempt(s) instead of being rescheduled")
+        finally:
+            worker.close()
+            db.engine.dispose()
+    return failures
+
+
+def main():
+    args = parse_args()
+    if Controller is None:
+        sys.exit("aiosmtpd is not installed: pip install aiosmtpd")
+    port = args.port or _free_port()
+    scratch = tempfile.mkdtemp(prefix="cavendish_smtp_")
+
+    class CheckConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(scratch, 'outbox.db')}"
+        AUDIT_ASYNC = False
+        MAIL_SERVER = "127.0.0.1"
+        MAIL_PORT = port
+        MAIL_USE_TLS = False
+        MAIL_USE_SSL = False
+        MAIL_USERNAME = None
+        MAIL_PASSWORD = None
+        MAIL_SMTP_TIMEOUT = 5
+
+    sink = Sink()
+    controller = Controller(sink, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        failures = run(create_app(CheckConfig), sink, controller, args)
+    finally:
+        if controller.loop.is_running():  # run() stops it part way through
+            controller.stop()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("Mail delivery checks passed." if not failures else f"{len(failures)} check(s) failed.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+"""
+Stress test for capacity-limited enrollment.
+
+Opens a fresh period in which every course has --capacity seats, then fires
+--attempts enrollment attempts (and, with --drop-share, drops that free
+seats again) from --threads threads at once, each in its own transaction,
+as a registration rush would. Afterwards it checks that:
+
+- no section has more students than seats, and every section's seat
+  counter equals its number of enrollments;
+- no student is enrolled twice, or both enrolled and waitlisted;
+- no section has a free seat while students are waiting for one.
+
+It exits with status 1 if any check fails. Without --database it seeds a
+throwaway SQLite database; given one, it uses the students and courses
+already there and removes the test period afterwards (unless --keep).
+
+Examples:
+    python stress_enrollment.py
+    python stress_enrollment.py --students 5000 --courses 30 --capacity 40 --attempts 20000 --threads 64
+    python stress_enrollment.py --database postgresql://portal@localhost/portal_stress --drop-share 0.2
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from app.config import Config
+from app.models import db, Course, CourseEnrollment, CourseSection, CourseWaitlist, EmailOutbox, Student
+from app.utils.capacity import drop_enrollment, enroll_student, set_capacity
+from app.utils.seed import SeedVolumes, seed_database
+
+SEMESTER = "Semester 1"
+MAX_RETRIES = 50
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hammer capacity-limited enrollment from many threads at once.")
+    parser.add_argument("--database", help="Database to test against (default: a seeded temporary SQLite file)")
+    parser.add_argument("--students", type=int, default=2000, help="Students to seed (default: 2000)")
+    parser.add_argument("--courses", type=int, default=20, help="Courses taking part (default: 20)")
+    parser.add_argument("--capacity", type=int, default=50, help="Seats per course (default: 50)")
+    parser.add_argument("--attempts", type=int, default=5000, help="Enrollment attempts (default: 5000)")
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent workers (default: 32)")
+    parser.add_argument("--drop-share", type=float, default=0.1,
+                        help="Share of operations that drop an enrollment instead (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep the test period's rows afterwards")
+    return parser.parse_args()
+
+
+def _in_transaction(app, work):
+    """Run work() in its own app context and transaction, retrying while the database is locked."""
+    for attempt in range(MAX_RETRIES):
+        with app.app_context():
+            try:
+                result = work()
+                db.session.commit()
+                return result, attempt
+            except OperationalError:
+                # SQLite gives up on the write lock after its busy timeout; back off and try again
+                db.session.rollback()
+        time.sleep(random.uniform(0.001, 0.01) * (attempt + 1))
+    raise RuntimeError(f"gave up after {MAX_RETRIES} attempts")
+
+
+def run(app, args, academic_year):
+    rng = random.Random(args.seed)
+    with app.app_context():
+        students = db.session.scalars(select(Student.id).order_by(Student.id).limit(args.students)).all()
+        courses = db.session.scalars(select(Course.id).order_by(Course.id).limit(args.courses)).all()
+        if not students or not courses:
+            sys.exit("No students or courses to enroll; seed the database first.")
+        for course_id in courses:
+            set_capacity(course_id, academic_year, SEMESTER, args.capacity)
+        db.session.commit()
+
+    # Drops target pairs an earlier operation tried to enroll, so most of them free a seat
+    operations, tried = [], []
+    for _ in range(args.attempts):
+        if tried and rng.random() < args.drop_share:
+            operations.append(("drop",) + rng.choice(tried))
+        else:
+            tried.append((rng.choice(students), rng.choice(courses)))
+            operations.append(("enroll",) + tried[-1])
+    outcomes, retries, lock = Counter(), Counter(), threading.Lock()
+    start = threading.Barrier(min(args.threads, len(operations)))
+
+    def attempt(operation):
+        kind, student_id, course_id = operation
+        if kind == "drop":
+            work = lambda: "dropped" if drop_enrollment(student_id, course_id, academic_year, SEMESTER)[0] else "not enrolled"
+        else:
+            work = lambda: enroll_student(student_id, course_id, academic_year, SEMESTER)
+        result, retried = _in_transaction(app, work)
+        with lock:
+            outcomes[result] += 1
+            retries[kind] += retried
+
+    def worker(chunk):
+        start.wait()
+        for operation in chunk:
+            attempt(operation)
+
+    chunks = [operations[i::args.threads] for i in range(args.threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        for future in [pool.submit(worker, chunk) for chunk in chunks if chunk]:
+            future.result()
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(operations):,} operations from {args.threads} threads in {elapsed:.2f}s "
+          f"({len(operations) / elapsed:,.0f}/s), {sum(retries.values()):,} lock retries")
+    for outcome, count in sorted(outcomes.items()):
+        print(f"  - {outcome}: {count:,}")
+    with app.app_context():
+        return check(academic_year, courses)
+
+
+def check(academic_year, courses):
+    """Consistency checks over the test period; returns a list of failure messages."""
+    failures = []
+    enrolled = dict(db.session.query(CourseEnrollment.course_id, func.count(CourseEnrollment.id)).filter(
+        CourseEnrollment.academic_year == academic_year
+    ).group_by(CourseEnrollment.course_id).all())
+    waiting = dict(db.session.query(CourseWaitlist.section_id, func.count(CourseWaitlist.id)).group_by(
+        CourseWaitlist.section_id
+    ).all())
+    sections = CourseSection.query.filter_by(academic_year=academic_year, semester=SEMESTER).all()
+    for section in sections:
+        count = enrolled.get(section.course_id, 0)
+        if count > section.capacity:
+            failures.append(f"course {section.course_id}: {count} students in {section.capacity} seats")
+        if count != section.seats_taken:
+            failures.append(f"course {section.course_id}: counter says {section.seats_taken}, {count} enrolled")
+        if count < section.capacity and waiting.get(section.id):
+            failures.append(f"course {section.course_id}: {section.capacity - count} seat(s) free "
+                            f"while {waiting[section.id]} wait")
+
+    duplicates = db.session.query(CourseEnrollment.student_id, CourseEnrollment.course_id).filter(
+        CourseEnrollment.academic_year == academic_year
+    ).group_by(CourseEnrollment.student_id, CourseEnrollment.course_id).having(func.count() > 1).count()
+    if duplicates:
+        failures.append(f"{duplicates} duplicate enrollment(s)")
+    both = db.session.query(CourseWaitlist.id).join(CourseSection, CourseSection.id == CourseWaitlist.section_id).join(
+        CourseEnrollment, (CourseEnrollment.student_id == CourseWaitlist.student_id)
+        & (CourseEnrollment.course_id == CourseSection.course_id)
+        & (CourseEnrollment.academic_year == CourseSection.academic_year)
+    ).filter(CourseSection.academic_year == academic_year).count()
+    if both:
+        failures.append(f"{both} student(s) both enrolled and waitlisted")
+
+    seats = sum(section.capacity for section in sections)
+    print(f"{sum(enrolled.values()):,} of {seats:,} seats taken across {len(courses)} course(s), "
+          f"{sum(waiting.get(section.id, 0) for section in sections):,} waiting")
+    return failures
+
+
+def cleanup(app, academic_year):
+    with app.app_context():
+        sections = select(CourseSection.id).where(CourseSection.academic_year == academic_year)
+        db.session.execute(delete(CourseWaitlist).where(CourseWaitlist.section_id.in_(sections)))
+        db.session.execute(delete(CourseSection).where(CourseSection.academic_year == academic_year))
+        db.session.execute(delete(CourseEnrollment).where(CourseEnrollment.academic_year == academic_year))
+        db.session.execute(delete(EmailOutbox).where(EmailOutbox.subject.like("Enrolled on %")))
+        db.session.commit()
+
+
+def main():
+    args = parse_args()
+    scratch = None if args.database else tempfile.mkdtemp(prefix="cavendish_stress_")
+    database = args.database or f"sqlite:///{os.path.join(scratch, 'stress.db')}"
+
+    class StressConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database
+        AUDIT_ASYNC = False
+        # One connection per worker thread, and a long SQLite busy timeout instead of instant "database is locked"
+        SQLALCHEMY_ENGINE_OPTIONS = {"pool_size": args.threads, "max_overflow": 0, "pool_timeout": 60}
+        if database.startswith("sqlite"):
+            SQLALCHEMY_ENGINE_OPTIONS["connect_args"] = {"timeout": 30, "check_same_thread": False}
+
+    app = create_app(StressConfig)
+    academic_year = f"STRESS-{int(time.time())}"[:20]
+    try:
+        if scratch:
+            with app.app_context():
+                db.create_all()
+                seed_database(SeedVolumes(students=args.students, courses=max(args.courses, 1), chatbot_messages=0),
+                              seed=args.seed)
+        failures = run(app, args, academic_year)
+    finally:
+        if not args.keep and not scratch:
+            cleanup(app, academic_year)
+        if scratch:
+            with app.app_context():
+                db.engine.dispose()
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("No seat oversold; all checks passed." if not failures else f"{len(failures)} check(s) failed.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()